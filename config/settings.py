@@ -48,8 +48,6 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     # Third party
-    'cloudinary_storage',
-    'cloudinary',
     'django.contrib.sites',
     'crispy_forms',
     'crispy_bootstrap5',
@@ -90,15 +88,19 @@ ACCOUNT_SIGNUP_FIELDS = [
 
 
 MIDDLEWARE = [
+    'core.health.HealthCheckMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.CachedAuthenticationMiddleware',
+    'core.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'core.page_cache.PageCacheMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
+    'lottery.imaging.PoolBusyMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -125,12 +127,114 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
 
+# Connections belong to the thread that opened them and are kept for
+# DATABASE_CONN_MAX_AGE seconds, so each WSGI request thread reuses its own
+# across requests; each is checked before reuse. Under ASGI (WEB_MODE
+# uvicorn) sync code runs in short-lived threads whose persistent
+# connections would never be reused or closed, so they are not kept.
+if os.environ.get("WEB_MODE") == "uvicorn":
+    DATABASE_CONN_MAX_AGE = 0
+else:
+    DATABASE_CONN_MAX_AGE = int(os.environ.get("DATABASE_CONN_MAX_AGE", 60))
+DATABASE_OPTIONS = {
+    "conn_max_age": DATABASE_CONN_MAX_AGE,
+    "conn_health_checks": True,
+}
+
 DATABASES = {
     'default': dj_database_url.parse(
-        os.environ.get("DATABASE_URL")
+        os.environ.get("DATABASE_URL"), **DATABASE_OPTIONS
     )
 }
 
+# Optional read replicas: a comma-separated list of database URLs. Views
+# marked with core.routers.use_replica read from them; see core/routers.py.
+DATABASE_REPLICA_URLS = [
+    url.strip()
+    for url in os.environ.get("DATABASE_REPLICA_URL", "").split(",")
+    if url.strip()
+]
+for index, url in enumerate(DATABASE_REPLICA_URLS, start=1):
+    alias = "replica" if index == 1 else f"replica{index}"
+    DATABASES[alias] = dj_database_url.parse(url, **DATABASE_OPTIONS)
+    # Tests run against the primary's test database.
+    DATABASES[alias]["TEST"] = {"MIRROR": "default"}
+
+if DATABASE_REPLICA_URLS:
+    DATABASE_ROUTERS = ["core.routers.ReplicaRouter"]
+    MIDDLEWARE.append("core.routers.PrimaryPinningMiddleware")
+
+# Seconds a client keeps reading from the primary after a write
+REPLICA_PIN_SECONDS = 10
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Use a shared Redis cache when REDIS_URL is set so sessions and cached
+# users survive across workers; fall back to per-process memory otherwise.
+# Anything that must look the same from every worker (cached sessions and
+# users, the page cache, saved pets, profiling reports) checks SHARED_CACHE
+# and is left off with the per-process fallback.
+SHARED_CACHE = bool(os.environ.get("REDIS_URL"))
+
+if SHARED_CACHE:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ.get("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Anonymous pages are cached whole (see core.page_cache) and purged by tag;
+# front proxies may keep pages without forms for PAGE_CACHE_PROXY_SECONDS.
+# A purge only reaches the worker that made it unless the cache is shared,
+# so the page cache is off otherwise.
+if SHARED_CACHE:
+    PAGE_CACHE_SECONDS = int(os.environ.get("PAGE_CACHE_SECONDS", "600"))
+else:
+    PAGE_CACHE_SECONDS = 0
+PAGE_CACHE_PROXY_SECONDS = 60
+
+# With a shared cache, sessions are read from the cache and only written
+# through to the database, and request.user comes from a per-user cache
+# entry. A per-process cache would let other workers keep honouring a
+# logged-out session or an old password, so both stay on the database then.
+if SHARED_CACHE:
+    SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+else:
+    SESSION_ENGINE = "django.contrib.sessions.backends.db"
+    MIDDLEWARE[
+        MIDDLEWARE.index("core.middleware.CachedAuthenticationMiddleware")
+    ] = "django.contrib.auth.middleware.AuthenticationMiddleware"
+
+# Keep flash messages in a signed cookie so they never touch the session
+MESSAGE_STORAGE = "django.contrib.messages.storage.cookie.CookieStorage"
+
+# Live updates (server-sent events, served by config.asgi)
+# Set LIVE_EVENTS_BACKEND to "lottery.events.RedisBroker" when running more
+# than one ASGI worker so events reach subscribers on every node.
+LIVE_EVENTS_BACKEND = os.environ.get(
+    "LIVE_EVENTS_BACKEND", "lottery.events.InProcessBroker"
+)
+LIVE_EVENTS_REDIS_URL = os.environ.get("REDIS_URL")
+LIVE_EVENTS_HEARTBEAT = 15
+LIVE_EVENTS_MAX_AGE = 300
+
+# Retention policies applied by ``manage.py apply_retention``
+RETENTION_DISMISSED_NOTIFICATION_DAYS = int(
+    os.environ.get("RETENTION_DISMISSED_NOTIFICATION_DAYS", 30)
+)
+RETENTION_ARCHIVE_ROUNDS_AFTER_MONTHS = int(
+    os.environ.get("RETENTION_ARCHIVE_ROUNDS_AFTER_MONTHS", 12)
+)
+RETENTION_BATCH_SIZE = 500
+RETENTION_BATCH_SLEEP = 0.1
+
 # CSRF Trusted Origins
 CSRF_TRUSTED_ORIGINS = [
     "https://*.codeinstitute-ide.net/",
@@ -188,6 +292,36 @@ USE_I18N = True
 USE_TZ = True
 
 
+# Load balancer probes, answered by core.health.HealthCheckMiddleware.
+# Readiness also waits for each worker to render WARM_UP_URLS once.
+HEALTH_LIVE_PATH = "/healthz"
+HEALTH_READY_PATH = "/readyz"
+HEALTH_STORAGE_PROBE = "health-check"
+HEALTH_STORAGE_CACHE_SECONDS = 30
+WARM_UP_URLS = ["home", "round_list", "results_list"]
+
+# Staff can profile one request with ?_profile=1 or an X-Profile header
+# (see core.profiling); reports are listed at /ops/profiles/. Needs
+# SHARED_CACHE (or DEBUG) so the rate limit and reports are site-wide.
+PROFILING_RATE_LIMIT = 5
+PROFILING_RATE_WINDOW = 60
+PROFILING_KEEP = 50
+PROFILING_KEEP_SECONDS = 60 * 60 * 24
+PROFILING_DIR = os.environ.get("PROFILING_DIR", "")
+
+# Queries taking SLOW_QUERY_MS or more are sampled with the code that ran
+# them (core.slow_queries). Set SLOW_QUERY_LOG to a file to keep them for
+# ``manage.py slow_queries``; a sample rate of 0 turns recording off.
+SLOW_QUERY_MS = int(os.environ.get("SLOW_QUERY_MS", 200))
+SLOW_QUERY_SAMPLE_RATE = float(os.environ.get("SLOW_QUERY_SAMPLE_RATE", 1))
+SLOW_QUERY_BUFFER = 500
+SLOW_QUERY_LOG = os.environ.get("SLOW_QUERY_LOG", "")
+
+# Seconds a fresh interpreter may take to import the WSGI application;
+# checked by the tests and reported by ``manage.py profile_imports``.
+STARTUP_BUDGET_SECONDS = 3.0
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
@@ -200,19 +334,65 @@ STATICFILES_DIRS = [
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 # Whitenoise settings
+# Hashed files written by collectstatic are served with a far-future
+# immutable Cache-Control header; run `manage.py build_assets` first so the
+# vendor assets and minified bundles are part of that set.
 WHITENOISE_MANIFEST_STRICT = False
 
 # Media files (user-uploaded content)
 MEDIA_URL = '/media/'
+MEDIA_ROOT = os.environ.get("MEDIA_ROOT", BASE_DIR / "media")
+
+# "cloudinary" (default) or "local" for photos on the filesystem under
+# MEDIA_ROOT, served by core.media.serve_media.
+MEDIA_STORAGE = os.environ.get("MEDIA_STORAGE", "cloudinary")
+
+# The Cloudinary SDK is imported by the storage when it is first used. The
+# "cloudinary" app (its model field and template tags) is not installed:
+# loading it imports the whole upload client at startup.
+# "cloudinary_storage" only adds the deleteorphanedmedia command.
+if MEDIA_STORAGE == "cloudinary":
+    INSTALLED_APPS.append("cloudinary_storage")
+
+# How serve_media hands local files to the front server: "" streams them
+# from Python, "x-accel-redirect" (nginx, with an internal location at
+# MEDIA_ACCEL_PREFIX aliased to MEDIA_ROOT) or "x-sendfile" (Apache).
+MEDIA_SENDFILE = os.environ.get("MEDIA_SENDFILE", "")
+MEDIA_ACCEL_PREFIX = "/protected-media/"
+MEDIA_CACHE_SECONDS = 60 * 60 * 24
 
 # Static and media files storage
 STORAGES = {
     "staticfiles": {
-        "BACKEND": "whitenoise.storage.StaticFilesStorage",
+        "BACKEND": "core.storage.PipelineStaticFilesStorage",
     },
     "default": {
-        "BACKEND": "cloudinary_storage.storage.MediaCloudinaryStorage",
+        "BACKEND": (
+            "django.core.files.storage.FileSystemStorage"
+            if MEDIA_STORAGE == "local"
+            else "cloudinary_storage.storage.MediaCloudinaryStorage"
+        ),
     },
 }
 
+# Entry photos go from the browser straight to storage using a signed,
+# short-lived upload target (see lottery.uploads). Set to an empty string
+# to post photos through Django.
+DIRECT_UPLOAD_BACKEND = os.environ.get(
+    "DIRECT_UPLOAD_BACKEND",
+    "lottery.uploads.LocalUploads"
+    if MEDIA_STORAGE == "local"
+    else "lottery.uploads.CloudinaryUploads",
+)
+DIRECT_UPLOAD_MAX_AGE = 60 * 15
+
+# Photo decoding and resizing run in a per-process pool of this many
+# processes (0 runs them inline), with this many more tasks allowed to
+# queue. Requests wait IMAGE_POOL_WAIT seconds for a slot before getting a
+# 503 that asks the client to retry after IMAGE_POOL_RETRY_AFTER seconds.
+IMAGE_POOL_WORKERS = int(os.environ.get("IMAGE_POOL_WORKERS", "2"))
+IMAGE_POOL_QUEUE = int(os.environ.get("IMAGE_POOL_QUEUE", "4"))
+IMAGE_POOL_WAIT = 2
+IMAGE_POOL_RETRY_AFTER = 5
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
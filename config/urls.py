@@ -14,17 +14,22 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.media import serve_media
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('accounts/', include('allauth.urls')),
     path("", include("core.urls")),
     path("", include("lottery.urls")),
+    path("api/v1/", include("lottery.api_urls")),
 ]
 
 # Serve static files during development
@@ -34,5 +39,11 @@ if settings.DEBUG:
         document_root=settings.STATICFILES_DIRS[0]
     )
 
-# Serve media files during development
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Local media (MEDIA_STORAGE = "local"); the view 404s for other storages
+urlpatterns += [
+    re_path(
+        r"^%s(?P<path>.+)$" % re.escape(settings.MEDIA_URL.lstrip("/")),
+        serve_media,
+        name="media",
+    ),
+]
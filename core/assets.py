@@ -0,0 +1,100 @@
+"""
+Static asset registry shared by the ``build_assets`` command and the
+``assets`` template tags.
+
+Third-party assets are listed with both their self-hosted location and the
+CDN they are fetched from. Until ``manage.py build_assets`` has written the
+local copies, templates keep pointing at the CDN so a fresh checkout still
+renders correctly.
+"""
+import re
+from functools import lru_cache
+
+from django.contrib.staticfiles import finders
+from django.templatetags.static import static
+
+
+# name -> (self-hosted path under static/, upstream URL)
+VENDOR_ASSETS = {
+    "bootstrap.css": (
+        "vendor/bootstrap/bootstrap.min.css",
+        "https://cdn.jsdelivr.net/npm/bootstrap@5.3.8/dist/css/"
+        "bootstrap.min.css",
+    ),
+    "bootstrap.js": (
+        "vendor/bootstrap/bootstrap.bundle.min.js",
+        "https://cdn.jsdelivr.net/npm/bootstrap@5.3.8/dist/js/"
+        "bootstrap.bundle.min.js",
+    ),
+    "fontawesome.css": (
+        "vendor/fontawesome/css/all.min.css",
+        "https://cdn.jsdelivr.net/npm/@fortawesome/fontawesome-free@6.7.2/"
+        "css/all.min.css",
+    ),
+    "roboto.css": (
+        "vendor/fonts/roboto.css",
+        "https://fonts.googleapis.com/css2?family=Roboto:wght@400;700"
+        "&display=swap",
+    ),
+    "nunito.css": (
+        "vendor/fonts/nunito.css",
+        "https://fonts.googleapis.com/css2?family=Nunito:ital,wght@"
+        "0,200..1000;1,200..1000&display=swap",
+    ),
+}
+
+# bundle path -> project sources, concatenated in order
+BUNDLES = {
+    "dist/site.min.css": ["css/styles.css"],
+    "dist/site.min.js": ["js/common.js", "js/home.js", "js/live.js"],
+}
+
+CSS_URL_RE = re.compile(r"url\(\s*['\"]?([^'\")]+)['\"]?\s*\)")
+
+
+@lru_cache(maxsize=None)
+def is_built(path):
+    """Return True when ``path`` exists in one of the static sources."""
+    return finders.find(path) is not None
+
+
+def vendor_url(name):
+    local_path, cdn_url = VENDOR_ASSETS[name]
+    if is_built(local_path):
+        return static(local_path)
+    return cdn_url
+
+
+def bundle_urls(name):
+    if is_built(name):
+        return [static(name)]
+    return [static(source) for source in BUNDLES[name]]
+
+
+def minify_css(text):
+    text = re.sub(r"/\*.*?\*/", "", text, flags=re.S)
+    text = re.sub(r"\s+", " ", text)
+    text = re.sub(r"\s*([{};,>])\s*", r"\1", text)
+    text = re.sub(r":\s+", ":", text)
+    return text.replace(";}", "}").strip()
+
+
+def minify_js(text):
+    """
+    Conservative JS minifier: drops comment-only lines and indentation but
+    keeps line breaks, so automatic semicolon insertion is unaffected.
+    """
+    lines = []
+    in_comment = False
+    for line in text.splitlines():
+        stripped = line.strip()
+        if in_comment:
+            in_comment = "*/" not in stripped
+            continue
+        if stripped.startswith("/*"):
+            in_comment = "*/" not in stripped
+            continue
+        if not stripped or stripped.startswith("//"):
+            continue
+        lines.append(stripped)
+    return "\n".join(lines)
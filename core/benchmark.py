@@ -0,0 +1,177 @@
+"""
+Load-testing helpers for ``manage.py benchmark_serving``.
+
+``serve`` starts gunicorn with the checked-in configuration in a given
+``WEB_MODE``, ``run_load`` sends a number of concurrent clients through
+journeys (lists of paths fetched in order over one keep-alive connection)
+and ``memory_kb`` adds up the proportional set size of the server's
+processes, which counts pages shared copy-on-write only once.
+"""
+import http.client
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+
+class ServerError(Exception):
+    """The server under test did not start."""
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(len(ordered) * pct / 100), len(ordered) - 1)
+    return ordered[index]
+
+
+def run_load(base_url, journeys, clients, passes, headers=None):
+    """
+    Have ``clients`` threads each walk every journey ``passes`` times,
+    sending ``headers`` with every request. Any response other than a 2xx
+    counts as an error. Returns ``{"requests", "errors", "seconds",
+    "throughput", "p50_ms", "p95_ms", "p99_ms"}``.
+    """
+    parts = urlsplit(base_url)
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def client():
+        connection = http.client.HTTPConnection(
+            parts.hostname, parts.port, timeout=30
+        )
+        mine, failed = [], 0
+        try:
+            for _ in range(passes):
+                for journey in journeys:
+                    for path in journey:
+                        started = time.perf_counter()
+                        try:
+                            connection.request(
+                                "GET", path, headers=headers or {}
+                            )
+                            response = connection.getresponse()
+                            response.read()
+                        except (OSError, http.client.HTTPException):
+                            connection.close()
+                            failed += 1
+                            continue
+                        mine.append(time.perf_counter() - started)
+                        if not 200 <= response.status < 300:
+                            failed += 1
+        finally:
+            connection.close()
+            with lock:
+                latencies.extend(mine)
+                errors.append(failed)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "errors": sum(errors),
+        "seconds": seconds,
+        "throughput": len(latencies) / seconds if seconds else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def _children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def _process_kb(pid):
+    for path, field in (
+        (f"/proc/{pid}/smaps_rollup", "Pss:"),
+        (f"/proc/{pid}/status", "VmRSS:"),
+    ):
+        try:
+            with open(path) as f:
+                for line in f:
+                    if line.startswith(field):
+                        return int(line.split()[1])
+        except OSError:
+            continue
+    return None
+
+
+def memory_kb(pid):
+    """
+    ``(total, per_worker)`` kilobytes for a gunicorn master ``pid`` and its
+    workers, or ``(None, None)`` where /proc is not available.
+    """
+    workers = _children(pid)
+    sizes = [_process_kb(process) for process in [pid, *workers]]
+    if None in sizes:
+        return None, None
+    total = sum(sizes)
+    return total, (sum(sizes[1:]) / len(workers) if workers else None)
+
+
+def _wait_for_port(port, process, deadline):
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise ServerError(f"gunicorn exited with {process.returncode}.")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise ServerError("gunicorn did not start listening in time.")
+
+
+@contextmanager
+def serve(mode, port, workers, cwd, log, startup_timeout=60):
+    """
+    Run gunicorn in ``mode`` on ``port`` with the ``gunicorn.conf.py`` in
+    ``cwd``; yields the master process.
+    """
+    env = {
+        **os.environ,
+        "WEB_MODE": mode,
+        "WEB_CONCURRENCY": str(workers),
+        "PORT": str(port),
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}"],
+        cwd=cwd,
+        env=env,
+        stdout=log,
+        stderr=log,
+    )
+    try:
+        _wait_for_port(port, process, time.monotonic() + startup_timeout)
+        # Workers boot after the master starts listening.
+        deadline = time.monotonic() + startup_timeout
+        while (
+            len(_children(process.pid)) < workers
+            and time.monotonic() < deadline
+            and os.path.isdir("/proc")
+        ):
+            time.sleep(0.2)
+        yield process
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
@@ -0,0 +1,195 @@
+"""
+Liveness and readiness probes, and warming a worker up before it serves.
+
+``HealthCheckMiddleware`` comes first in ``MIDDLEWARE`` and answers
+``HEALTH_LIVE_PATH`` and ``HEALTH_READY_PATH`` itself, so probes from a
+load balancer skip host validation, the HTTPS redirect, sessions and the
+page cache:
+
+- liveness only shows that the process can answer;
+- readiness needs a completed ``warm_up``, a ``SELECT 1`` on every
+  database and a reachable media storage. The storage check costs a
+  request to Cloudinary, so its result is reused for
+  ``HEALTH_STORAGE_CACHE_SECONDS``.
+
+``warm_up`` runs in each gunicorn worker before it accepts requests (the
+``post_worker_init`` hook in gunicorn.conf.py). It checks that the
+databases can be reached, loads the URLconf and views, and renders the
+anonymous ``WARM_UP_URLS`` through the full middleware stack, which fills
+the page and template caches the first visitors would otherwise pay for.
+Database connections belong to the thread that opened them, and the
+warm-up thread does not serve requests, so its connections are closed
+when it is done. A process started some other way (runserver, a test)
+warms up on its first readiness probe.
+"""
+import io
+import json
+import os
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import connections
+from django.http import HttpResponse
+from django.urls import get_resolver, reverse
+
+
+_warm_lock = threading.Lock()
+_warmed = threading.Event()
+_storage_check = {"checked_at": None, "ok": False}
+
+
+def public_host():
+    """A host name ``ALLOWED_HOSTS`` accepts, for requests made in-process."""
+    for host in settings.ALLOWED_HOSTS:
+        host = host.lstrip(".").rstrip("/")
+        if host and host != "*":
+            return host
+    return "localhost"
+
+
+def _environ(path):
+    host = public_host()
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "SCRIPT_NAME": "",
+        "PATH_INFO": path,
+        "QUERY_STRING": "",
+        "SERVER_NAME": host,
+        "SERVER_PORT": "443",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "HTTP_HOST": host,
+        "wsgi.url_scheme": "https",
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": sys.stderr,
+    }
+    if settings.SECURE_PROXY_SSL_HEADER:
+        header, value = settings.SECURE_PROXY_SSL_HEADER
+        environ[header] = value
+    return environ
+
+
+def warm_up():
+    """
+    Warm this process up and return ``{path: status code}``. Readiness
+    turns green once a run has rendered every page without a server error.
+    The calling thread's database connections are closed afterwards.
+    """
+    from django.core.handlers.wsgi import WSGIHandler
+
+    with _warm_lock:
+        try:
+            for alias in settings.DATABASES:
+                connections[alias].ensure_connection()
+            # Imports every view module.
+            get_resolver().url_patterns
+            handler = WSGIHandler()
+            statuses = {}
+            for name in settings.WARM_UP_URLS:
+                path = reverse(name)
+                status = []
+                response = handler(
+                    _environ(path), lambda code, headers: status.append(code)
+                )
+                try:
+                    for _chunk in response:
+                        pass
+                finally:
+                    response.close()
+                statuses[path] = int(status[0].split()[0])
+        finally:
+            connections.close_all()
+        if all(code < 500 for code in statuses.values()):
+            _warmed.set()
+        return statuses
+
+
+def is_warm():
+    return _warmed.is_set()
+
+
+def check_databases():
+    results = {}
+    for alias in settings.DATABASES:
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute("SELECT 1")
+            results[alias] = True
+        except Exception:
+            results[alias] = False
+    return results
+
+
+def check_storage():
+    checked_at = _storage_check["checked_at"]
+    now = time.monotonic()
+    if (
+        checked_at is not None
+        and now - checked_at < settings.HEALTH_STORAGE_CACHE_SECONDS
+    ):
+        return _storage_check["ok"]
+    try:
+        if isinstance(default_storage, FileSystemStorage):
+            # The storage creates MEDIA_ROOT on its first save anyway.
+            os.makedirs(default_storage.location, exist_ok=True)
+            ok = os.access(default_storage.location, os.W_OK)
+        else:
+            # Raises when the service cannot be reached; whether the probe
+            # object exists does not matter.
+            default_storage.exists(settings.HEALTH_STORAGE_PROBE)
+            ok = True
+    except Exception:
+        ok = False
+    _storage_check.update(checked_at=now, ok=ok)
+    return ok
+
+
+def _json(data, status=200):
+    response = HttpResponse(
+        json.dumps(data), status=status, content_type="application/json"
+    )
+    response["Cache-Control"] = "no-store"
+    return response
+
+
+def liveness(request):
+    return _json({"status": "ok"})
+
+
+def readiness(request):
+    if not is_warm() and not _warm_lock.locked():
+        try:
+            warm_up()
+        except Exception:
+            # Reported as not warm below; the next probe tries again.
+            pass
+    checks = {
+        "warm_up": is_warm(),
+        "databases": check_databases(),
+        "storage": check_storage(),
+    }
+    ready = (
+        checks["warm_up"]
+        and all(checks["databases"].values())
+        and checks["storage"]
+    )
+    return _json(
+        {"status": "ok" if ready else "unavailable", "checks": checks},
+        status=200 if ready else 503,
+    )
+
+
+class HealthCheckMiddleware:
+    """Answer the health probes before any other middleware runs."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path_info == settings.HEALTH_LIVE_PATH:
+            return liveness(request)
+        if request.path_info == settings.HEALTH_READY_PATH:
+            return readiness(request)
+        return self.get_response(request)
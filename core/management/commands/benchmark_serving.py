@@ -0,0 +1,138 @@
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from core.benchmark import ServerError, memory_kb, run_load, serve
+from core.health import public_host
+
+
+MODES = ("sync", "gthread", "uvicorn")
+
+
+def journeys():
+    """The anonymous journeys every client walks, as lists of paths."""
+    return {
+        "browse": [
+            reverse("home"),
+            reverse("round_list"),
+            reverse("results_list"),
+            reverse("leaderboard"),
+        ],
+        "search": [reverse("pet_search") + "?q=a"],
+        "api": [
+            reverse("api:active_rounds"),
+            reverse("api:completed_rounds"),
+            reverse("api:pet_leaderboard"),
+        ],
+    }
+
+
+def request_headers():
+    """
+    What the router in front of the app sends: an allowed host and the
+    proxy's HTTPS header, so SECURE_SSL_REDIRECT does not answer every
+    request with a redirect.
+    """
+    headers = {"Host": public_host()}
+    if settings.SECURE_PROXY_SSL_HEADER:
+        header, value = settings.SECURE_PROXY_SSL_HEADER
+        # "HTTP_X_FORWARDED_PROTO" is sent as "X-Forwarded-Proto".
+        name = header.removeprefix("HTTP_").replace("_", "-").title()
+        headers[name] = value
+    return headers
+
+
+class Command(BaseCommand):
+    help = (
+        "Start gunicorn with gunicorn.conf.py in each WEB_MODE against the "
+        "configured database and compare throughput, latency and memory "
+        "on the main anonymous journeys."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--modes",
+            default=",".join(MODES),
+            help="Comma-separated modes to compare (default: all).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=2,
+            help="Workers per server, the same for every mode.",
+        )
+        parser.add_argument("--clients", type=int, default=8)
+        parser.add_argument(
+            "--passes",
+            type=int,
+            default=20,
+            help="Times each client walks every journey.",
+        )
+        parser.add_argument("--port", type=int, default=8765)
+
+    def handle(self, *args, **options):
+        modes = [mode.strip() for mode in options["modes"].split(",")]
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f"Unknown modes: {', '.join(sorted(unknown))}")
+        paths = journeys()
+        self.stdout.write(
+            f"{options['clients']} clients x {options['passes']} passes of "
+            f"{', '.join(paths)}; {options['workers']} workers per server."
+        )
+        self.stdout.write(
+            f"{'mode':<9}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}"
+            f"{'p99 ms':>9}{'errors':>8}{'PSS MB':>9}{'/worker':>9}"
+        )
+        for mode in modes:
+            self._benchmark(mode, list(paths.values()), options)
+
+    def _benchmark(self, mode, paths, options):
+        base_url = f"http://127.0.0.1:{options['port']}"
+        with tempfile.TemporaryFile("w+") as log:
+            try:
+                with serve(
+                    mode,
+                    options["port"],
+                    options["workers"],
+                    settings.BASE_DIR,
+                    log,
+                ) as server:
+                    # One untimed pass, so every worker has imported the
+                    # views and filled its caches.
+                    headers = request_headers()
+                    run_load(
+                        base_url, paths, options["workers"] * 2, 1, headers
+                    )
+                    result = run_load(
+                        base_url,
+                        paths,
+                        options["clients"],
+                        options["passes"],
+                        headers,
+                    )
+                    total, per_worker = memory_kb(server.pid)
+            except ServerError as exc:
+                log.seek(0)
+                # gunicorn ends a failed boot's traceback with "]".
+                lines = [
+                    line for line in log.read().splitlines()
+                    if line.strip() not in ("", "]")
+                ]
+                self.stdout.write(self.style.ERROR(f"{mode:<9}{exc}"))
+                if lines:
+                    self.stdout.write(f"  {lines[-1].strip()}")
+                return
+
+        def megabytes(kb):
+            # Only measured where /proc is available.
+            return "-" if kb is None else f"{kb / 1024:.1f}"
+
+        self.stdout.write(
+            f"{mode:<9}{result['throughput']:>8.1f}"
+            f"{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}"
+            f"{result['p99_ms']:>9.1f}{result['errors']:>8}"
+            f"{megabytes(total):>9}{megabytes(per_worker):>9}"
+        )
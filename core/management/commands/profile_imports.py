@@ -0,0 +1,79 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.startup import cold_start, import_times
+
+
+class Command(BaseCommand):
+    help = (
+        "Import the WSGI application (or the given modules) in a fresh "
+        "interpreter and report the slowest imports, as python -X "
+        "importtime measures them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "modules",
+            nargs="*",
+            help="Modules to import (default: the WSGI application module).",
+        )
+        parser.add_argument(
+            "--urls",
+            action="store_true",
+            help="Also import ROOT_URLCONF, as the first request does.",
+        )
+        parser.add_argument(
+            "--sort",
+            choices=["cumulative", "self"],
+            default="cumulative",
+            help="Order modules by time including or excluding submodules.",
+        )
+        parser.add_argument(
+            "--by-package",
+            action="store_true",
+            help="Add up self time per top-level package.",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=25,
+            help="Number of rows to show.",
+        )
+
+    def handle(self, *args, **options):
+        modules = options["modules"] or [
+            settings.WSGI_APPLICATION.rsplit(".", 1)[0]
+        ]
+        if options["urls"]:
+            modules.append(settings.ROOT_URLCONF)
+
+        rows = import_times(modules)
+        if options["by_package"]:
+            totals = defaultdict(int)
+            for row in rows:
+                totals[row.module.split(".")[0]] += row.self_us
+            table = sorted(totals.items(), key=lambda item: -item[1])
+            self.stdout.write(f"{'self ms':>10}  package")
+            for name, self_us in table[:options["limit"]]:
+                self.stdout.write(f"{self_us / 1000:>10.1f}  {name}")
+        else:
+            key = "self_us" if options["sort"] == "self" else "cumulative_us"
+            table = sorted(rows, key=lambda row: -getattr(row, key))
+            self.stdout.write(f"{'self ms':>10}{'cumul. ms':>11}  module")
+            for row in table[:options["limit"]]:
+                self.stdout.write(
+                    f"{row.self_us / 1000:>10.1f}"
+                    f"{row.cumulative_us / 1000:>11.1f}  "
+                    f"{'  ' * row.depth}{row.module}"
+                )
+
+        seconds, _packages = cold_start(modules)
+        budget = settings.STARTUP_BUDGET_SECONDS
+        message = (
+            f"Cold start of {', '.join(modules)}: {seconds:.3f}s "
+            f"(budget {budget:.1f}s)."
+        )
+        style = self.style.SUCCESS if seconds <= budget else self.style.ERROR
+        self.stdout.write(style(message))
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.slow_queries import aggregate, read_log
+
+
+GROUPINGS = {
+    "both": ("fingerprint", "site"),
+    "fingerprint": ("fingerprint",),
+    "site": ("site",),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Aggregate the slow queries recorded in SLOW_QUERY_LOG by SQL "
+        "fingerprint and calling code, slowest total time first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--file",
+            default=settings.SLOW_QUERY_LOG,
+            help="JSON lines log to read (default: SLOW_QUERY_LOG).",
+        )
+        parser.add_argument(
+            "--by",
+            choices=sorted(GROUPINGS),
+            default="both",
+            help="Group by fingerprint, call site, or both.",
+        )
+        parser.add_argument(
+            "--since",
+            type=float,
+            help="Only samples from the last SINCE hours.",
+        )
+        parser.add_argument(
+            "--min-ms",
+            type=float,
+            default=0,
+            help="Ignore samples faster than this.",
+        )
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument(
+            "--width",
+            type=int,
+            default=120,
+            help="Truncate SQL to this many characters (0: no limit).",
+        )
+
+    def handle(self, *args, **options):
+        if not options["file"]:
+            raise CommandError(
+                "No log to read: set SLOW_QUERY_LOG or pass --file."
+            )
+        try:
+            samples = read_log(options["file"])
+        except FileNotFoundError as exc:
+            raise CommandError(f"{options['file']} does not exist.") from exc
+
+        if options["since"] is not None:
+            cutoff = timezone.now() - timedelta(hours=options["since"])
+            samples = [
+                sample for sample in samples
+                if datetime.fromisoformat(sample["at"]) >= cutoff
+            ]
+        samples = [
+            sample for sample in samples if sample["ms"] >= options["min_ms"]
+        ]
+        if not samples:
+            self.stdout.write("No slow queries recorded.")
+            return
+
+        rows = aggregate(samples, GROUPINGS[options["by"]])
+        self.stdout.write(
+            f"{len(samples)} samples in {len(rows)} groups "
+            f"(showing {min(len(rows), options['limit'])})."
+        )
+        width = options["width"]
+        for row in rows[:options["limit"]]:
+            self.stdout.write("")
+            self.stdout.write(
+                f"{row['count']:>6}x  total {row['total_ms']:.0f} ms  "
+                f"mean {row['mean_ms']:.1f} ms  max {row['max_ms']:.1f} ms"
+            )
+            if row["site"]:
+                self.stdout.write(f"        at {row['site']}")
+            if row["sql"]:
+                sql = row["sql"]
+                if width and len(sql) > width:
+                    sql = sql[:width - 3] + "..."
+                self.stdout.write(f"        [{row['fingerprint']}] {sql}")
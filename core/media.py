@@ -0,0 +1,129 @@
+"""
+Serving user uploads from local storage.
+
+With ``MEDIA_STORAGE = "local"`` photos live under ``MEDIA_ROOT`` and their
+URLs point at ``serve_media``. The view only checks the path and answers
+conditional requests; with ``MEDIA_SENDFILE`` set it leaves the transfer,
+ranges included, to nginx (``X-Accel-Redirect``) or Apache
+(``X-Sendfile``), so no Python worker is held for the download. Without a
+front server it streams the file itself, honouring single byte ranges.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+
+CHUNK_SIZE = 64 * 1024
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _file_path(path):
+    if not isinstance(default_storage, FileSystemStorage):
+        raise Http404("Media is not stored locally.")
+    try:
+        full_path = default_storage.path(path)
+    except SuspiciousFileOperation as exc:
+        raise Http404("No such file.") from exc
+    if not os.path.isfile(full_path):
+        raise Http404("No such file.")
+    return full_path
+
+
+def parse_range(header, size):
+    """
+    ``(start, end)`` (inclusive) for a single satisfiable byte range, None
+    to send the whole file, or ValueError when the range cannot be met.
+    """
+    match = RANGE.match(header.replace(" ", ""))
+    if not match or match.groups() == ("", ""):
+        # Multiple or malformed ranges: the whole file is a valid answer.
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        start, end = max(size - int(last), 0), size - 1
+    if start > end or start >= size:
+        raise ValueError("Unsatisfiable range.")
+    return start, end
+
+
+def _read(full_path, start, length):
+    with open(full_path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _add_file_headers(response, content_type, etag, last_modified):
+    response["Content-Type"] = content_type
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    response["Accept-Ranges"] = "bytes"
+    patch_cache_control(
+        response, public=True, max_age=settings.MEDIA_CACHE_SECONDS
+    )
+
+
+@require_safe
+def serve_media(request, path):
+    full_path = _file_path(path)
+    stat = os.stat(full_path)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    last_modified = int(stat.st_mtime)
+    content_type = (
+        mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+    )
+
+    not_modified = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if not_modified is not None:
+        return not_modified
+
+    if settings.MEDIA_SENDFILE:
+        response = HttpResponse()
+        if settings.MEDIA_SENDFILE == "x-accel-redirect":
+            response["X-Accel-Redirect"] = (
+                settings.MEDIA_ACCEL_PREFIX + quote(path)
+            )
+        else:
+            response["X-Sendfile"] = full_path
+        _add_file_headers(response, content_type, etag, last_modified)
+        return response
+
+    size = stat.st_size
+    byte_range = None
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    if range_header and (if_range is None or if_range == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1 if size else 0
+    body = _read(full_path, start, length) if request.method == "GET" else []
+    response = StreamingHttpResponse(body, status=206 if byte_range else 200)
+    if byte_range:
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Content-Length"] = str(length)
+    _add_file_headers(response, content_type, etag, last_modified)
+    return response
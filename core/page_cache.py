@@ -0,0 +1,205 @@
+"""
+Full-page cache for anonymous visitors.
+
+Views opt in with ``cache_anonymous`` and label what they show with
+``tag(request, *keys)``: ``round:<id>``, ``entry:<id>``, or a collection
+such as ``rounds:active``. A stored page remembers the version of each of
+its tags, and ``purge(*keys)`` replaces those versions once the current
+transaction commits, so exactly the pages showing a changed object miss on
+their next request. With read replicas, a page rendered less than
+``REPLICA_PIN_SECONDS`` after a purge of one of its tags is served but not
+stored, since the replica may not have the change yet.
+
+Only GET and HEAD requests without a session, message or replica-pin
+cookie are served from or stored in the cache. A page is stored once per
+path and combination of the query parameters the cached views read
+(``KEY_PARAMS``); other parameters do not make new copies.
+
+CSRF tokens are cut out of a page before it is stored and the visitor's
+own token is put back on every hit. Pages without a token are also marked
+cacheable for a front proxy for ``PAGE_CACHE_PROXY_SECONDS``, with a
+``Surrogate-Key`` header carrying the same tags.
+"""
+import hashlib
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import patch_vary_headers
+from django.utils import timezone
+from django.utils.http import urlencode
+
+from .routers import PIN_COOKIE, replica_aliases
+
+
+CSRF_INPUT = re.compile(rb'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+CSRF_PLACEHOLDER = b"@@page-cache-csrf@@"
+MESSAGE_COOKIE = "messages"
+SAFE_METHODS = ("GET", "HEAD")
+# Query parameters that change what a cached view renders.
+KEY_PARAMS = re.compile(r"ajax|comments_\d+")
+
+
+def cache_anonymous(view):
+    """Let anonymous GET responses of ``view`` be served from the cache."""
+    view.cache_anonymous = True
+    return view
+
+
+def page_key(request):
+    params = sorted(
+        (name, value)
+        for name, value in request.GET.items()
+        if KEY_PARAMS.fullmatch(name)
+    )
+    path = f"{request.path}?{urlencode(params)}"
+    digest = hashlib.sha256(path.encode()).hexdigest()
+    return f"page-cache:page:{digest}"
+
+
+def tag_key(tag):
+    return f"page-cache:tag:{tag}"
+
+
+def storing(request):
+    """Whether the page being rendered for ``request`` will be cached."""
+    return getattr(request, "page_cache_tags", None) is not None
+
+
+def tag(request, *keys):
+    """Record that the page being rendered shows ``keys``."""
+    if storing(request):
+        request.page_cache_tags.update(keys)
+
+
+def expire_at(request, when):
+    """Keep the page no longer than until ``when`` (an aware datetime)."""
+    if not storing(request):
+        return
+    seconds = int((when - timezone.now()).total_seconds())
+    request.page_cache_timeout = max(
+        min(seconds, getattr(request, "page_cache_timeout", seconds)), 0
+    )
+
+
+def purge(*keys):
+    """Invalidate every cached page tagged with one of ``keys``."""
+    def bump():
+        version = time.time_ns()
+        cache.set_many(
+            {tag_key(key): version for key in keys}, timeout=None
+        )
+    transaction.on_commit(bump)
+
+
+def _current_versions(tags, initial):
+    keys = {tag_key(name): name for name in tags}
+    found = cache.get_many(keys)
+    # A tag without a version (new, or evicted) starts at ``initial``, so
+    # pages stored before an eviction no longer match.
+    missing = {key: initial for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def _bypass(request):
+    return (
+        request.method not in SAFE_METHODS
+        or settings.SESSION_COOKIE_NAME in request.COOKIES
+        or MESSAGE_COOKIE in request.COOKIES
+        or PIN_COOKIE in request.COOKIES
+    )
+
+
+def _add_headers(response, page, status):
+    response["X-Page-Cache"] = status
+    patch_vary_headers(response, ["Cookie"])
+    if page["csrf"]:
+        response["Cache-Control"] = "private, no-cache"
+        return
+    proxy_seconds = settings.PAGE_CACHE_PROXY_SECONDS
+    response["Cache-Control"] = f"public, max-age=0, s-maxage={proxy_seconds}"
+    response["Surrogate-Control"] = f"max-age={proxy_seconds}"
+    if page["tags"]:
+        response["Surrogate-Key"] = " ".join(sorted(page["tags"]))
+
+
+class PageCacheMiddleware:
+    """
+    Serve and store the pages of ``cache_anonymous`` views. Must come after
+    the session, CSRF and message middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if storing(request) and self._storable(response):
+            self._store(request, response, request.page_cache_tags)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not getattr(view_func, "cache_anonymous", False):
+            return None
+        if not settings.PAGE_CACHE_SECONDS or _bypass(request):
+            return None
+
+        page = cache.get(page_key(request))
+        if page is not None and page["tags"] == _current_versions(
+            page["tags"], time.time_ns()
+        ):
+            return self._hit(request, page)
+        request.page_cache_tags = set()
+        request.page_cache_started = time.time_ns()
+        return None
+
+    def _storable(self, response):
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and "private" not in response.get("Cache-Control", "")
+        )
+
+    def _store(self, request, response, tags):
+        # Views read from a replica, which may not show a purged change for
+        # up to REPLICA_PIN_SECONDS.
+        fresh_before = request.page_cache_started
+        if replica_aliases():
+            fresh_before -= settings.REPLICA_PIN_SECONDS * 10**9
+        versions = _current_versions(tags, fresh_before)
+        if any(version > fresh_before for version in versions.values()):
+            # Purged while this page was rendering, or too recently for
+            # the replica to have caught up: it may be stale.
+            return
+        content, substitutions = CSRF_INPUT.subn(
+            rb"\g<1>" + CSRF_PLACEHOLDER + rb"\g<2>", response.content
+        )
+        page = {
+            "content": content,
+            "content_type": response["Content-Type"],
+            "tags": versions,
+            "csrf": bool(substitutions),
+        }
+        timeout = getattr(
+            request, "page_cache_timeout", settings.PAGE_CACHE_SECONDS
+        )
+        if timeout:
+            cache.set(page_key(request), page, timeout)
+        _add_headers(response, page, "MISS")
+
+    def _hit(self, request, page):
+        content = page["content"]
+        if page["csrf"]:
+            content = content.replace(
+                CSRF_PLACEHOLDER, get_token(request).encode()
+            )
+        response = HttpResponse(content, content_type=page["content_type"])
+        _add_headers(response, page, "HIT")
+        return response
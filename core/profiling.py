@@ -0,0 +1,218 @@
+"""
+On-demand profiling of single requests by staff.
+
+A staff user adds ``?_profile=1`` to a URL, or sends an ``X-Profile``
+header (handy for POSTs such as running a draw), and that one request runs
+under cProfile with tracemalloc tracing and every SQL query recorded. The
+report (call statistics, the lines that allocated the most memory still
+held at the end of the request, and the queries) is kept in the cache for
+``PROFILING_KEEP_SECONDS`` and listed at ``/ops/profiles/``; the response
+carries its id in ``X-Profile-Id``. With ``PROFILING_DIR`` set, the raw
+``.prof`` file and the report are also written there, for snakeviz and
+friends.
+
+At most ``PROFILING_RATE_LIMIT`` requests are profiled per
+``PROFILING_RATE_WINDOW`` seconds across the site, and one at a time per
+process; other flagged requests are served normally with an ``X-Profile``
+header saying why. Requests without the flag only pay for a substring
+check on the query string and a header lookup.
+
+The rate limit and the report list live in the cache, so they only cover
+the whole site with ``SHARED_CACHE``. Without it the middleware switches
+itself off, except under ``DEBUG`` where there is a single process anyway.
+
+Only the work done until the view returns is profiled, not the body of a
+streaming response.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import secrets
+import threading
+import time
+import tracemalloc
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.urls import reverse
+from django.utils import timezone
+
+
+QUERY_PARAM = "_profile"
+HEADER = "X-Profile"
+INDEX_KEY = "profiling:index"
+STATS_LINES = 60
+TOP_ALLOCATIONS = 25
+TRACEBACK_FRAMES = 10
+
+_running = threading.Lock()
+
+
+def report_key(report_id):
+    return f"profiling:report:{report_id}"
+
+
+def requested(request):
+    return (
+        QUERY_PARAM in request.META.get("QUERY_STRING", "")
+        and QUERY_PARAM in request.GET
+    ) or HEADER in request.headers
+
+
+def _allowed():
+    """Count one profile against the site-wide rate limit."""
+    window = settings.PROFILING_RATE_WINDOW
+    key = f"profiling:rate:{int(time.time() // window)}"
+    cache.add(key, 0, window)
+    try:
+        return cache.incr(key) <= settings.PROFILING_RATE_LIMIT
+    except ValueError:
+        # Expired between add and incr.
+        return cache.add(key, 1, window)
+
+
+def _stats_text(profiler, sort):
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.sort_stats(sort).print_stats(STATS_LINES)
+    return output.getvalue()
+
+
+def _allocations(before, after):
+    ignore = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*"),
+    ]
+    differences = after.filter_traces(ignore).compare_to(
+        before.filter_traces(ignore), "traceback"
+    )
+    return [
+        {
+            "size_kb": round(stat.size_diff / 1024, 1),
+            "count": stat.count_diff,
+            "traceback": stat.traceback.format(most_recent_first=True),
+        }
+        for stat in differences[:TOP_ALLOCATIONS]
+        if stat.size_diff > 0
+    ]
+
+
+def _save(report, profiler):
+    summary = {
+        name: report[name]
+        for name in ("id", "created", "method", "path", "user", "status")
+    }
+    summary["seconds"] = report["seconds"]
+    summary["query_count"] = len(report["queries"])
+    timeout = settings.PROFILING_KEEP_SECONDS
+    cache.set(report_key(report["id"]), report, timeout)
+    index = [summary] + cache.get(INDEX_KEY, [])
+    cache.set(INDEX_KEY, index[:settings.PROFILING_KEEP], timeout)
+
+    if settings.PROFILING_DIR:
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        base = os.path.join(settings.PROFILING_DIR, report["id"])
+        profiler.dump_stats(f"{base}.prof")
+        with open(f"{base}.json", "w") as f:
+            json.dump(report, f, indent=1)
+
+
+def recent_reports():
+    """Summaries of the kept reports, newest first."""
+    return cache.get(INDEX_KEY, [])
+
+
+def get_report(report_id):
+    return cache.get(report_key(report_id))
+
+
+def profile_request(request, get_response):
+    """Run ``get_response(request)`` under the profilers; save a report."""
+    queries = []
+
+    def record_query(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            queries.append({
+                "alias": context["connection"].alias,
+                "sql": sql,
+                "ms": round((time.perf_counter() - started) * 1000, 2),
+            })
+
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start(TRACEBACK_FRAMES)
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(record_query))
+            profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                profiler.disable()
+        seconds = time.perf_counter() - started
+        after = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+    report = {
+        "id": f"{int(time.time())}-{secrets.token_hex(4)}",
+        "created": timezone.now().isoformat(),
+        "method": request.method,
+        "path": request.get_full_path(),
+        "user": request.user.get_username(),
+        "status": response.status_code,
+        "seconds": round(seconds, 4),
+        "peak_kb": round(peak / 1024, 1),
+        "cumulative": _stats_text(profiler, "cumulative"),
+        "internal": _stats_text(profiler, "tottime"),
+        "allocations": _allocations(before, after),
+        "queries": queries,
+        "query_ms": round(sum(query["ms"] for query in queries), 2),
+    }
+    _save(report, profiler)
+    response[HEADER + "-Id"] = report["id"]
+    response[HEADER + "-Url"] = reverse(
+        "request_profile", args=[report["id"]]
+    )
+    return response
+
+
+class ProfilingMiddleware:
+    """Profile flagged requests from staff; must come after authentication."""
+
+    def __init__(self, get_response):
+        if not (settings.SHARED_CACHE or settings.DEBUG):
+            raise MiddlewareNotUsed("Profiling needs SHARED_CACHE.")
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not requested(request) or not request.user.is_staff:
+            return self.get_response(request)
+        if not _running.acquire(blocking=False):
+            reason = "busy"
+        elif not _allowed():
+            _running.release()
+            reason = "rate-limited"
+        else:
+            try:
+                return profile_request(request, self.get_response)
+            finally:
+                _running.release()
+        response = self.get_response(request)
+        response[HEADER] = reason
+        return response
@@ -0,0 +1,89 @@
+"""
+Read-replica routing.
+
+When ``DATABASE_REPLICA_URL`` is set, views wrapped in ``use_replica`` read
+from a replica on GET and HEAD requests; every other query, and anything
+inside a transaction, goes to ``default``. After a user's write request
+``PrimaryPinningMiddleware`` sets a short-lived cookie that keeps their
+reads on the primary, so they always see their own changes despite
+replication lag.
+"""
+import random
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+PIN_COOKIE = "pin_primary"
+SAFE_METHODS = ("GET", "HEAD")
+
+_read_from_replica = ContextVar("read_from_replica", default=False)
+_pinned_to_primary = ContextVar("pinned_to_primary", default=False)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+
+
+def use_replica(view):
+    """Let a read-only view's GET requests query a replica."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return view(request, *args, **kwargs)
+        token = _read_from_replica.set(True)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _read_from_replica.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _read_from_replica.get() or _pinned_to_primary.get():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replicas = replica_aliases()
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class PrimaryPinningMiddleware:
+    """
+    Keep a client's reads on the primary for ``REPLICA_PIN_SECONDS`` after
+    it sends a write request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _pinned_to_primary.set(PIN_COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            _pinned_to_primary.reset(token)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+                secure=request.is_secure(),
+            )
+        return response
@@ -0,0 +1,169 @@
+"""
+Recording slow SQL together with the code that ran it.
+
+``install`` runs for every new database connection (``connection_created``)
+and adds ``record`` to the connection's execute wrappers. A query that takes
+at least ``SLOW_QUERY_MS`` milliseconds is sampled with probability
+``SLOW_QUERY_SAMPLE_RATE``: the sample holds the query's fingerprint (the
+SQL with literals and placeholder lists collapsed, so one ORM call site
+gives one fingerprint), its duration, the database alias and the innermost
+frames of ``lottery`` and ``core`` code on the stack.
+
+Samples go to a per-process ring buffer of ``SLOW_QUERY_BUFFER`` entries,
+shown to staff at ``/ops/slow-queries/``, and, with ``SLOW_QUERY_LOG`` set,
+are appended to that file as JSON lines for ``manage.py slow_queries`` to
+aggregate across workers and restarts. Fast queries only pay for two clock
+reads.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.utils import timezone
+
+
+APP_PACKAGES = ("lottery", "core")
+SITE_FRAMES = 3
+
+_buffer = deque(maxlen=settings.SLOW_QUERY_BUFFER)
+_log_lock = threading.Lock()
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r"(?<![\w\"])-?\d+(?:\.\d+)?\b")
+PLACEHOLDER = re.compile(r"%s|\?")
+PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+VALUES_LIST = re.compile(r"(\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+")
+WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """``sql`` with literals replaced by ``?`` and lists collapsed."""
+    sql = STRING_LITERAL.sub("?", sql)
+    sql = NUMBER.sub("?", sql)
+    sql = PLACEHOLDER.sub("?", sql)
+    sql = PLACEHOLDER_LIST.sub("(...)", sql)
+    # Multi-row INSERT ... VALUES (...), (...), ...
+    sql = VALUES_LIST.sub(r"\1", sql)
+    return WHITESPACE.sub(" ", sql).strip()
+
+
+def fingerprint_id(text):
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+def _app_roots():
+    return [
+        os.path.join(str(settings.BASE_DIR), package) + os.sep
+        for package in APP_PACKAGES
+    ]
+
+
+def call_site(frame):
+    """``["lottery/views.py:120 in profile", ...]``, innermost first."""
+    roots = _app_roots()
+    base = str(settings.BASE_DIR) + os.sep
+    sites = []
+    while frame is not None and len(sites) < SITE_FRAMES:
+        filename = frame.f_code.co_filename
+        if filename != __file__ and filename.startswith(tuple(roots)):
+            sites.append(
+                f"{filename[len(base):]}:{frame.f_lineno} "
+                f"in {frame.f_code.co_name}"
+            )
+        frame = frame.f_back
+    return sites
+
+
+def _append_to_log(sample):
+    line = json.dumps(sample) + "\n"
+    with _log_lock:
+        with open(settings.SLOW_QUERY_LOG, "a") as f:
+            f.write(line)
+
+
+def record(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        ms = (time.perf_counter() - started) * 1000
+        if (
+            ms >= settings.SLOW_QUERY_MS
+            and random.random() < settings.SLOW_QUERY_SAMPLE_RATE
+        ):
+            text = fingerprint(sql)
+            sample = {
+                "at": timezone.now().isoformat(),
+                "ms": round(ms, 2),
+                "alias": context["connection"].alias,
+                "fingerprint": fingerprint_id(text),
+                "sql": text,
+                "many": many,
+                "sites": call_site(sys._getframe(1)),
+            }
+            _buffer.append(sample)
+            if settings.SLOW_QUERY_LOG:
+                _append_to_log(sample)
+
+
+def install(sender, connection, **kwargs):
+    """``connection_created`` receiver."""
+    if record not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record)
+
+
+def recent():
+    """This process's buffered samples, oldest first."""
+    return list(_buffer)
+
+
+def read_log(path):
+    samples = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    samples.append(json.loads(line))
+                except ValueError:
+                    # A line cut short by a crash.
+                    continue
+    return samples
+
+
+def aggregate(samples, by=("fingerprint", "site")):
+    """
+    Group samples by fingerprint and/or innermost call site, slowest total
+    first: ``[{"fingerprint", "sql", "site", "count", "total_ms",
+    "mean_ms", "max_ms"}, ...]``.
+    """
+    groups = {}
+    for sample in samples:
+        site = sample["sites"][0] if sample["sites"] else "(outside the app)"
+        key = (
+            sample["fingerprint"] if "fingerprint" in by else None,
+            site if "site" in by else None,
+        )
+        group = groups.setdefault(key, {
+            "fingerprint": key[0],
+            "sql": sample["sql"] if key[0] else None,
+            "site": key[1],
+            "count": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+        })
+        group["count"] += 1
+        group["total_ms"] += sample["ms"]
+        group["max_ms"] = max(group["max_ms"], sample["ms"])
+    rows = sorted(groups.values(), key=lambda group: -group["total_ms"])
+    for row in rows:
+        row["total_ms"] = round(row["total_ms"], 2)
+        row["mean_ms"] = round(row["total_ms"] / row["count"], 2)
+    return rows
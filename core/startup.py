@@ -0,0 +1,83 @@
+"""
+Measuring how long a worker takes to start.
+
+Both helpers import modules in a fresh interpreter, with the current
+environment, so nothing this process has already imported is counted:
+``import_times`` parses the output of ``python -X importtime`` and
+``cold_start`` returns the wall time of the imports together with the
+top-level packages they loaded. ``manage.py profile_imports`` reports the
+former; ``STARTUP_BUDGET_SECONDS`` bounds the latter in the tests.
+
+Third-party packages that are only needed by some requests (Pillow, the
+Cloudinary SDK, crispy forms' layout helpers) are imported where they are
+used, so they are not part of a worker's boot.
+"""
+import json
+import subprocess
+import sys
+from dataclasses import dataclass
+
+
+@dataclass
+class ImportTime:
+    module: str
+    depth: int
+    self_us: int
+    cumulative_us: int
+
+
+def _run(code, *options):
+    return subprocess.run(
+        [sys.executable, *options, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def _import_code(modules):
+    return "; ".join(f"import {module}" for module in modules)
+
+
+def parse_importtime(text):
+    """``ImportTime`` rows for the ``import time:`` lines in ``text``."""
+    rows = []
+    for line in text.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            # The header line.
+            continue
+        # Nested imports are indented by two spaces per level.
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append(
+            ImportTime(
+                name.strip(), depth, int(self_us), int(cumulative_us)
+            )
+        )
+    return rows
+
+
+def import_times(modules):
+    """``ImportTime`` rows for importing ``modules`` in a new interpreter."""
+    result = _run(_import_code(modules), "-X", "importtime")
+    return parse_importtime(result.stderr)
+
+
+def cold_start(modules):
+    """
+    ``(seconds, packages)``: the wall time of importing ``modules`` in a new
+    interpreter and the top-level packages that were loaded by it.
+    """
+    code = (
+        "import sys, time, json; before = set(sys.modules); "
+        "started = time.perf_counter(); "
+        f"{_import_code(modules)}; "
+        "seconds = time.perf_counter() - started; "
+        "loaded = {name.split('.')[0] for name in sys.modules} - before; "
+        "print(json.dumps([seconds, sorted(loaded)]))"
+    )
+    output = _run(code).stdout.strip().splitlines()[-1]
+    seconds, packages = json.loads(output)
+    return seconds, set(packages)
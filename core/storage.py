@@ -0,0 +1,16 @@
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class PipelineStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """
+    Content-hashed, gzip/brotli pre-compressed static files.
+
+    Falls back to the plain file name when collectstatic has not been run
+    (local development, the test suite), instead of raising.
+    """
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
@@ -0,0 +1,16 @@
+from django import template
+
+from core import assets
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def vendor_url(name):
+    return assets.vendor_url(name)
+
+
+@register.simple_tag
+def bundle_urls(name):
+    return assets.bundle_urls(name)
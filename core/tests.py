@@ -1,13 +1,50 @@
-from django.test import TestCase
+import io
+import os
+import runpy
+import shutil
+import sqlite3
+import tempfile
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import (
+    Client,
+    LiveServerTestCase,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.conf import settings as django_settings
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from core import (
+    assets,
+    benchmark,
+    health,
+    page_cache,
+    profiling,
+    routers,
+    slow_queries,
+    startup,
+)
 from core.forms import ContactForm
+from core.user_cache import user_cache_key
+from lottery import pets
+from lottery.models import Comment, Entry, LotteryRound, Pet
 
 User = get_user_model()
 
 
 class CorePageTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user(
             username="testuser",
             email="testuser@example.com",
@@ -54,3 +91,813 @@ class CorePageTests(TestCase):
         }, follow=True)
         self.assertContains(response, "Please correct the errors below.")
         self.assertTrue(response.context["contact_form"].errors)
+
+
+class StaticAssetPipelineTests(TestCase):
+    def setUp(self):
+        assets.is_built.cache_clear()
+
+    def test_minify_css_strips_comments_and_whitespace(self):
+        css = "/* heading */\n.card  {\n  color: red;\n  margin: 0 auto;\n}\n"
+        self.assertEqual(
+            assets.minify_css(css), ".card{color:red;margin:0 auto}"
+        )
+
+    def test_minify_js_keeps_statements_on_separate_lines(self):
+        js = "/* jshint esversion: 6 */\n// comment\n  const a = 1;\n\n  a;\n"
+        self.assertEqual(assets.minify_js(js), "const a = 1;\na;")
+
+    def test_unbuilt_assets_fall_back_to_cdn_and_sources(self):
+        response = self.client.get(reverse("home"))
+        self.assertContains(response, "cdn.jsdelivr.net/npm/bootstrap")
+        self.assertContains(response, "js/common.js")
+        self.assertContains(response, "js/home.js")
+
+
+STOCK_AUTH_MIDDLEWARE = [
+    "django.contrib.auth.middleware.AuthenticationMiddleware"
+    if m == "core.middleware.CachedAuthenticationMiddleware"
+    else m
+    for m in django_settings.MIDDLEWARE
+]
+CACHED_AUTH_MIDDLEWARE = [
+    "core.middleware.CachedAuthenticationMiddleware"
+    if m == "django.contrib.auth.middleware.AuthenticationMiddleware"
+    else m
+    for m in django_settings.MIDDLEWARE
+]
+
+
+@override_settings(
+    SHARED_CACHE=True,
+    SESSION_ENGINE="django.contrib.sessions.backends.cached_db",
+    MIDDLEWARE=CACHED_AUTH_MIDDLEWARE,
+)
+class CachedAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="cacheduser", password="testpassword123"
+        )
+
+    def _warm_query_count(self, **settings):
+        """Queries for an authenticated home hit once caches are warm."""
+        with self.settings(**settings):
+            client = Client()
+            client.login(username="cacheduser", password="testpassword123")
+            client.get(reverse("home"))
+            with CaptureQueriesContext(connection) as queries:
+                client.get(reverse("home"))
+        return len(queries)
+
+    def test_cached_auth_saves_two_queries_per_request(self):
+        baseline = self._warm_query_count(
+            SESSION_ENGINE="django.contrib.sessions.backends.db",
+            MIDDLEWARE=STOCK_AUTH_MIDDLEWARE,
+        )
+        cached = self._warm_query_count()
+        self.assertLessEqual(cached, baseline - 2)
+
+    def test_user_cache_is_invalidated_on_save(self):
+        self.client.login(username="cacheduser", password="testpassword123")
+        self.client.get(reverse("home"))
+        self.assertIsNotNone(cache.get(user_cache_key(self.user.pk)))
+
+        self.user.first_name = "Changed"
+        self.user.save()
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+
+    def test_password_change_logs_out_cached_session(self):
+        self.client.login(username="cacheduser", password="testpassword123")
+        self.client.get(reverse("home"))
+
+        self.user.set_password("anotherpassword456")
+        self.user.save()
+        response = self.client.get(reverse("home"))
+        self.assertContains(response, "Login")
+
+    def test_inactive_cached_user_is_not_trusted(self):
+        self.client.login(username="cacheduser", password="testpassword123")
+        self.client.get(reverse("home"))
+        key = user_cache_key(self.user.pk)
+        user = cache.get(key)
+        user.is_active = False
+        cache.set(key, user)
+        # Without signals, as a bulk update or another app would do it.
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+
+        response = self.client.get(reverse("home"))
+        self.assertContains(response, "Login")
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        self.factory = RequestFactory()
+        patcher = mock.patch.object(
+            routers, "replica_aliases", return_value=["replica"]
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def read_db_in_view(self, method="get", pinned=False):
+        @routers.use_replica
+        def view(request):
+            return HttpResponse(self.router.db_for_read(User))
+
+        request = getattr(self.factory, method)("/")
+        if pinned:
+            request.COOKIES[routers.PIN_COOKIE] = "1"
+        middleware = routers.PrimaryPinningMiddleware(view)
+        return middleware(request)
+
+    def test_marked_get_reads_from_replica(self):
+        self.assertEqual(self.read_db_in_view().content, b"replica")
+        self.assertEqual(self.router.db_for_read(User), "default")
+        self.assertEqual(self.router.db_for_write(User), "default")
+
+    def test_writes_pin_client_to_primary(self):
+        response = self.read_db_in_view(method="post")
+        self.assertEqual(response.content, b"default")
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+        pinned = self.read_db_in_view(pinned=True)
+        self.assertEqual(pinned.content, b"default")
+
+
+@skipUnless(
+    "replica" in django_settings.DATABASES,
+    "Set DATABASE_REPLICA_URL to run the replica routing tests.",
+)
+class ReplicaRoutingIntegrationTests(TransactionTestCase):
+    databases = "__all__"
+
+    def test_home_reads_replica_until_user_writes(self):
+        User.objects.create_user(username="reader", password="pw12345!")
+        self.client.login(username="reader", password="pw12345!")
+        self.client.get(reverse("about"))
+
+        with CaptureQueriesContext(connections["replica"]) as replica:
+            self.client.get(reverse("home"))
+        self.assertTrue(replica.captured_queries)
+
+        response = self.client.post(reverse("home"), {"name": ""})
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+        with CaptureQueriesContext(connections["replica"]) as replica:
+            self.client.get(reverse("home"))
+        self.assertEqual(replica.captured_queries, [])
+
+
+@override_settings(
+    DATABASE_ROUTERS=["core.routers.ReplicaRouter"],
+    MIDDLEWARE=[
+        *django_settings.MIDDLEWARE,
+        "core.routers.PrimaryPinningMiddleware",
+    ],
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Routing against a real second database: a file copy of the test
+    database which, unlike a MIRROR alias, only the test itself changes.
+    """
+
+    def setUp(self):
+        User.objects.create_user(username="reader", password="pw12345!")
+        self.client.login(username="reader", password="pw12345!")
+        now = timezone.now()
+        fd, path = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        connection.ensure_connection()
+        target = sqlite3.connect(path)
+        connection.connection.backup(target)
+        target.close()
+
+        connections.settings["replica"] = {
+            **connections.settings["default"],
+            "NAME": path,
+        }
+        self.addCleanup(connections.settings.pop, "replica")
+        self.addCleanup(connections.__delitem__, "replica")
+        self.addCleanup(connections["replica"].close)
+        patcher = mock.patch.object(
+            routers, "replica_aliases", return_value=["replica"]
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # A round only the replica has shows where a page was read from.
+        LotteryRound.objects.using("replica").create(
+            title="Replica Round",
+            start_date=now - timezone.timedelta(days=1),
+            end_date=now + timezone.timedelta(days=1),
+            status=LotteryRound.Status.ACTIVE,
+        )
+
+    def test_reads_use_replica_until_user_writes(self):
+        self.assertContains(
+            self.client.get(reverse("round_list")), "Replica Round"
+        )
+
+        response = self.client.post(reverse("home"), {"name": ""})
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+        self.assertNotContains(
+            self.client.get(reverse("round_list")), "Replica Round"
+        )
+
+    def test_writes_go_to_primary(self):
+        LotteryRound.objects.create(
+            title="Primary Round",
+            start_date=timezone.now(),
+            end_date=timezone.now(),
+        )
+        self.assertFalse(
+            LotteryRound.objects.using("replica")
+            .filter(title="Primary Round")
+            .exists()
+        )
+
+
+@override_settings(PAGE_CACHE_SECONDS=600)
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="fan", password="pass12345"
+        )
+        pet = Pet.objects.create(owner=self.user, name="Nova", age="2")
+        now = timezone.now()
+        self.round = LotteryRound.objects.create(
+            title="Finished",
+            start_date=now - timezone.timedelta(days=3),
+            end_date=now - timezone.timedelta(days=1),
+            status=LotteryRound.Status.COMPLETED,
+            drawn_at=now,
+        )
+        self.entry = Entry.objects.create(
+            pet=pet,
+            round=self.round,
+            photo="pet_entries/nova.png",
+            status=Entry.Status.APPROVED,
+            is_winner=True,
+            winner_rank=1,
+        )
+
+    def test_second_anonymous_request_is_served_from_cache(self):
+        first = self.client.get(reverse("results_list"))
+        self.assertEqual(first["X-Page-Cache"], "MISS")
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse("results_list"))
+        self.assertEqual(second["X-Page-Cache"], "HIT")
+        self.assertEqual(second.content, first.content)
+        self.assertIn("rounds:completed", second["Surrogate-Key"])
+        self.assertIn(f"entry:{self.entry.id}", second["Surrogate-Key"])
+        self.assertIn("s-maxage", second["Cache-Control"])
+
+    def test_only_parameters_the_views_read_make_new_copies(self):
+        url = reverse("results_list")
+        self.client.get(url, {"utm_source": "mail"})
+        resp = self.client.get(url, {"utm_source": "feed", "x": "1"})
+        self.assertEqual(resp["X-Page-Cache"], "HIT")
+        resp = self.client.get(url, {f"comments_{self.entry.id}": "2"})
+        self.assertEqual(resp["X-Page-Cache"], "MISS")
+
+    def test_csrf_token_is_substituted_per_visitor(self):
+        self.client.get(reverse("home"))
+        visitor = Client(enforce_csrf_checks=True)
+        resp = visitor.get(reverse("home"))
+        self.assertEqual(resp["X-Page-Cache"], "HIT")
+        self.assertNotIn(page_cache.CSRF_PLACEHOLDER, resp.content)
+        self.assertIn("private", resp["Cache-Control"])
+        self.assertNotIn("Surrogate-Key", resp)
+        token = resp.content.split(
+            b'name="csrfmiddlewaretoken" value="'
+        )[1].split(b'"')[0]
+        posted = visitor.post(
+            reverse("home"),
+            {"csrfmiddlewaretoken": token.decode(), "name": ""},
+        )
+        self.assertEqual(posted.status_code, 200)
+
+    def test_logged_in_requests_bypass_the_cache(self):
+        self.client.get(reverse("about"))
+        self.client.login(username="fan", password="pass12345")
+        resp = self.client.get(reverse("about"))
+        self.assertNotIn("X-Page-Cache", resp)
+
+    def test_new_comment_purges_pages_showing_the_entry(self):
+        self.client.get(reverse("results_list"))
+        self.client.get(reverse("about"))
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(
+                entry=self.entry, author=self.user, text="Congrats!"
+            )
+        self.assertEqual(
+            self.client.get(reverse("results_list"))["X-Page-Cache"], "MISS"
+        )
+        self.assertEqual(
+            self.client.get(reverse("about"))["X-Page-Cache"], "HIT"
+        )
+
+    def test_new_round_purges_round_list_only(self):
+        self.client.get(reverse("round_list"))
+        self.client.get(reverse("results_list"))
+        now = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            LotteryRound.objects.create(
+                title="Fresh",
+                start_date=now - timezone.timedelta(hours=1),
+                end_date=now + timezone.timedelta(days=1),
+            )
+        resp = self.client.get(reverse("round_list"))
+        self.assertEqual(resp["X-Page-Cache"], "MISS")
+        self.assertContains(resp, "Fresh")
+        self.assertEqual(
+            self.client.get(reverse("results_list"))["X-Page-Cache"], "HIT"
+        )
+
+    def test_pet_and_entry_changes_purge_pages_showing_them(self):
+        url = reverse("results_list")
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.entry.pet.breed = "Husky"
+            self.entry.pet.save()
+        resp = self.client.get(url)
+        self.assertEqual(resp["X-Page-Cache"], "MISS")
+        self.assertContains(resp, "Husky")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.entry.photo = "pet_entries/nova-2.png"
+            self.entry.save()
+        self.assertEqual(self.client.get(url)["X-Page-Cache"], "MISS")
+
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            pets.upsert_pet(self.user.id, "Nova", "Samoyed", "3")
+        resp = self.client.get(url)
+        self.assertEqual(resp["X-Page-Cache"], "MISS")
+        self.assertContains(resp, "Samoyed")
+
+    def test_draw_purges_results(self):
+        self.client.get(reverse("results_list"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.round.title = "Finished and drawn"
+            self.round.save()
+        resp = self.client.get(reverse("results_list"))
+        self.assertEqual(resp["X-Page-Cache"], "MISS")
+        self.assertContains(resp, "Finished and drawn")
+
+    def test_page_purged_while_rendering_is_not_stored(self):
+        def purge_midway(request):
+            page_cache.tag(request, "rounds:completed")
+            with self.captureOnCommitCallbacks(execute=True):
+                page_cache.purge("rounds:completed")
+            return HttpResponse("stale")
+
+        view = page_cache.cache_anonymous(purge_midway)
+        middleware = page_cache.PageCacheMiddleware(lambda request: None)
+        request = RequestFactory().get("/stale/")
+        middleware.process_view(request, view, (), {})
+        middleware._store(request, view(request), request.page_cache_tags)
+        self.assertIsNone(cache.get(page_cache.page_key(request)))
+
+    def test_page_purged_within_replica_lag_is_not_stored(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            page_cache.purge(f"entry:{self.entry.id}")
+        url = reverse("results_list")
+        with mock.patch.object(
+            page_cache, "replica_aliases", return_value=["replica"]
+        ):
+            # Rendered, but not stored: the replica may still be behind.
+            self.assertNotIn("X-Page-Cache", self.client.get(url))
+            self.assertNotIn("X-Page-Cache", self.client.get(url))
+            with override_settings(REPLICA_PIN_SECONDS=0):
+                self.client.get(url)
+                self.assertEqual(
+                    self.client.get(url)["X-Page-Cache"], "HIT"
+                )
+
+
+LOCAL_STORAGES = {
+    **django_settings.STORAGES,
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+}
+
+
+@override_settings(STORAGES=LOCAL_STORAGES, MEDIA_SENDFILE="")
+class MediaServingTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        os.makedirs(os.path.join(self.media_root, "pet_entries"))
+        with open(
+            os.path.join(self.media_root, "pet_entries", "cat.png"), "wb"
+        ) as f:
+            f.write(b"0123456789")
+        self.url = "/media/pet_entries/cat.png"
+
+    def body(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_serves_whole_file_with_cache_headers(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.body(resp), b"0123456789")
+        self.assertEqual(resp["Content-Type"], "image/png")
+        self.assertEqual(resp["Accept-Ranges"], "bytes")
+        self.assertIn("public", resp["Cache-Control"])
+        self.assertIn("max-age=86400", resp["Cache-Control"])
+
+    def test_byte_ranges(self):
+        resp = self.client.get(self.url, HTTP_RANGE="bytes=2-5")
+        self.assertEqual(resp.status_code, 206)
+        self.assertEqual(self.body(resp), b"2345")
+        self.assertEqual(resp["Content-Range"], "bytes 2-5/10")
+
+        resp = self.client.get(self.url, HTTP_RANGE="bytes=-3")
+        self.assertEqual(self.body(resp), b"789")
+
+        resp = self.client.get(self.url, HTTP_RANGE="bytes=20-")
+        self.assertEqual(resp.status_code, 416)
+        self.assertEqual(resp["Content-Range"], "bytes */10")
+
+    def test_stale_if_range_sends_whole_file(self):
+        resp = self.client.get(
+            self.url, HTTP_RANGE="bytes=2-5", HTTP_IF_RANGE='"old"'
+        )
+        self.assertEqual(resp.status_code, 200)
+
+    def test_conditional_request_is_not_modified(self):
+        etag = self.client.get(self.url)["ETag"]
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+
+    @override_settings(MEDIA_SENDFILE="x-accel-redirect")
+    def test_hands_transfer_to_nginx(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(
+            resp["X-Accel-Redirect"], "/protected-media/pet_entries/cat.png"
+        )
+        self.assertEqual(resp.content, b"")
+        self.assertEqual(resp["Content-Type"], "image/png")
+
+    @override_settings(MEDIA_SENDFILE="x-sendfile")
+    def test_hands_transfer_to_apache(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(
+            resp["X-Sendfile"],
+            os.path.join(self.media_root, "pet_entries", "cat.png"),
+        )
+
+    def test_rejects_paths_outside_media_root(self):
+        self.assertEqual(
+            self.client.get("/media/../settings.py").status_code, 404
+        )
+        self.assertEqual(
+            self.client.get("/media/pet_entries/missing.png").status_code,
+            404,
+        )
+
+    @override_settings(
+        STORAGES={
+            **LOCAL_STORAGES,
+            "default": {
+                "BACKEND": "django.core.files.storage.InMemoryStorage"
+            },
+        }
+    )
+    def test_not_found_unless_storage_is_local(self):
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class StartupTests(SimpleTestCase):
+    def test_parses_importtime_output(self):
+        rows = startup.parse_importtime(
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   django.utils\n"
+            "import time:       300 |        420 | django\n"
+        )
+        self.assertEqual(
+            [(row.module, row.depth, row.self_us) for row in rows],
+            [("django.utils", 1, 120), ("django", 0, 300)],
+        )
+
+    def test_wsgi_cold_start_within_budget(self):
+        # Best of three, so a busy machine does not fail the test.
+        runs = [startup.cold_start(["config.wsgi"]) for _ in range(3)]
+        seconds = min(seconds for seconds, _packages in runs)
+        self.assertLessEqual(
+            seconds, django_settings.STARTUP_BUDGET_SECONDS
+        )
+        # Only needed by the requests that use them.
+        self.assertFalse({"PIL", "cloudinary"} & runs[0][1])
+
+
+class ServingConfigTests(SimpleTestCase):
+    def load(self, **env):
+        path = os.path.join(django_settings.BASE_DIR, "gunicorn.conf.py")
+        with mock.patch.dict(os.environ, env):
+            return runpy.run_path(path)
+
+    def test_modes(self):
+        config = self.load(WEB_MODE="gthread", WEB_CONCURRENCY="3")
+        self.assertEqual(config["worker_class"], "gthread")
+        self.assertEqual(config["wsgi_app"], "config.wsgi:application")
+        self.assertEqual(config["workers"], 3)
+        self.assertTrue(config["preload_app"])
+        self.assertGreater(config["max_requests_jitter"], 0)
+
+        config = self.load(WEB_MODE="uvicorn")
+        self.assertEqual(config["wsgi_app"], "config.asgi:application")
+        self.assertEqual(
+            config["worker_class"], "uvicorn_worker.UvicornWorker"
+        )
+
+        with self.assertRaises(RuntimeError):
+            self.load(WEB_MODE="eventlet")
+
+
+class BenchmarkTests(LiveServerTestCase):
+    def test_percentile(self):
+        self.assertEqual(benchmark.percentile([3, 1, 2, 4], 50), 3)
+        self.assertEqual(benchmark.percentile([], 95), 0.0)
+
+    def test_run_load_walks_every_journey(self):
+        result = benchmark.run_load(
+            self.live_server_url,
+            [[reverse("about")], [reverse("round_list"), "/missing/"]],
+            clients=2,
+            passes=2,
+        )
+        self.assertEqual(result["requests"], 12)
+        # Only the 404s count as errors.
+        self.assertEqual(result["errors"], 4)
+        self.assertGreater(result["throughput"], 0)
+
+    @override_settings(
+        SECURE_SSL_REDIRECT=True,
+        SECURE_PROXY_SSL_HEADER=("HTTP_X_FORWARDED_PROTO", "https"),
+        ALLOWED_HOSTS=["petpicks.example.com"],
+    )
+    def test_journeys_look_like_proxied_https_requests(self):
+        from core.management.commands.benchmark_serving import (
+            request_headers,
+        )
+
+        headers = request_headers()
+        self.assertEqual(
+            headers,
+            {
+                "Host": "petpicks.example.com",
+                "X-Forwarded-Proto": "https",
+            },
+        )
+        journey = [[reverse("about")]]
+        redirected = benchmark.run_load(
+            self.live_server_url, journey, clients=1, passes=1
+        )
+        self.assertEqual(redirected["errors"], 1)
+        served = benchmark.run_load(
+            self.live_server_url,
+            journey,
+            clients=1,
+            passes=1,
+            headers=headers,
+        )
+        self.assertEqual(served["errors"], 0)
+
+
+@override_settings(STORAGES=LOCAL_STORAGES)
+class HealthCheckTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        health._warmed.clear()
+        health._storage_check.update(checked_at=None, ok=False)
+        self.addCleanup(health._warmed.clear)
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_liveness_skips_the_rest_of_the_stack(self):
+        resp = self.client.get("/healthz", HTTP_HOST="10.0.0.7")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json(), {"status": "ok"})
+        self.assertEqual(resp["Cache-Control"], "no-store")
+
+    @override_settings(PAGE_CACHE_SECONDS=600)
+    def test_warm_up_fills_the_page_cache(self):
+        with mock.patch.object(
+            connections, "close_all", wraps=connections.close_all
+        ) as close_all:
+            statuses = health.warm_up()
+        # The warm-up thread's connections would never serve a request.
+        close_all.assert_called_once()
+        self.assertEqual(
+            statuses,
+            {
+                reverse("home"): 200,
+                reverse("round_list"): 200,
+                reverse("results_list"): 200,
+            },
+        )
+        self.assertTrue(health.is_warm())
+        home = RequestFactory().get(reverse("home"))
+        self.assertIsNotNone(cache.get(page_cache.page_key(home)))
+
+    def test_readiness_waits_for_warm_up(self):
+        with mock.patch.object(health, "warm_up") as warm_up:
+            resp = self.client.get("/readyz")
+        warm_up.assert_called_once()
+        self.assertEqual(resp.status_code, 503)
+        self.assertFalse(resp.json()["checks"]["warm_up"])
+
+        resp = self.client.get("/readyz")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(
+            resp.json()["checks"],
+            {"warm_up": True, "databases": {"default": True}, "storage": True},
+        )
+
+    def test_not_ready_when_the_database_is_down(self):
+        health._warmed.set()
+        with mock.patch.object(
+            connections["default"], "cursor", side_effect=Exception("down")
+        ):
+            resp = self.client.get("/readyz")
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(
+            resp.json()["checks"]["databases"], {"default": False}
+        )
+
+    @override_settings(
+        STORAGES={
+            **LOCAL_STORAGES,
+            "default": {
+                "BACKEND": "django.core.files.storage.InMemoryStorage"
+            },
+        }
+    )
+    def test_storage_check_is_reused(self):
+        health._warmed.set()
+        with mock.patch(
+            "django.core.files.storage.InMemoryStorage.exists",
+            side_effect=OSError("unreachable"),
+        ) as exists:
+            self.assertEqual(self.client.get("/readyz").status_code, 503)
+            self.assertEqual(self.client.get("/readyz").status_code, 503)
+        self.assertEqual(exists.call_count, 1)
+
+
+@override_settings(SHARED_CACHE=True)
+class ProfilingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user(
+            username="ops", password="pw12345!", is_staff=True
+        )
+        self.member = User.objects.create_user(
+            username="member", password="pw12345!"
+        )
+
+    def test_only_flagged_staff_requests_are_profiled(self):
+        self.client.force_login(self.staff)
+        resp = self.client.get(reverse("round_list"))
+        self.assertNotIn("X-Profile-Id", resp)
+
+        self.client.force_login(self.member)
+        resp = self.client.get(reverse("round_list") + "?_profile=1")
+        self.assertNotIn("X-Profile-Id", resp)
+        self.assertEqual(profiling.recent_reports(), [])
+
+    @override_settings(SHARED_CACHE=False, DEBUG=False)
+    def test_off_without_a_shared_cache(self):
+        self.client.force_login(self.staff)
+        resp = self.client.get(reverse("round_list"), HTTP_X_PROFILE="1")
+        self.assertNotIn("X-Profile-Id", resp)
+        self.assertNotIn("X-Profile", resp)
+
+    def test_staff_profile_is_saved_and_viewable(self):
+        self.client.force_login(self.staff)
+        resp = self.client.get(reverse("round_list"), HTTP_X_PROFILE="1")
+        report = profiling.get_report(resp["X-Profile-Id"])
+        self.assertEqual(report["path"], reverse("round_list"))
+        self.assertEqual(report["status"], 200)
+        self.assertIn("round_list", report["cumulative"])
+        self.assertTrue(report["queries"])
+        self.assertEqual(
+            profiling.recent_reports()[0]["id"], resp["X-Profile-Id"]
+        )
+
+        page = self.client.get(resp["X-Profile-Url"])
+        self.assertContains(page, "Calls by cumulative time")
+        self.assertContains(
+            self.client.get(reverse("request_profiles")),
+            resp["X-Profile-Id"],
+        )
+
+    @override_settings(PROFILING_RATE_LIMIT=1)
+    def test_rate_limited(self):
+        self.client.force_login(self.staff)
+        url = reverse("round_list") + "?_profile=1"
+        self.assertIn("X-Profile-Id", self.client.get(url))
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["X-Profile"], "rate-limited")
+        self.assertNotIn("X-Profile-Id", resp)
+
+    def test_writes_files_when_configured(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.client.force_login(self.staff)
+        with override_settings(PROFILING_DIR=directory):
+            resp = self.client.get(reverse("about") + "?_profile=1")
+        report_id = resp["X-Profile-Id"]
+        self.assertEqual(
+            sorted(os.listdir(directory)),
+            [f"{report_id}.json", f"{report_id}.prof"],
+        )
+
+    def test_viewer_is_staff_only(self):
+        self.client.force_login(self.member)
+        resp = self.client.get(reverse("request_profiles"))
+        self.assertEqual(resp.status_code, 302)
+
+
+class SlowQueryTests(TestCase):
+    def setUp(self):
+        slow_queries._buffer.clear()
+        self.addCleanup(slow_queries._buffer.clear)
+
+    def test_fingerprint_collapses_literals_and_lists(self):
+        self.assertEqual(
+            slow_queries.fingerprint(
+                'SELECT "t"."id" FROM "t"  WHERE "t"."id" IN (%s, %s, %s)'
+                " AND name = 'Rex' LIMIT 21"
+            ),
+            'SELECT "t"."id" FROM "t" WHERE "t"."id" IN (...)'
+            " AND name = ? LIMIT ?",
+        )
+        self.assertEqual(
+            slow_queries.fingerprint(
+                "INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s), (%s, %s)"
+            ),
+            "INSERT INTO t (a, b) VALUES (...)",
+        )
+
+    def test_installed_on_new_connections(self):
+        connection.ensure_connection()
+        self.assertIn(slow_queries.record, connection.execute_wrappers)
+
+    @override_settings(SLOW_QUERY_MS=0)
+    def test_records_call_site(self):
+        list(LotteryRound.objects.filter(pk__in=[1, 2, 3]))
+        sample = slow_queries.recent()[-1]
+        self.assertIn("IN (...)", sample["sql"])
+        self.assertEqual(sample["alias"], "default")
+        self.assertRegex(
+            sample["sites"][0],
+            r"^core/tests\.py:\d+ in test_records_call_site$",
+        )
+
+    @override_settings(SLOW_QUERY_MS=10_000)
+    def test_fast_queries_are_not_recorded(self):
+        list(LotteryRound.objects.all())
+        self.assertEqual(slow_queries.recent(), [])
+
+    @override_settings(SLOW_QUERY_MS=0, SLOW_QUERY_SAMPLE_RATE=0)
+    def test_sample_rate_zero_turns_recording_off(self):
+        list(LotteryRound.objects.all())
+        self.assertEqual(slow_queries.recent(), [])
+
+    def test_log_and_report(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        log = os.path.join(directory, "slow.jsonl")
+        with override_settings(SLOW_QUERY_MS=0, SLOW_QUERY_LOG=log):
+            for pk in range(3):
+                list(LotteryRound.objects.filter(pk=pk))
+        samples = slow_queries.read_log(log)
+        self.assertEqual(len(samples), 3)
+
+        rows = slow_queries.aggregate(samples)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["count"], 3)
+
+        out = io.StringIO()
+        call_command("slow_queries", file=log, by="site", stdout=out)
+        self.assertIn("3 samples in 1 groups", out.getvalue())
+        self.assertIn("in test_log_and_report", out.getvalue())
+
+    def test_staff_report(self):
+        staff = User.objects.create_user(
+            username="ops", password="pw12345!", is_staff=True
+        )
+        self.client.force_login(staff)
+        with override_settings(SLOW_QUERY_MS=0):
+            list(LotteryRound.objects.all())
+        resp = self.client.get(reverse("slow_query_report"))
+        self.assertEqual(resp.status_code, 200)
+        self.assertGreater(resp.json()["samples"], 0)
@@ -13,4 +13,15 @@ urlpatterns = [
     path("", views.home, name="home"),
     path("about/", views.about, name="about"),
     path("contact/", contact_redirect, name="contact"),
+    path("ops/profiles/", views.request_profiles, name="request_profiles"),
+    path(
+        "ops/profiles/<str:report_id>/",
+        views.request_profile,
+        name="request_profile",
+    ),
+    path(
+        "ops/slow-queries/",
+        views.slow_query_report,
+        name="slow_query_report",
+    ),
 ]
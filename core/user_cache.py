@@ -0,0 +1,56 @@
+"""
+Per-user cache for ``request.user``.
+
+Django's ``AuthenticationMiddleware`` fetches the ``auth_user`` row on every
+authenticated request. Users change rarely, so they are kept in the default
+cache and dropped whenever the row is saved or deleted. Only used when that
+cache is shared by every worker (``SHARED_CACHE``); otherwise a change made
+through one worker would not be seen by the others.
+"""
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+
+
+USER_CACHE_TIMEOUT = 60 * 5
+
+
+def user_cache_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def _session_matches(request, user):
+    """Mirror the checks ``django.contrib.auth.get_user`` performs."""
+    if not user.is_active:
+        return False
+    backend_path = request.session.get(auth.BACKEND_SESSION_KEY)
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return False
+    session_hash = request.session.get(auth.HASH_SESSION_KEY)
+    return bool(session_hash) and constant_time_compare(
+        session_hash, user.get_session_auth_hash()
+    )
+
+
+def get_cached_user(request):
+    try:
+        user_id = request.session[auth.SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+
+    key = user_cache_key(user_id)
+    user = cache.get(key)
+    if user is not None and _session_matches(request, user):
+        return user
+
+    # Cache miss or stale session: let Django verify (and flush) as usual.
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        cache.set(key, user, USER_CACHE_TIMEOUT)
+    return user
+
+
+def invalidate_cached_user(sender, instance, **kwargs):
+    cache.delete(user_cache_key(instance.pk))
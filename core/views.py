@@ -1,16 +1,44 @@
+from django.conf import settings
 from django.shortcuts import render
-from django.core.paginator import Paginator
 from django.template.loader import render_to_string
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse, JsonResponse
+from django.contrib.admin.views.decorators import staff_member_required
 from lottery.models import LotteryRound, Entry
 from lottery.forms import CommentForm
+from lottery.paginators import KnownCountPaginator
 from django.contrib import messages
 from .forms import ContactForm
+from . import page_cache, profiling, slow_queries
+from .routers import use_replica
 
 
 COMMENTS_PER_PAGE = 3
 
 
+def get_comment_page(request, entry):
+    """
+    Return the requested page of an entry's comments. The page count comes
+    from Entry.comment_count, so only the visible comments are fetched.
+    """
+    page_number = request.GET.get(f"comments_{entry.id}", 1)
+    comments = entry.comments.select_related("author").order_by(
+        "-created_at"
+    )
+    paginator = KnownCountPaginator(
+        comments, COMMENTS_PER_PAGE, entry.comment_count
+    )
+    page = paginator.get_page(page_number)
+    if page_cache.storing(request):
+        page_cache.tag(
+            request,
+            f"entry:{entry.id}",
+            *(f"comment:{comment.id}" for comment in page),
+        )
+    return page
+
+
+@page_cache.cache_anonymous
+@use_replica
 def home(request):
     # Get the latest completed round that has at least 1 winner
     latest_round = (
@@ -23,24 +51,21 @@ def home(request):
         .first()
     )
 
+    page_cache.tag(request, "rounds:completed")
     recent_winners = []
     if latest_round:
+        page_cache.tag(request, f"round:{latest_round.id}")
         recent_winners = (
             Entry.objects.filter(
                 round=latest_round,
                 is_winner=True
             )
             .select_related("pet", "pet__owner")
-            .prefetch_related("comments__author")
             .order_by("winner_rank", "id")[:3]
         )
 
         for entry in recent_winners:
-            page_param = f"comments_{entry.id}"
-            page_number = request.GET.get(page_param, 1)
-            comments = list(entry.comments.all().order_by("-created_at"))
-            paginator = Paginator(comments, COMMENTS_PER_PAGE)
-            entry.comment_page = paginator.get_page(page_number)
+            entry.comment_page = get_comment_page(request, entry)
 
     comment_forms = {}
     for entry in recent_winners:
@@ -68,11 +93,7 @@ def home(request):
                 break
         if entry_id:
             entry = Entry.objects.get(id=entry_id)
-            page_param = f"comments_{entry.id}"
-            page_number = request.GET.get(page_param, 1)
-            comments = list(entry.comments.all().order_by("-created_at"))
-            paginator = Paginator(comments, COMMENTS_PER_PAGE)
-            entry.comment_page = paginator.get_page(page_number)
+            entry.comment_page = get_comment_page(request, entry)
             html = render_to_string(
                 'core/_comments_section.html',
                 {
@@ -96,6 +117,7 @@ def home(request):
     )
 
 
+@page_cache.cache_anonymous
 def about(request):
     return render(request, "core/about.html")
 
@@ -113,3 +135,36 @@ def contact(request):
         else:
             messages.error(request, "Please correct the errors below.")
     return render(request, "core/contact.html", {"contact_form": contact_form})
+
+
+@staff_member_required
+def request_profiles(request):
+    """Recent request profiles (see core.profiling). Staff only."""
+    return render(
+        request,
+        "core/request_profiles.html",
+        {"reports": profiling.recent_reports()},
+    )
+
+
+@staff_member_required
+def request_profile(request, report_id):
+    """One request profile: call statistics, allocations and SQL."""
+    report = profiling.get_report(report_id)
+    if report is None:
+        raise Http404("No such profile, or it has expired.")
+    return render(request, "core/request_profile.html", {"report": report})
+
+
+@staff_member_required
+def slow_query_report(request):
+    """
+    Slow queries sampled by this worker process, grouped by fingerprint
+    and call site, as JSON. Staff only.
+    """
+    samples = slow_queries.recent()
+    return JsonResponse({
+        "threshold_ms": settings.SLOW_QUERY_MS,
+        "samples": len(samples),
+        "groups": slow_queries.aggregate(samples),
+    })
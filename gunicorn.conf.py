@@ -0,0 +1,93 @@
+"""
+Gunicorn settings, read from the working directory (see Procfile).
+
+``WEB_MODE`` picks how requests are served:
+
+- ``gthread`` (default): WSGI, ``WEB_THREADS`` threads per worker, so a
+  slow upload or draw does not block the worker's other requests;
+- ``sync``: WSGI, one request per worker at a time;
+- ``uvicorn``: ``config.asgi`` on uvicorn workers, needed for the live
+  events stream (WSGI workers answer it with 204).
+
+``WEB_CONCURRENCY`` sets the number of workers (Heroku sets it per dyno
+size); otherwise it follows the CPU count for the mode. The application is
+loaded once in the master before forking (``preload_app``), so workers share
+its memory copy-on-write, and each worker is replaced after roughly
+``GUNICORN_MAX_REQUESTS`` requests to bound slow memory growth.
+``manage.py benchmark_serving`` compares the modes.
+"""
+import gc
+import multiprocessing
+import os
+import time
+
+
+WEB_MODE = os.environ.get("WEB_MODE", "gthread")
+CPUS = multiprocessing.cpu_count()
+
+if WEB_MODE == "uvicorn":
+    wsgi_app = "config.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+    default_workers = CPUS
+elif WEB_MODE == "sync":
+    wsgi_app = "config.wsgi:application"
+    worker_class = "sync"
+    default_workers = CPUS * 2 + 1
+elif WEB_MODE == "gthread":
+    wsgi_app = "config.wsgi:application"
+    worker_class = "gthread"
+    threads = int(os.environ.get("WEB_THREADS", 4))
+    default_workers = CPUS + 1
+else:
+    raise RuntimeError(
+        f"WEB_MODE must be sync, gthread or uvicorn, not {WEB_MODE!r}."
+    )
+
+workers = int(os.environ.get("WEB_CONCURRENCY", default_workers))
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+
+preload_app = True
+
+# Long enough for a draw on a large round or a photo posted through Django
+# on a slow connection; the router in front gives up at 30 seconds anyway.
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+graceful_timeout = 30
+keepalive = 5
+
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = max_requests // 10
+
+# Worker heartbeats go to tmpfs rather than a possibly slow disk.
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+accesslog = "-"
+
+
+def pre_fork(server, worker):
+    # Objects loaded by preload_app are never collected in the workers, so
+    # the collector does not touch (and copy) their pages.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Nothing should have connected before the fork, but a connection
+    # inherited from the master must not be shared between workers.
+    from django.db import connections
+
+    connections.close_all()
+
+
+def post_worker_init(worker):
+    # Runs before the worker accepts requests; see core.health.
+    from core import health
+
+    started = time.monotonic()
+    try:
+        statuses = health.warm_up()
+    except Exception:
+        worker.log.exception("Warm-up failed; /readyz will retry it.")
+    else:
+        worker.log.info(
+            "Warmed up in %.2fs: %s", time.monotonic() - started, statuses
+        )
@@ -1,8 +1,63 @@
 from django.contrib import admin
 from .models import (
-    LotteryRound, Pet, Entry, Badge, BadgeAward, Notification, Comment
+    LotteryRound, Pet, Entry, Badge, BadgeAward, Notification, Comment,
+    ArchivedRound, ArchivedEntry,
 )
 from django.utils import timezone
+from . import search
+from .paginators import EstimatedCountPaginator
+
+
+class IndexedSearchMixin:
+    """
+    Answer the changelist search box through lottery.search, so each
+    search field is matched via its index instead of a LIKE scan.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        queryset = search.filter_queryset(
+            queryset, self.get_search_fields(request), search_term
+        )
+        return queryset, False
+
+
+class RecentRoundFilter(admin.SimpleListFilter):
+    """
+    Round filter that offers only the latest rounds (plus the selected
+    one) instead of loading every LotteryRound.
+    """
+    title = "round"
+    parameter_name = "round__id__exact"
+    limit = 20
+
+    def lookups(self, request, model_admin):
+        rounds = list(
+            LotteryRound.objects.order_by("-id").values_list("id", "title")[
+                :self.limit
+            ]
+        )
+        selected = self.value()
+        if selected and selected.isdigit():
+            if int(selected) not in {pk for pk, _ in rounds}:
+                rounds += LotteryRound.objects.filter(
+                    id=selected
+                ).values_list("id", "title")
+        return [(str(pk), title) for pk, title in rounds]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(round_id=self.value())
+        return queryset
+
+
+class ScalableAdminMixin(IndexedSearchMixin):
+    """
+    Changelist settings for tables with millions of rows: no unfiltered
+    COUNT(*), planner estimates instead of exact counts for big results,
+    and autocomplete widgets instead of full <select> lists.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(LotteryRound)
@@ -16,25 +71,30 @@ class LotteryRoundAdmin(admin.ModelAdmin):
         LotteryRound.objects.filter(
             status=LotteryRound.Status.ACTIVE,
             end_date__lt=now
-        ).update(status=LotteryRound.Status.COMPLETED)
+        ).update(status=LotteryRound.Status.COMPLETED, updated_at=now)
 
         return super().get_queryset(request)
 
 
 @admin.register(Pet)
-class PetAdmin(admin.ModelAdmin):
+class PetAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ['name', 'owner', 'breed', 'age']
     list_filter = ['breed']
+    list_select_related = ['owner']
     search_fields = ['name', 'owner__username']
+    autocomplete_fields = ['owner']
 
 
 @admin.register(Entry)
-class EntryAdmin(admin.ModelAdmin):
+class EntryAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = [
         'pet', 'round', 'status', 'is_winner', 'winner_rank', 'submitted_at'
     ]
-    list_filter = ['status', 'is_winner', 'round', 'submitted_at']
+    list_filter = ['status', 'is_winner', RecentRoundFilter, 'submitted_at']
+    list_select_related = ['pet__owner', 'round']
     search_fields = ['pet__name', 'pet__owner__username']
+    autocomplete_fields = ['pet', 'round']
+    date_hierarchy = 'submitted_at'
 
 
 @admin.register(Badge)
@@ -44,21 +104,42 @@ class BadgeAdmin(admin.ModelAdmin):
 
 
 @admin.register(BadgeAward)
-class BadgeAwardAdmin(admin.ModelAdmin):
+class BadgeAwardAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ['user', 'badge', 'round', 'awarded_at']
-    list_filter = ['badge', 'round', 'awarded_at']
+    list_filter = ['badge', RecentRoundFilter, 'awarded_at']
+    list_select_related = ['user', 'badge', 'round']
     search_fields = ['user__username']
+    autocomplete_fields = ['user', 'pet', 'badge', 'round']
+    date_hierarchy = 'awarded_at'
 
 
 @admin.register(Notification)
-class NotificationAdmin(admin.ModelAdmin):
+class NotificationAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ['user', 'round', 'message', 'created_at']
-    list_filter = ['round', 'created_at']
+    list_filter = [RecentRoundFilter, 'created_at']
+    list_select_related = ['user', 'round']
     search_fields = ['user__username', 'message']
+    autocomplete_fields = ['user', 'pet', 'round']
+    date_hierarchy = 'created_at'
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ['author', 'entry', 'created_at']
     list_filter = ['created_at']
+    list_select_related = ['author', 'entry__pet', 'entry__round']
     search_fields = ['author__username', 'text']
+    autocomplete_fields = ['entry', 'author']
+    date_hierarchy = 'created_at'
+
+
+@admin.register(ArchivedRound)
+class ArchivedRoundAdmin(admin.ModelAdmin):
+    list_display = ['round', 'entry_count', 'archived_at']
+
+
+@admin.register(ArchivedEntry)
+class ArchivedEntryAdmin(admin.ModelAdmin):
+    list_display = ['pet_name', 'round', 'status', 'submitted_at']
+    list_filter = ['status']
+    search_fields = ['pet_name']
@@ -0,0 +1,491 @@
+"""
+Read-only JSON API (v1) for rounds, results, entries and the signed-in
+user's entries, badges and notifications.
+
+Lists use keyset ("cursor") pagination and every endpoint answers
+conditional GETs: the ETag is computed from a cheap aggregate over the
+update stamps, so an unchanged resource costs one small query and a 304.
+Clients can trim payloads with ``?fields=id,title``.
+"""
+import base64
+import hashlib
+import json
+from functools import wraps
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max, OuterRef, Prefetch, Q, Subquery, Sum
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import condition, require_GET
+
+from . import leaderboards
+from .models import (
+    BadgeAward,
+    Entry,
+    LotteryRound,
+    Notification,
+    OwnerStanding,
+    PetStanding,
+)
+
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class BadRequest(Exception):
+    pass
+
+
+def api_response(data, status=200, private=False):
+    response = JsonResponse(
+        data,
+        status=status,
+        encoder=DjangoJSONEncoder,
+        json_dumps_params={"separators": (",", ":")},
+    )
+    response["Cache-Control"] = (
+        "private, no-cache" if private else "public, no-cache"
+    )
+    if private:
+        response["Vary"] = "Cookie"
+    return response
+
+
+def api_view(view):
+    """Turn ``BadRequest`` into a 400 JSON body."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except BadRequest as exc:
+            return api_response({"error": str(exc)}, status=400)
+    return wrapper
+
+
+def api_login_required(view):
+    """Like login_required, but answers 401 instead of redirecting."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return api_response(
+                {"error": "Authentication required."}, status=401
+            )
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def make_etag(*parts):
+    return hashlib.md5(
+        json.dumps(parts, cls=DjangoJSONEncoder).encode()
+    ).hexdigest()
+
+
+# -------------------------
+# Serialisation
+# -------------------------
+def sparse(request, item):
+    """Apply the ``fields`` query parameter to a serialised item."""
+    fields = request.GET.get("fields")
+    if not fields:
+        return item
+    wanted = set(fields.split(","))
+    return {key: value for key, value in item.items() if key in wanted}
+
+
+def serialize_round(round_obj):
+    return {
+        "id": round_obj.id,
+        "title": round_obj.title,
+        "status": round_obj.status,
+        "start_date": round_obj.start_date,
+        "end_date": round_obj.end_date,
+        "drawn_at": round_obj.drawn_at,
+    }
+
+
+def serialize_entry(entry):
+    return {
+        "id": entry.id,
+        "round": entry.round_id,
+        "pet": {
+            "id": entry.pet.id,
+            "name": entry.pet.name,
+            "breed": entry.pet.breed,
+            "age": entry.pet.age,
+        },
+        "photo": entry.photo.url if entry.photo else None,
+        "placeholder": entry.placeholder or None,
+        "status": entry.status,
+        "is_winner": entry.is_winner,
+        "winner_rank": entry.winner_rank,
+        "comment_count": entry.comment_count,
+        "submitted_at": entry.submitted_at,
+    }
+
+
+# -------------------------
+# Cursor pagination
+# -------------------------
+def encode_cursor(value, pk):
+    # Full-precision isoformat: DjangoJSONEncoder drops microseconds.
+    if hasattr(value, "isoformat"):
+        value = value.isoformat()
+    raw = json.dumps([value, pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, pk = json.loads(base64.urlsafe_b64decode(padded))
+        return value, int(pk)
+    except (ValueError, TypeError):
+        raise BadRequest("Invalid cursor.")
+
+
+def cursor_page(request, queryset, field="id"):
+    """
+    Return one page of ``queryset`` in descending ``field`` order (ties
+    broken by id) plus the cursor for the next page, or None.
+    """
+    try:
+        limit = int(request.GET.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise BadRequest("Invalid limit.")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    queryset = queryset.order_by(f"-{field}", "-id")
+    cursor = request.GET.get("cursor")
+    if cursor:
+        value, last_id = decode_cursor(cursor)
+        if field == "id":
+            queryset = queryset.filter(id__lt=last_id)
+        else:
+            try:
+                value = parse_datetime(str(value))
+            except ValueError:
+                value = None
+            if value is None:
+                raise BadRequest("Invalid cursor.")
+            queryset = queryset.filter(
+                Q(**{f"{field}__lt": value})
+                | Q(**{field: value, "id__lt": last_id})
+            )
+
+    rows = list(queryset[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.id)
+    return rows, next_cursor
+
+
+def list_response(request, rows, next_cursor, serialize, private=False):
+    return api_response(
+        {
+            "data": [sparse(request, serialize(row)) for row in rows],
+            "next": next_cursor,
+        },
+        private=private,
+    )
+
+
+# -------------------------
+# Public endpoints
+# -------------------------
+def active_rounds_queryset():
+    now = timezone.now()
+    return LotteryRound.objects.filter(
+        status=LotteryRound.Status.ACTIVE,
+        start_date__lte=now,
+        end_date__gte=now,
+    )
+
+
+def active_rounds_etag(request):
+    # Membership changes with the clock, so hash the (small) id set.
+    return make_etag(
+        request.GET.urlencode(),
+        list(active_rounds_queryset().values_list("id", "updated_at")),
+    )
+
+
+@require_GET
+@api_view
+@condition(etag_func=active_rounds_etag)
+def active_rounds(request):
+    rows, next_cursor = cursor_page(request, active_rounds_queryset())
+    return list_response(request, rows, next_cursor, serialize_round)
+
+
+def completed_rounds_queryset():
+    return LotteryRound.objects.filter(
+        status=LotteryRound.Status.COMPLETED,
+        drawn_at__isnull=False,
+    )
+
+
+def completed_rounds_etag(request):
+    return make_etag(
+        request.GET.urlencode(),
+        completed_rounds_queryset().aggregate(
+            round_total=Count("id", distinct=True),
+            last_drawn=Max("drawn_at"),
+            round_updated=Max("updated_at"),
+            entry_updated=Max("entries__updated_at"),
+            pet_updated=Max("entries__pet__updated_at"),
+            comment_total=Sum("entries__comment_count"),
+        )
+    )
+
+
+def serialize_completed_round(round_obj):
+    data = serialize_round(round_obj)
+    data["winners"] = [serialize_entry(e) for e in round_obj.winners]
+    return data
+
+
+@require_GET
+@api_view
+@condition(etag_func=completed_rounds_etag)
+def completed_rounds(request):
+    queryset = completed_rounds_queryset().prefetch_related(
+        Prefetch(
+            "entries",
+            queryset=Entry.objects.filter(is_winner=True)
+            .select_related("pet")
+            .order_by("winner_rank", "id"),
+            to_attr="winners",
+        )
+    )
+    rows, next_cursor = cursor_page(request, queryset, field="drawn_at")
+    return list_response(
+        request, rows, next_cursor, serialize_completed_round
+    )
+
+
+def visible_entries(request):
+    """Approved entries, plus the requesting user's own entries."""
+    visible = Q(status=Entry.Status.APPROVED)
+    if request.user.is_authenticated:
+        visible |= Q(pet__owner=request.user)
+    return Entry.objects.filter(visible)
+
+
+def entry_etag(request, entry_id):
+    # The entry carries its pet's name, breed and age.
+    stamp = visible_entries(request).filter(id=entry_id).values_list(
+        "updated_at", "pet__updated_at", "comment_count"
+    ).first()
+    if not stamp:
+        return None
+    return make_etag(request.GET.urlencode(), entry_id, stamp)
+
+
+@require_GET
+@api_view
+@condition(etag_func=entry_etag)
+def entry_detail(request, entry_id):
+    entry = get_object_or_404(
+        visible_entries(request).select_related("pet"), id=entry_id
+    )
+    # Pending and rejected entries are only visible to their owner.
+    return api_response(
+        {"data": sparse(request, serialize_entry(entry))},
+        private=entry.status != Entry.Status.APPROVED,
+    )
+
+
+# -------------------------
+# Leaderboards
+# -------------------------
+def serialize_standing(standing):
+    return {
+        "position": standing.position,
+        "points": standing.points,
+        "wins": standing.wins,
+        "first_places": standing.first_places,
+        "second_places": standing.second_places,
+        "third_places": standing.third_places,
+        "entries": standing.entries,
+        "current_streak": standing.current_streak,
+        "best_streak": standing.best_streak,
+    }
+
+
+def serialize_pet_standing(standing):
+    data = serialize_standing(standing)
+    data["pet"] = {
+        "id": standing.pet.id,
+        "name": standing.pet.name,
+        "owner": standing.pet.owner.username,
+    }
+    return data
+
+
+def serialize_owner_standing(standing):
+    data = serialize_standing(standing)
+    data["owner"] = standing.owner.username
+    return data
+
+
+def leaderboard_etag_func(model, **extra):
+    """``extra`` aggregates cover related rows the standings show."""
+    def etag(request):
+        return make_etag(
+            request.GET.urlencode(),
+            model.objects.aggregate(
+                total=Count("id"), last_drawn=Max("last_drawn_at"), **extra
+            )
+        )
+    return etag
+
+
+def leaderboard_response(request, queryset, serialize):
+    try:
+        limit = int(request.GET.get("limit", leaderboards.PAGE_SIZE))
+    except ValueError:
+        raise BadRequest("Invalid limit.")
+    try:
+        rows, next_cursor = leaderboards.ranked_page(
+            queryset,
+            request.GET.get("cursor"),
+            max(1, min(limit, MAX_PAGE_SIZE)),
+        )
+    except ValueError:
+        raise BadRequest("Invalid cursor.")
+    return list_response(request, rows, next_cursor, serialize)
+
+
+@require_GET
+@api_view
+@condition(
+    etag_func=leaderboard_etag_func(
+        PetStanding, pet_updated=Max("pet__updated_at")
+    )
+)
+def pet_leaderboard(request):
+    return leaderboard_response(
+        request, leaderboards.pet_standings(), serialize_pet_standing
+    )
+
+
+@require_GET
+@api_view
+@condition(etag_func=leaderboard_etag_func(OwnerStanding))
+def owner_leaderboard(request):
+    return leaderboard_response(
+        request, leaderboards.owner_standings(), serialize_owner_standing
+    )
+
+
+# -------------------------
+# Signed-in user's data
+# -------------------------
+def my_entries_etag(request):
+    if not request.user.is_authenticated:
+        return None
+    return make_etag(
+        request.GET.urlencode(),
+        Entry.objects.filter(pet__owner=request.user).aggregate(
+            entry_total=Count("id"),
+            entry_updated=Max("updated_at"),
+            pet_updated=Max("pet__updated_at"),
+            comment_total=Sum("comment_count"),
+            round_updated=Max("round__updated_at"),
+        )
+    )
+
+
+@require_GET
+@api_login_required
+@api_view
+@condition(etag_func=my_entries_etag)
+def my_entries(request):
+    queryset = Entry.objects.filter(pet__owner=request.user).select_related(
+        "pet"
+    )
+    rows, next_cursor = cursor_page(request, queryset)
+    return list_response(
+        request, rows, next_cursor, serialize_entry, private=True
+    )
+
+
+def my_badges_etag(request):
+    if not request.user.is_authenticated:
+        return None
+    return make_etag(
+        request.GET.urlencode(),
+        BadgeAward.objects.filter(user=request.user).aggregate(
+            count=Count("id"), last=Max("id")
+        )
+    )
+
+
+def serialize_badge(award):
+    return {
+        "id": award.id,
+        "badge": award.badge.name,
+        "pet": award.pet.name,
+        "round": award.round_id,
+        "placement": award.placement,
+        "awarded_at": award.awarded_at,
+    }
+
+
+@require_GET
+@api_login_required
+@api_view
+@condition(etag_func=my_badges_etag)
+def my_badges(request):
+    placement = Entry.objects.filter(
+        round=OuterRef("round"), pet=OuterRef("pet"), is_winner=True
+    ).values("winner_rank")[:1]
+    queryset = (
+        BadgeAward.objects.filter(user=request.user)
+        .select_related("badge", "pet")
+        .annotate(placement=Subquery(placement))
+    )
+    rows, next_cursor = cursor_page(request, queryset)
+    return list_response(
+        request, rows, next_cursor, serialize_badge, private=True
+    )
+
+
+def my_notifications_etag(request):
+    if not request.user.is_authenticated:
+        return None
+    return make_etag(
+        request.GET.urlencode(),
+        Notification.objects.filter(
+            user=request.user, dismissed=False
+        ).aggregate(count=Count("id"), last=Max("id"))
+    )
+
+
+def serialize_notification(notification):
+    return {
+        "id": notification.id,
+        "message": notification.message,
+        "pet": notification.pet_id,
+        "round": notification.round_id,
+        "created_at": notification.created_at,
+    }
+
+
+@require_GET
+@api_login_required
+@api_view
+@condition(etag_func=my_notifications_etag)
+def my_notifications(request):
+    queryset = Notification.objects.filter(
+        user=request.user, dismissed=False
+    )
+    rows, next_cursor = cursor_page(request, queryset)
+    return list_response(
+        request, rows, next_cursor, serialize_notification, private=True
+    )
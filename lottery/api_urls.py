@@ -0,0 +1,22 @@
+from django.urls import path
+from . import api
+
+
+app_name = "api"
+
+urlpatterns = [
+    path("rounds/active/", api.active_rounds, name="active_rounds"),
+    path("rounds/completed/", api.completed_rounds, name="completed_rounds"),
+    path("entries/<int:entry_id>/", api.entry_detail, name="entry_detail"),
+    path(
+        "leaderboard/pets/", api.pet_leaderboard, name="pet_leaderboard"
+    ),
+    path(
+        "leaderboard/owners/",
+        api.owner_leaderboard,
+        name="owner_leaderboard",
+    ),
+    path("me/entries/", api.my_entries, name="my_entries"),
+    path("me/badges/", api.my_badges, name="my_badges"),
+    path("me/notifications/", api.my_notifications, name="my_notifications"),
+]
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class LotteryConfig(AppConfig):
     name = 'lottery'
+
+    def ready(self):
+        from . import signals  # noqa: F401
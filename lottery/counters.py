@@ -0,0 +1,51 @@
+"""
+Keep ``Entry.comment_count`` and ``Entry.last_commented_at`` in step with
+the ``Comment`` table using single UPDATE statements, so readers never have
+to count comments themselves.
+"""
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Entry
+
+
+def latest_comment_at(exclude_comment_id=None):
+    comments = Comment.objects.filter(entry=OuterRef("pk"))
+    if exclude_comment_id is not None:
+        comments = comments.exclude(pk=exclude_comment_id)
+    return Subquery(
+        comments.order_by("-created_at").values("created_at")[:1]
+    )
+
+
+def comment_added(comment):
+    Entry.objects.filter(pk=comment.entry_id).update(
+        comment_count=F("comment_count") + 1,
+        last_commented_at=comment.created_at,
+    )
+
+
+def comment_removed(entries, comment_id):
+    """
+    Update ``entries`` for a comment deleted in the same transaction; works
+    before or after the DELETE. Returns the number of entries updated.
+    """
+    return entries.update(
+        comment_count=Greatest(F("comment_count") - 1, Value(0)),
+        last_commented_at=latest_comment_at(exclude_comment_id=comment_id),
+    )
+
+
+def recompute(queryset):
+    """Recalculate both counters from scratch for ``queryset``."""
+    comment_total = (
+        Comment.objects.filter(entry=OuterRef("pk"))
+        .order_by()
+        .values("entry")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    return queryset.update(
+        comment_count=Coalesce(Subquery(comment_total), Value(0)),
+        last_commented_at=latest_comment_at(),
+    )
@@ -0,0 +1,125 @@
+"""
+Publish/subscribe for live updates streamed to browsers over server-sent
+events (see ``views.live_events``).
+
+The default ``InProcessBroker`` only reaches subscribers connected to the
+same process, which is enough for a single ASGI worker. Multi-node
+deployments set ``LIVE_EVENTS_BACKEND`` to ``"lottery.events.RedisBroker"``
+so every worker sees every event.
+"""
+import asyncio
+import json
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+ROUNDS_CHANNEL = "rounds"
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+def user_channel(user_id):
+    return f"user:{user_id}"
+
+
+class InProcessBroker:
+    """Fan events out to the subscribers connected to this process."""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel, event, data):
+        message = (event, data)
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(self._offer, queue, message)
+
+    @staticmethod
+    def _offer(queue, message):
+        # A subscriber that stopped reading loses events rather than
+        # growing without bound; its EventSource reconnects later.
+        if not queue.full():
+            queue.put_nowait(message)
+
+    async def subscribe(self, channels, timeout):
+        """
+        Yield ``(event, data)`` tuples for ``channels``, or ``None`` when
+        nothing arrived within ``timeout`` seconds.
+        """
+        subscriber = (
+            asyncio.get_running_loop(),
+            asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE),
+        )
+        with self._lock:
+            for channel in channels:
+                self._subscribers.setdefault(channel, set()).add(subscriber)
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(
+                        subscriber[1].get(), timeout
+                    )
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                for channel in channels:
+                    self._subscribers.get(channel, set()).discard(subscriber)
+
+
+class RedisBroker:
+    """Relay events through Redis pub/sub so every worker receives them."""
+
+    def __init__(self):
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImproperlyConfigured(
+                "RedisBroker requires the 'redis' package."
+            ) from exc
+        self.url = settings.LIVE_EVENTS_REDIS_URL
+        self.client = redis.Redis.from_url(self.url)
+
+    def publish(self, channel, event, data):
+        self.client.publish(
+            channel, json.dumps([event, data], cls=DjangoJSONEncoder)
+        )
+
+    async def subscribe(self, channels, timeout):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(*channels)
+        try:
+            while True:
+                message = await pubsub.get_message(timeout=timeout)
+                if message is None:
+                    yield None
+                else:
+                    yield tuple(json.loads(message["data"]))
+        finally:
+            await pubsub.unsubscribe()
+            await client.aclose()
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.LIVE_EVENTS_BACKEND)()
+
+
+def publish(channel, event, data):
+    """Publish once the surrounding transaction (if any) has committed."""
+    transaction.on_commit(lambda: get_broker().publish(channel, event, data))
+
+
+def format_event(event, data):
+    payload = json.dumps(data, cls=DjangoJSONEncoder)
+    return f"event: {event}\ndata: {payload}\n\n"
@@ -1,10 +1,9 @@
 from pathlib import Path
 
-from crispy_forms.helper import FormHelper
 from django import forms
 from django.core.exceptions import ValidationError
-from PIL import Image
 
+from . import imaging, uploads
 from .models import Comment, Entry, LotteryRound
 
 
@@ -21,8 +20,14 @@ class EntryCreateForm(forms.ModelForm):
         ('week(s)', 'week(s)'),
     ]
 
-    pet_name = forms.CharField(max_length=50, label="Pet name", required=True)
-    pet_breed = forms.CharField(max_length=50, required=True, label="Breed")
+    saved_pet = forms.TypedChoiceField(
+        coerce=int,
+        empty_value=None,
+        required=False,
+        label="Your pets",
+    )
+    pet_name = forms.CharField(max_length=50, label="Pet name", required=False)
+    pet_breed = forms.CharField(max_length=50, required=False, label="Breed")
     pet_age_number = forms.ChoiceField(
         choices=AGE_NUMBER_CHOICES,
         label="Age",
@@ -33,15 +38,36 @@ class EntryCreateForm(forms.ModelForm):
         label="",
         required=True
     )
+    # Set by the browser after uploading the photo straight to storage.
+    upload_token = forms.CharField(required=False, widget=forms.HiddenInput)
+    photo_key = forms.CharField(required=False, widget=forms.HiddenInput)
 
     class Meta:
         model = Entry
         fields = ["photo"]
+        # forms.ImageField decodes the upload on the request thread;
+        # verify_image does that in the image pool instead.
+        field_classes = {"photo": forms.FileField}
+
+    def __init__(self, *args, saved_pets=(), user=None, **kwargs):
+        # crispy_forms.helper pulls in the layout machinery; only this form
+        # needs it.
+        from crispy_forms.helper import FormHelper
 
-    def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.helper = FormHelper()
         self.helper.form_tag = False
+        self.user = user
+        # Either the file or an upload token is required; see clean_photo.
+        self.fields["photo"].required = False
+        # Picking a saved pet fills in its details (see enter_round.html)
+        # and stands in for any left blank.
+        self.saved_pets = {pet["id"]: pet for pet in saved_pets}
+        self.fields["saved_pet"].choices = [("", "A new pet")] + [
+            (pet["id"], pet["name"]) for pet in saved_pets
+        ]
+        if not saved_pets:
+            self.fields["saved_pet"].widget = forms.HiddenInput()
         self.fields['pet_age_number'].widget.attrs.update({
             'class': 'form-select',
             'style': 'width: auto; display: inline-block;'
@@ -53,6 +79,13 @@ class EntryCreateForm(forms.ModelForm):
 
     def clean(self):
         cleaned_data = super().clean()
+        saved = self.saved_pets.get(cleaned_data.get("saved_pet"))
+        for field, key in (("pet_name", "name"), ("pet_breed", "breed")):
+            if not cleaned_data.get(field):
+                if saved:
+                    cleaned_data[field] = saved[key]
+                elif field not in self.errors:
+                    self.add_error(field, "This field is required.")
         age_number = cleaned_data.get("pet_age_number")
         age_unit = cleaned_data.get("pet_age_unit")
 
@@ -60,39 +93,66 @@ class EntryCreateForm(forms.ModelForm):
             # Combine into a single age string like "2 year(s)"
             cleaned_data["pet_age"] = f"{age_number} {age_unit}"
 
+        token = cleaned_data.get("upload_token")
+        # Attaching uses the token up, so only a form that is otherwise
+        # valid does it.
+        if token and self.user is not None and not self.errors:
+            try:
+                cleaned_data["photo"] = uploads.attach(
+                    token, cleaned_data.get("photo_key"), self.user.id
+                )
+                cleaned_data["placeholder"] = uploads.placeholder(
+                    cleaned_data["photo"]
+                )
+            except ValidationError as exc:
+                self.add_error("photo", exc)
+
         return cleaned_data
 
     def clean_photo(self):
         photo = self.cleaned_data.get("photo")
+        if self.data.get("upload_token") and self.user is not None:
+            # Already in storage; checked against its token in clean().
+            return photo
         if not photo:
             raise forms.ValidationError(
                 "A photo is required to enter the draw."
             )
+        if "photo" not in self.files:
+            # Editing without a new upload keeps the stored photo.
+            return photo
+        self.cleaned_data["placeholder"] = verify_image(photo)["placeholder"]
+        return photo
 
-        extension = Path(photo.name).suffix.lower()
-        if extension not in ALLOWED_IMAGE_EXTENSIONS:
-            raise ValidationError("Only JPG, PNG, and WEBP files are allowed.")
 
-        if photo.size > MAX_UPLOAD_SIZE:
-            raise ValidationError("Image file too large (max 5 MB).")
-
-        try:
-            image = Image.open(photo)
-            image.verify()
-            if image.format not in ALLOWED_IMAGE_FORMATS:
-                raise ValidationError(
-                    "Only JPG, PNG, and WEBP files are allowed."
-                )
-        except ValidationError:
-            raise
-        except Exception as exc:
-            raise ValidationError(
-                "Upload a valid image file (JPG, PNG, or WEBP)."
-            ) from exc
-        finally:
-            photo.seek(0)
-
-        return photo
+def verify_image(photo, block=False):
+    """
+    Check an uploaded file's extension, size and actual image format, and
+    return its ``lottery.imaging.inspect`` info, placeholder included.
+    Raises ValidationError; rewinds the file afterwards. Decoding runs in
+    the image pool, which raises PoolBusy when full unless ``block`` is
+    set.
+    """
+    extension = Path(photo.name).suffix.lower()
+    if extension not in ALLOWED_IMAGE_EXTENSIONS:
+        raise ValidationError("Only JPG, PNG, and WEBP files are allowed.")
+
+    if photo.size > MAX_UPLOAD_SIZE:
+        raise ValidationError("Image file too large (max 5 MB).")
+
+    try:
+        photo.seek(0)
+        data = photo.read()
+    finally:
+        photo.seek(0)
+    info = imaging.run(imaging.inspect, data, True, block=block)
+    if "error" in info:
+        raise ValidationError(
+            "Upload a valid image file (JPG, PNG, or WEBP)."
+        )
+    if info["format"] not in ALLOWED_IMAGE_FORMATS:
+        raise ValidationError("Only JPG, PNG, and WEBP files are allowed.")
+    return info
 
 
 class CommentForm(forms.ModelForm):
@@ -143,3 +203,23 @@ class LotteryRoundForm(forms.ModelForm):
             raise ValidationError("End date must be after start date.")
 
         return cleaned_data
+
+
+class EntryImportForm(forms.Form):
+    entries_csv = forms.FileField(
+        label="Entries CSV",
+        help_text=(
+            "Columns: round_id, owner, pet_name, pet_breed, pet_age, photo "
+            "and optionally status."
+        ),
+    )
+    photos = forms.FileField(
+        label="Photo archive (.zip)",
+        help_text="File names must match the CSV photo column.",
+    )
+
+    def clean_photos(self):
+        photos = self.cleaned_data["photos"]
+        if not photos.name.lower().endswith(".zip"):
+            raise ValidationError("Upload the photos as a .zip archive.")
+        return photos
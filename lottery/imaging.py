@@ -0,0 +1,224 @@
+"""
+Shared process pool for CPU-heavy image work.
+
+Decoding and verifying photos with Pillow keeps a web worker busy on CPU,
+so it runs in a small per-process pool instead. At most
+``IMAGE_POOL_WORKERS + IMAGE_POOL_QUEUE`` tasks are admitted at a time:
+request code that gets no slot within ``IMAGE_POOL_WAIT`` seconds raises
+``PoolBusy``, which ``PoolBusyMiddleware`` turns into a 503 with a
+``Retry-After`` header. Management commands pass ``block=True`` and wait
+for a slot instead.
+
+With ``IMAGE_POOL_WORKERS = 0`` tasks run inline in the calling thread,
+still bounded and counted. Every web worker process has its own pool and
+its own ``metrics``.
+"""
+import base64
+import io
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.http import HttpResponse
+
+
+PLACEHOLDER_SIZE = 16
+
+
+class PoolBusy(Exception):
+    """No slot in the image pool became free in time."""
+
+
+# -------------------------
+# Tasks (run in the pool processes)
+# -------------------------
+def _data_uri(image, size):
+    image.thumbnail((size, size))
+    output = io.BytesIO()
+    image.convert("RGB").save(output, format="WEBP", quality=50)
+    encoded = base64.b64encode(output.getvalue()).decode("ascii")
+    return f"data:image/webp;base64,{encoded}"
+
+
+def inspect(data, with_placeholder=False):
+    """
+    ``{"format", "width", "height"}`` for valid image bytes, or
+    ``{"error": message}``. ``with_placeholder`` adds a ``placeholder``
+    data URI, so the upload is only sent to the pool once.
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.verify()
+            image_format, (width, height) = image.format, image.size
+        info = {"format": image_format, "width": width, "height": height}
+        if with_placeholder:
+            # verify() leaves the image unusable; decode it again.
+            with Image.open(io.BytesIO(data)) as image:
+                info["placeholder"] = _data_uri(image, PLACEHOLDER_SIZE)
+    except Exception as exc:
+        return {"error": str(exc) or type(exc).__name__}
+    return info
+
+
+def placeholder(data, size=PLACEHOLDER_SIZE):
+    """A tiny WebP of the image as a ``data:`` URI, for inlining in pages."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        return _data_uri(image, size)
+
+
+# -------------------------
+# Pool
+# -------------------------
+class ImagePool:
+    def __init__(self, workers, queue):
+        self.workers = workers
+        self.capacity = max(workers, 1) + queue
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "in_flight": 0,
+            "total_seconds": 0.0,
+            "max_seconds": 0.0,
+        }
+
+    def _count(self, **changes):
+        with self._lock:
+            for name, change in changes.items():
+                self._stats[name] += change
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # Forked children would inherit the web worker's threads
+                # and database connections.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def run(self, fn, *args, block=False, wait=0):
+        """
+        Run ``fn(*args)`` in the pool and return its result. Raises
+        PoolBusy if no slot frees up within ``wait`` seconds, unless
+        ``block`` is set.
+        """
+        if not self._slots.acquire(timeout=None if block else wait):
+            self._count(rejected=1)
+            raise PoolBusy()
+        self._count(submitted=1, in_flight=1)
+        started = time.monotonic()
+        executor = None
+        try:
+            if self.workers:
+                executor = self._get_executor()
+                result = executor.submit(fn, *args).result()
+            else:
+                result = fn(*args)
+        except BrokenProcessPool:
+            # A child died; reap the broken pool's processes and start a
+            # fresh pool for the next task, unless another thread already
+            # has.
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+            self._count(failed=1)
+            raise
+        except BaseException:
+            self._count(failed=1)
+            raise
+        else:
+            self._count(completed=1)
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self._stats["in_flight"] -= 1
+                self._stats["total_seconds"] += elapsed
+                self._stats["max_seconds"] = max(
+                    self._stats["max_seconds"], elapsed
+                )
+            self._slots.release()
+        return result
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+        finished = stats["completed"] + stats["failed"]
+        stats.update(
+            workers=self.workers,
+            capacity=self.capacity,
+            queued=max(stats["in_flight"] - max(self.workers, 1), 0),
+            mean_seconds=stats["total_seconds"] / finished if finished else 0,
+        )
+        return stats
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """The process-wide pool, rebuilt if its settings have changed."""
+    global _pool
+    workers = settings.IMAGE_POOL_WORKERS
+    queue = settings.IMAGE_POOL_QUEUE
+    with _pool_lock:
+        if _pool is None or (_pool.workers, _pool.capacity) != (
+            workers, max(workers, 1) + queue
+        ):
+            if _pool is not None:
+                _pool.shutdown()
+            _pool = ImagePool(workers, queue)
+        return _pool
+
+
+def run(fn, *args, block=False):
+    return get_pool().run(
+        fn, *args, block=block, wait=settings.IMAGE_POOL_WAIT
+    )
+
+
+def metrics():
+    return get_pool().metrics()
+
+
+class PoolBusyMiddleware:
+    """Answer requests that found the image pool full with a 503."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, PoolBusy):
+            return None
+        response = HttpResponse(
+            "We are processing a lot of photos right now. "
+            "Please try again in a few seconds.",
+            status=503,
+            content_type="text/plain",
+        )
+        response["Retry-After"] = str(settings.IMAGE_POOL_RETRY_AFTER)
+        return response
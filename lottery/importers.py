@@ -0,0 +1,363 @@
+"""
+Bulk import of pets and round entries from a CSV plus a zip of photos, used
+by the ``import_entries`` command and the staff upload page.
+
+Rows are validated up front and every problem is reported against its CSV
+line; valid rows are still imported. Database writes are set-based: pets are
+upserted in one statement on ``uniq_pet_per_owner_name`` and entries are
+inserted in one statement that skips conflicts on ``unique_pet_per_round``.
+Photo verification and storage uploads run in a thread pool, since both are
+dominated by decoding and network I/O rather than Python work. Photos are
+read from the zip by the worker that needs them, so only the photos being
+worked on are held in memory, and a member that would unpack to more than
+``MAX_UPLOAD_SIZE`` is rejected before it is read.
+"""
+import csv
+import io
+import logging
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import PurePosixPath
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+from .forms import MAX_UPLOAD_SIZE, verify_image
+from .models import Entry, LotteryRound, Pet
+from .pets import invalidate_saved_pets, purge_pet_pages
+
+
+REQUIRED_COLUMNS = ("round_id", "owner", "pet_name", "pet_age", "photo")
+OPTIONAL_COLUMNS = ("pet_breed", "status")
+MAX_ROWS = 1000
+PHOTO_WORKERS = 8
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    skipped: int = 0
+    errors: list = field(default_factory=list)
+
+    def error(self, line, message):
+        self.errors.append((line, message))
+
+
+@dataclass
+class Row:
+    line: int
+    round_id: int
+    owner_id: int
+    pet_name: str
+    pet_breed: str
+    pet_age: str
+    photo: str
+    status: str
+    member: zipfile.ZipInfo = None
+    pet_id: int = None
+    placeholder: str = ""
+
+
+def _field_limit(model, name):
+    return model._meta.get_field(name).max_length
+
+
+def read_rows(csv_file, result):
+    """
+    Parse the CSV, check each row against the schema and look up rounds and
+    owners in one query each. Returns the rows that passed.
+    """
+    text = csv_file.read()
+    if isinstance(text, bytes):
+        text = text.decode("utf-8-sig")
+    reader = csv.DictReader(io.StringIO(text))
+    missing = set(REQUIRED_COLUMNS) - set(reader.fieldnames or ())
+    if missing:
+        result.error(1, "Missing columns: " + ", ".join(sorted(missing)))
+        return []
+
+    raw = []
+    for line, record in enumerate(reader, start=2):
+        if len(raw) >= MAX_ROWS:
+            result.error(line, f"More than {MAX_ROWS} rows; rest ignored.")
+            break
+        record = {
+            key: (value or "").strip()
+            for key, value in record.items()
+            if key is not None
+        }
+        empty = [name for name in REQUIRED_COLUMNS if not record.get(name)]
+        if empty:
+            result.error(line, "Missing value for " + ", ".join(empty) + ".")
+            continue
+        try:
+            record["round_id"] = int(record["round_id"])
+        except ValueError:
+            result.error(line, "round_id must be a number.")
+            continue
+        raw.append((line, record))
+
+    rounds = set(
+        LotteryRound.objects.filter(
+            id__in={record["round_id"] for _, record in raw},
+            status=LotteryRound.Status.ACTIVE,
+        ).values_list("id", flat=True)
+    )
+    owners = dict(
+        User.objects.filter(
+            username__in={record["owner"] for _, record in raw}
+        ).values_list("username", "id")
+    )
+    limits = {
+        "pet_name": _field_limit(Pet, "name"),
+        "pet_breed": _field_limit(Pet, "breed"),
+        "pet_age": _field_limit(Pet, "age"),
+    }
+    statuses = set(Entry.Status.values)
+
+    rows = []
+    for line, record in raw:
+        status = record.get("status") or Entry.Status.PENDING
+        problems = []
+        if record["round_id"] not in rounds:
+            problems.append(f"No active round {record['round_id']}.")
+        if record["owner"] not in owners:
+            problems.append(f"Unknown user '{record['owner']}'.")
+        for name, limit in limits.items():
+            if len(record.get(name, "")) > limit:
+                problems.append(f"{name} is longer than {limit} characters.")
+        if status not in statuses:
+            problems.append(f"Unknown status '{status}'.")
+        if problems:
+            result.error(line, " ".join(problems))
+            continue
+        rows.append(
+            Row(
+                line=line,
+                round_id=record["round_id"],
+                owner_id=owners[record["owner"]],
+                pet_name=record["pet_name"],
+                pet_breed=record.get("pet_breed", ""),
+                pet_age=record["pet_age"],
+                photo=record["photo"],
+                status=status,
+            )
+        )
+    return rows
+
+
+def read_photos(bundle, rows, result):
+    """
+    Find each row's photo in the open zip ``bundle``. The size check uses
+    the uncompressed size from the archive's directory, which is also the
+    most ``ZipFile.read`` will ever unpack.
+    """
+    members = {
+        PurePosixPath(info.filename).name: info
+        for info in bundle.infolist()
+        if not info.is_dir()
+    }
+    found = []
+    for row in rows:
+        info = members.get(PurePosixPath(row.photo).name)
+        if info is None:
+            result.error(row.line, f"Photo '{row.photo}' not in archive.")
+            continue
+        if info.file_size > MAX_UPLOAD_SIZE:
+            result.error(row.line, "Image file too large (max 5 MB).")
+            continue
+        row.member = info
+        found.append(row)
+    return found
+
+
+def member_reader(bundle):
+    """
+    Return ``read(row)`` for the row's photo bytes. ZipFile is not safe to
+    read from several threads, so reads take turns.
+    """
+    lock = threading.Lock()
+
+    def read(row):
+        with lock:
+            return bundle.read(row.member)
+    return read
+
+
+def _check_photo(read, row):
+    try:
+        photo = ContentFile(read(row), name=row.photo)
+        row.placeholder = verify_image(photo, block=True)["placeholder"]
+    except ValidationError as exc:
+        return exc.messages[0]
+    except zipfile.BadZipFile:
+        return f"Photo '{row.photo}' is damaged in the archive."
+    return None
+
+
+def _store_photo(read, row):
+    """Return ``(stored name, None)`` or ``(None, problem)``."""
+    photo_field = Entry._meta.get_field("photo")
+    name = photo_field.generate_filename(None, PurePosixPath(row.photo).name)
+    try:
+        return photo_field.storage.save(name, ContentFile(read(row))), None
+    except Exception:
+        logger.exception("Storing imported photo %s failed.", row.photo)
+        return None, "The photo could not be stored; try again."
+
+
+def verify_photos(read, rows, result, workers=PHOTO_WORKERS):
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        problems = list(pool.map(lambda row: _check_photo(read, row), rows))
+    valid = []
+    for row, problem in zip(rows, problems):
+        if problem:
+            result.error(row.line, problem)
+        else:
+            valid.append(row)
+    return valid
+
+
+def upsert_pets(rows):
+    """
+    Create or update every pet in one statement, then fetch their ids. Later
+    rows win when the CSV names the same pet twice.
+    """
+    pets = {}
+    for row in rows:
+        pets[(row.owner_id, row.pet_name)] = Pet(
+            owner_id=row.owner_id,
+            name=row.pet_name,
+            breed=row.pet_breed,
+            age=row.pet_age,
+        )
+    Pet.objects.bulk_create(
+        pets.values(),
+        update_conflicts=True,
+        unique_fields=["owner", "name"],
+        update_fields=["breed", "age", "updated_at"],
+    )
+    invalidate_saved_pets({owner_id for owner_id, _ in pets})
+    ids = {
+        (owner_id, name): pk
+        for pk, owner_id, name in Pet.objects.filter(
+            owner_id__in={owner_id for owner_id, _ in pets},
+            name__in={name for _, name in pets},
+        ).values_list("id", "owner_id", "name")
+    }
+    purge_pet_pages(list(ids.values()))
+    for row in rows:
+        row.pet_id = ids[(row.owner_id, row.pet_name)]
+
+
+def drop_duplicates(rows, result):
+    """
+    Skip rows whose pet is already entered in the round, either in the
+    database or earlier in the same file, before any photo is uploaded.
+    """
+    existing = set(
+        Entry.objects.filter(
+            pet_id__in={row.pet_id for row in rows},
+            round_id__in={row.round_id for row in rows},
+        ).values_list("pet_id", "round_id")
+    )
+    fresh = []
+    for row in rows:
+        key = (row.pet_id, row.round_id)
+        if key in existing:
+            result.skipped += 1
+            result.error(row.line, "This pet is already entered in the round.")
+            continue
+        existing.add(key)
+        fresh.append(row)
+    return fresh
+
+
+def store_photos(read, rows, workers=PHOTO_WORKERS):
+    """``[(stored name, None) or (None, problem), ...]``, one per row."""
+    if not rows:
+        return []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda row: _store_photo(read, row), rows))
+
+
+def create_entries(rows, stored, result):
+    """
+    Insert an entry for every row whose photo was stored. A photo whose
+    entry was not inserted is deleted again, as are all of them if the
+    insert fails.
+    """
+    rows_and_names = []
+    for row, (name, problem) in zip(rows, stored):
+        if problem:
+            result.error(row.line, problem)
+        else:
+            rows_and_names.append((row, name))
+    if not rows_and_names:
+        return
+
+    names = [name for _, name in rows_and_names]
+    storage = Entry._meta.get_field("photo").storage
+    entries = [
+        Entry(
+            pet_id=row.pet_id,
+            round_id=row.round_id,
+            photo=name,
+            placeholder=row.placeholder,
+            status=row.status,
+        )
+        for row, name in rows_and_names
+    ]
+    try:
+        # ignore_conflicts covers a concurrent entry made since the check
+        # in drop_duplicates.
+        Entry.objects.bulk_create(entries, ignore_conflicts=True)
+        created = set(
+            Entry.objects.filter(photo__in=names).values_list(
+                "photo", flat=True
+            )
+        )
+    except Exception:
+        for name in names:
+            storage.delete(name)
+        raise
+    for row, name in rows_and_names:
+        if name not in created:
+            storage.delete(name)
+            result.skipped += 1
+            result.error(row.line, "This pet is already entered in the round.")
+    result.created = len(created)
+
+
+def import_entries(csv_file, archive, workers=PHOTO_WORKERS):
+    """
+    Import pets and entries from ``csv_file`` with photos from the zip
+    ``archive``. Returns an ``ImportResult``; never raises for bad rows.
+    """
+    result = ImportResult()
+    rows = read_rows(csv_file, result)
+    try:
+        bundle = zipfile.ZipFile(archive)
+    except zipfile.BadZipFile:
+        for row in rows:
+            result.error(row.line, "The photo archive is not a valid zip.")
+        return result
+
+    with bundle:
+        read = member_reader(bundle)
+        rows = read_photos(bundle, rows, result)
+        rows = verify_photos(read, rows, result, workers)
+        if rows:
+            with transaction.atomic():
+                upsert_pets(rows)
+                rows = drop_duplicates(rows, result)
+        stored = store_photos(read, rows, workers)
+    create_entries(rows, stored, result)
+    result.errors.sort()
+    return result
@@ -0,0 +1,192 @@
+"""
+Pet and owner leaderboards.
+
+``PetStanding`` and ``OwnerStanding`` hold running totals that
+``record_draw`` adds one draw's results to, inside the draw transaction,
+with a handful of set-based UPDATEs. Reads never aggregate history: a page
+is the next ``limit`` rows after a cursor along the ranking index, so its
+cost depends on the page size rather than on the number of pets, owners or
+past rounds. ``manage.py rebuild_leaderboards`` replays every draw to
+repair the tables.
+"""
+import base64
+import json
+from collections import defaultdict
+
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+
+from .models import (
+    ArchivedEntry,
+    Entry,
+    LotteryRound,
+    OwnerStanding,
+    PetStanding,
+)
+
+
+POINTS = {1: 3, 2: 2, 3: 1}
+PLACE_FIELDS = {1: "first_places", 2: "second_places", 3: "third_places"}
+RANKING = ("-points", "-wins", "-id")
+PAGE_SIZE = 25
+
+
+# -------------------------
+# Maintenance
+# -------------------------
+def draw_rows(round_obj):
+    """``(pet_id, owner_id, winner_rank)`` for every approved entry."""
+    rows = list(
+        Entry.objects.filter(
+            round=round_obj, status=Entry.Status.APPROVED
+        ).values_list("pet_id", "pet__owner_id", "winner_rank")
+    )
+    # Non-winners of archived rounds live on in ArchivedEntry.
+    rows += [
+        (pet_id, owner_id, None)
+        for pet_id, owner_id in ArchivedEntry.objects.filter(
+            round=round_obj,
+            status=Entry.Status.APPROVED,
+            pet__isnull=False,
+        ).values_list("pet_id", "pet__owner_id")
+    ]
+    return rows
+
+
+def _result_values(entries, ranks, drawn_at):
+    """UPDATE values adding ``entries`` entries and podium ``ranks``."""
+    values = {
+        "entries": F("entries") + entries,
+        "last_drawn_at": drawn_at,
+    }
+    if not ranks:
+        values["current_streak"] = 0
+        return values
+    values.update(
+        wins=F("wins") + len(ranks),
+        points=F("points") + sum(POINTS.get(rank, 0) for rank in ranks),
+        current_streak=F("current_streak") + 1,
+        best_streak=Greatest(F("best_streak"), F("current_streak") + 1),
+    )
+    for rank, field in PLACE_FIELDS.items():
+        if rank in ranks:
+            values[field] = F(field) + ranks.count(rank)
+    return values
+
+
+def record_draw(round_obj):
+    """
+    Add a drawn round's results to the standings. Must run once per draw,
+    in the transaction that records the winners.
+    """
+    rows = draw_rows(round_obj)
+    if not rows:
+        return
+    drawn_at = round_obj.drawn_at
+
+    PetStanding.objects.bulk_create(
+        [PetStanding(pet_id=pet_id) for pet_id, _, _ in rows],
+        ignore_conflicts=True,
+    )
+    owner_ids = {owner_id for _, owner_id, _ in rows}
+    OwnerStanding.objects.bulk_create(
+        [OwnerStanding(owner_id=owner_id) for owner_id in owner_ids],
+        ignore_conflicts=True,
+    )
+
+    PetStanding.objects.filter(
+        pet_id__in=[pet_id for pet_id, _, rank in rows if not rank]
+    ).update(**_result_values(1, [], drawn_at))
+    for pet_id, _, rank in rows:
+        if rank:
+            PetStanding.objects.filter(pet_id=pet_id).update(
+                **_result_values(1, [rank], drawn_at)
+            )
+
+    tallies = defaultdict(lambda: [0, []])
+    for _, owner_id, rank in rows:
+        tallies[owner_id][0] += 1
+        if rank:
+            tallies[owner_id][1].append(rank)
+    # Owners without a podium place only differ by their entry count.
+    by_count = defaultdict(list)
+    for owner_id, (entries, ranks) in tallies.items():
+        if ranks:
+            OwnerStanding.objects.filter(owner_id=owner_id).update(
+                **_result_values(entries, ranks, drawn_at)
+            )
+        else:
+            by_count[entries].append(owner_id)
+    for entries, owner_ids in by_count.items():
+        OwnerStanding.objects.filter(owner_id__in=owner_ids).update(
+            **_result_values(entries, [], drawn_at)
+        )
+
+
+def rebuild():
+    """Recompute both tables by replaying every draw in order."""
+    PetStanding.objects.all().delete()
+    OwnerStanding.objects.all().delete()
+    rounds = LotteryRound.objects.filter(drawn_at__isnull=False).order_by(
+        "drawn_at", "id"
+    )
+    count = 0
+    for round_obj in rounds.iterator():
+        record_draw(round_obj)
+        count += 1
+    return count
+
+
+# -------------------------
+# Reading
+# -------------------------
+def encode_cursor(standing, position):
+    raw = json.dumps(
+        [standing.points, standing.wins, standing.id, position]
+    ).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Raises ValueError for anything that is not a cursor we issued."""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        points, wins, pk, position = json.loads(
+            base64.urlsafe_b64decode(padded)
+        )
+        return int(points), int(wins), int(pk), int(position)
+    except (TypeError, ValueError) as exc:
+        raise ValueError("Invalid cursor.") from exc
+
+
+def ranked_page(queryset, cursor=None, limit=PAGE_SIZE):
+    """
+    Return ``(rows, next_cursor)``. Each row gets a ``position`` attribute
+    with its place on the leaderboard.
+    """
+    queryset = queryset.order_by(*RANKING)
+    position = 0
+    if cursor:
+        points, wins, pk, position = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(points__lt=points)
+            | Q(points=points, wins__lt=wins)
+            | Q(points=points, wins=wins, id__lt=pk)
+        )
+
+    rows = list(queryset[:limit + 1])
+    for offset, row in enumerate(rows[:limit], start=1):
+        row.position = position + offset
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1], rows[-1].position)
+    return rows, next_cursor
+
+
+def pet_standings():
+    return PetStanding.objects.select_related("pet", "pet__owner")
+
+
+def owner_standings():
+    return OwnerStanding.objects.select_related("owner")
@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from lottery import retention
+from lottery.models import ArchivedEntry, Entry
+
+
+POLICIES = ("notifications", "rounds", "photos", "uploads")
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete old dismissed notifications, archive the non-winning "
+        "entries of old rounds, remove their photos from storage and "
+        "delete direct uploads that never reached an entry. Works in small "
+        "batches and can be interrupted and re-run at any time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--only",
+            choices=POLICIES,
+            action="append",
+            help="Apply only this policy (repeatable).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.RETENTION_BATCH_SIZE,
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=settings.RETENTION_BATCH_SLEEP,
+            help="Seconds to pause between batches.",
+        )
+        parser.add_argument(
+            "--max-batches",
+            type=int,
+            help="Stop each policy after this many batches.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be processed without changing anything.",
+        )
+
+    def handle(self, *args, **options):
+        policies = options["only"] or POLICIES
+        batch = dict(
+            batch_size=max(1, options["batch_size"]),
+            sleep=options["sleep"],
+            max_batches=options["max_batches"],
+        )
+
+        if options["dry_run"]:
+            self.report()
+            return
+
+        if "notifications" in policies:
+            deleted = retention.run_batches(
+                retention.delete_notifications_batch, **batch
+            )
+            self.stdout.write(f"Deleted {deleted} dismissed notifications.")
+
+        if "rounds" in policies:
+            for round_obj in retention.rounds_to_archive().order_by("id"):
+                moved = retention.archive_round(
+                    round_obj, batch["batch_size"], batch["sleep"]
+                )
+                self.stdout.write(
+                    f"Archived {moved} entries of round {round_obj.id}."
+                )
+
+        if "photos" in policies:
+            purged = retention.run_batches(
+                retention.purge_photos_batch, **batch
+            )
+            self.stdout.write(f"Removed {purged} archived photos.")
+
+        if "uploads" in policies:
+            swept = retention.run_batches(
+                retention.sweep_uploads_batch, **batch
+            )
+            self.stdout.write(f"Swept {swept} expired upload keys.")
+
+        self.stdout.write(self.style.SUCCESS("Retention applied."))
+
+    def report(self):
+        rounds = retention.rounds_to_archive()
+        entries = Entry.objects.filter(round__in=rounds, is_winner=False)
+        photos = ArchivedEntry.objects.exclude(photo="")
+        self.stdout.write(
+            "Would delete "
+            f"{retention.expired_notifications().count()} notifications, "
+            f"archive {entries.count()} entries of {rounds.count()} rounds, "
+            f"remove {photos.count()} archived photos and sweep "
+            f"{retention.expired_uploads().count()} expired upload keys."
+        )
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from lottery import placeholders
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute the inline placeholder of every entry photo that does not "
+        "have one yet."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.1,
+            help="Seconds to pause between batches.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=placeholders.FETCH_WORKERS,
+            help="Photos downloaded in parallel.",
+        )
+
+    def handle(self, *args, **options):
+        after_id = 0
+        filled = failed = 0
+        while True:
+            after_id, done, errors = placeholders.backfill_batch(
+                after_id, options["batch_size"], options["workers"]
+            )
+            if after_id is None:
+                break
+            filled += done
+            failed += errors
+            self.stdout.write(f"Up to entry {after_id}: {filled} filled.")
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Filled {filled} placeholders; {failed} photos unreadable."
+            )
+        )
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from lottery import exports
+from lottery.models import LotteryRound
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream every entry of a round, or the winners of all completed "
+        "rounds, as CSV or NDJSON."
+    )
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument("--round", type=int, help="Round id to export.")
+        target.add_argument(
+            "--results",
+            action="store_true",
+            help="Export the winners of all completed rounds.",
+        )
+        parser.add_argument(
+            "--format", choices=sorted(exports.FORMATS), default="csv"
+        )
+        parser.add_argument(
+            "--output", help="File to write to (default: stdout)."
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=exports.CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        if options["results"]:
+            queryset = exports.all_results()
+        else:
+            if not LotteryRound.objects.filter(id=options["round"]).exists():
+                raise CommandError(f"Round {options['round']} not found.")
+            queryset = exports.round_entries(options["round"])
+
+        rows = exports.export_rows(queryset, options["chunk_size"])
+        lines = exports.render(rows, options["format"])
+
+        if options["output"]:
+            with open(options["output"], "w", newline="") as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
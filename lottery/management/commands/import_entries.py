@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from lottery import importers
+
+
+class Command(BaseCommand):
+    help = (
+        "Create pets and round entries from a CSV and a zip of photos. "
+        "Rows that fail validation are reported and skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv", help="CSV file with one entry per row.")
+        parser.add_argument(
+            "--photos", required=True, help="Zip archive of entry photos."
+        )
+        parser.add_argument(
+            "--workers", type=int, default=importers.PHOTO_WORKERS
+        )
+
+    def handle(self, *args, **options):
+        try:
+            csv_file = open(options["csv"], "rb")
+            archive = open(options["photos"], "rb")
+        except OSError as exc:
+            raise CommandError(exc)
+
+        with csv_file, archive:
+            result = importers.import_entries(
+                csv_file, archive, workers=max(1, options["workers"])
+            )
+
+        for line, message in result.errors:
+            self.stderr.write(f"line {line}: {message}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {result.created} entries, "
+                f"skipped {result.skipped}, "
+                f"{len(result.errors)} row(s) reported."
+            )
+        )
@@ -0,0 +1,101 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from lottery import partitioning, search
+
+
+class Command(BaseCommand):
+    help = (
+        "PostgreSQL only: partition the entry and notification tables by "
+        "round, create missing per-round partitions, or detach the "
+        "partitions of old rounds that retention has archived."
+    )
+
+    def add_arguments(self, parser):
+        action = parser.add_mutually_exclusive_group()
+        action.add_argument(
+            "--convert",
+            action="store_true",
+            help="Rebuild both tables as partitioned tables (run once).",
+        )
+        action.add_argument(
+            "--detach-older-than",
+            type=int,
+            metavar="MONTHS",
+            help=(
+                "Detach the partitions of archived rounds drawn before "
+                "this. Winning entries stay in the entry table."
+            ),
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Print the SQL instead of running it.",
+        )
+
+    def handle(self, *args, **options):
+        if not partitioning.is_supported():
+            raise CommandError("Table partitioning requires PostgreSQL.")
+
+        if options["convert"]:
+            statements = self.convert_statements()
+        elif options["detach_older_than"] is not None:
+            statements = self.detach_statements(options["detach_older_than"])
+        else:
+            statements = [
+                partitioning.create_partition_sql(model, round_id)
+                for model in partitioning.PARTITIONED_MODELS
+                if partitioning.is_partitioned(model)
+                for round_id in partitioning.round_ids()
+            ]
+
+        if options["dry_run"]:
+            for statement in statements:
+                self.stdout.write(statement + ";")
+            return
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+            if options["convert"]:
+                # The rebuilt tables lost their search indexes.
+                search.install()
+        self.stdout.write(
+            self.style.SUCCESS(f"Ran {len(statements)} statement(s).")
+        )
+
+    def convert_statements(self):
+        statements = []
+        round_ids = partitioning.round_ids()
+        for model in partitioning.PARTITIONED_MODELS:
+            if partitioning.is_partitioned(model):
+                self.stdout.write(f"{model._meta.db_table} is partitioned.")
+                continue
+            problems = partitioning.conversion_problems(model)
+            if problems:
+                raise CommandError(
+                    f"Cannot partition {model._meta.db_table}: "
+                    + " ".join(problems)
+                )
+            statements += partitioning.conversion_sql(model, round_ids)
+        return statements
+
+    def detach_statements(self, months):
+        rounds = partitioning.detachable_rounds(months)
+        existing = self.existing_partitions()
+        return [
+            statement
+            for model in partitioning.PARTITIONED_MODELS
+            if partitioning.is_partitioned(model)
+            for round_id in rounds
+            if partitioning.partition_name(model, round_id) in existing
+            for statement in partitioning.detach_sql(model, round_id)
+        ]
+
+    def existing_partitions(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid"
+            )
+            return {name for name, in cursor.fetchall()}
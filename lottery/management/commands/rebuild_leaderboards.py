@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from lottery import leaderboards
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the pet and owner leaderboards by replaying every "
+        "completed draw."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rounds = leaderboards.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt leaderboards from {rounds} draws.")
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from lottery import search
+
+
+class Command(BaseCommand):
+    help = (
+        "Create any missing search indexes and, on SQLite, re-sync the "
+        "full-text tables from their source tables."
+    )
+
+    def handle(self, *args, **options):
+        search.install()
+        self.stdout.write(self.style.SUCCESS("Search indexes are up to date."))
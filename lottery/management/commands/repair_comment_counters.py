@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from lottery.counters import recompute
+from lottery.models import Entry
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Entry.comment_count and Entry.last_commented_at from "
+        "the Comment table, in primary-key chunks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Number of entries updated per statement (default 1000).",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        last_pk = 0
+        repaired = 0
+
+        while True:
+            pks = list(
+                Entry.objects.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:chunk_size]
+            )
+            if not pks:
+                break
+            repaired += recompute(Entry.objects.filter(pk__in=pks))
+            last_pk = pks[-1]
+            self.stdout.write(f"Repaired entries up to id {last_pk}")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Recomputed counters for {repaired} entries.")
+        )
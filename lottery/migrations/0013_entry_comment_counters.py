@@ -0,0 +1,47 @@
+# Generated by Django 4.2.28 on 2026-10-18 23:45
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_comment_counters(apps, schema_editor):
+    Entry = apps.get_model("lottery", "Entry")
+    Comment = apps.get_model("lottery", "Comment")
+    comments = Comment.objects.filter(entry=OuterRef("pk")).order_by()
+    Entry.objects.update(
+        comment_count=Coalesce(
+            Subquery(
+                comments.values("entry")
+                .annotate(total=Count("pk"))
+                .values("total")
+            ),
+            Value(0),
+        ),
+        last_commented_at=Subquery(
+            comments.order_by("-created_at").values("created_at")[:1]
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lottery', '0012_remove_notification_unique_notification_per_round_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entry',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='entry',
+            name='last_commented_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(
+            populate_comment_counters, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.28 on 2026-10-18 23:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lottery', '0013_entry_comment_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entry',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='lotteryround',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='pet',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.28 on 2026-10-18 23:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lottery', '0014_updated_at_stamps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedRound',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_count', models.PositiveIntegerField(default=0)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('round', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='archive', to='lottery.lotteryround')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.PositiveBigIntegerField(unique=True)),
+                ('pet_name', models.CharField(max_length=50)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('APPROVED', 'Approved'), ('REJECTED', 'Rejected')], max_length=20)),
+                ('comment_count', models.PositiveIntegerField(default=0)),
+                ('submitted_at', models.DateTimeField()),
+                ('photo', models.CharField(blank=True, max_length=255)),
+                ('pet', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_entries', to='lottery.pet')),
+                ('round', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_entries', to='lottery.lotteryround')),
+            ],
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.28 on 2026-10-19 00:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('lottery', '0015_archive_tables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PetStanding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entries', models.PositiveIntegerField(default=0)),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('first_places', models.PositiveIntegerField(default=0)),
+                ('second_places', models.PositiveIntegerField(default=0)),
+                ('third_places', models.PositiveIntegerField(default=0)),
+                ('points', models.PositiveIntegerField(default=0)),
+                ('current_streak', models.PositiveIntegerField(default=0)),
+                ('best_streak', models.PositiveIntegerField(default=0)),
+                ('last_drawn_at', models.DateTimeField(blank=True, null=True)),
+                ('pet', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='standing', to='lottery.pet')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-points', '-wins', '-id'], name='pet_standing_rank_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='OwnerStanding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entries', models.PositiveIntegerField(default=0)),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('first_places', models.PositiveIntegerField(default=0)),
+                ('second_places', models.PositiveIntegerField(default=0)),
+                ('third_places', models.PositiveIntegerField(default=0)),
+                ('points', models.PositiveIntegerField(default=0)),
+                ('current_streak', models.PositiveIntegerField(default=0)),
+                ('best_streak', models.PositiveIntegerField(default=0)),
+                ('last_drawn_at', models.DateTimeField(blank=True, null=True)),
+                ('owner', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='standing', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-points', '-wins', '-id'], name='owner_standing_rank_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+def install_search_indexes(apps, schema_editor):
+    from lottery import search
+
+    search.install(schema_editor.connection)
+
+
+def remove_search_indexes(apps, schema_editor):
+    from lottery import search
+
+    search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('lottery', '0016_leaderboard_standings'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_indexes, remove_search_indexes),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.28 on 2026-10-19 00:10
+
+from django.db import migrations, models
+
+
+def reinstall_search_indexes(apps, schema_editor):
+    # SQLite rebuilds altered tables, which drops the search triggers.
+    from lottery import search
+
+    search.install(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lottery', '0017_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='badgeaward',
+            name='awarded_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='entry',
+            name='submitted_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.RunPython(
+            reinstall_search_indexes, migrations.RunPython.noop
+        ),
+    ]
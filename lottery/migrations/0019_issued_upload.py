@@ -0,0 +1,21 @@
+# Generated by Django 4.2.28 on 2026-10-19 02:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lottery', '0018_admin_date_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IssuedUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, unique=True)),
+                ('issued_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
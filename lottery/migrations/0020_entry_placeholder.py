@@ -0,0 +1,18 @@
+# Generated by Django 4.2.28 on 2026-10-19 00:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lottery', '0019_issued_upload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entry',
+            name='placeholder',
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
@@ -16,6 +16,7 @@ class LotteryRound(models.Model):
         default=Status.ACTIVE,
     )
     drawn_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.title
@@ -31,6 +32,7 @@ class Pet(models.Model):
     breed = models.CharField(max_length=50, blank=True)
     age = models.CharField(max_length=50)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         constraints = [
@@ -59,6 +61,8 @@ class Entry(models.Model):
         related_name="entries",
     )
     photo = models.ImageField(upload_to="pet_entries/")
+    # Tiny blurred copy of the photo as a data: URI, shown while it loads.
+    placeholder = models.TextField(blank=True, editable=False)
     status = models.CharField(
         max_length=20,
         choices=Status.choices,
@@ -66,7 +70,11 @@ class Entry(models.Model):
     )
     is_winner = models.BooleanField(default=False)
     winner_rank = models.PositiveSmallIntegerField(null=True, blank=True)
-    submitted_at = models.DateTimeField(auto_now_add=True)
+    submitted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Denormalised from Comment, maintained by lottery.counters
+    comment_count = models.PositiveIntegerField(default=0)
+    last_commented_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         constraints = [
@@ -120,7 +128,7 @@ class BadgeAward(models.Model):
         on_delete=models.CASCADE,
         related_name="badge_awards",
     )
-    awarded_at = models.DateTimeField(auto_now_add=True)
+    awarded_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     class Meta:
         constraints = [
@@ -155,7 +163,7 @@ class Notification(models.Model):
         blank=True,
     )
     message = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     dismissed = models.BooleanField(default=False)
 
     class Meta:
@@ -182,10 +190,123 @@ class Comment(models.Model):
         related_name="comments",
     )
     text = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     class Meta:
         ordering = ["-created_at"]
 
     def __str__(self):
         return f"Comment by {self.author} on {self.entry}"
+
+
+class ArchivedRound(models.Model):
+    """Marks a round whose non-winning entries have been archived."""
+    round = models.OneToOneField(
+        LotteryRound,
+        on_delete=models.CASCADE,
+        related_name="archive",
+    )
+    entry_count = models.PositiveIntegerField(default=0)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archive of {self.round}"
+
+
+class ArchivedEntry(models.Model):
+    """
+    Compact copy of a non-winning entry from an archived round. The photo
+    name is cleared once the file has been removed from storage.
+    """
+    original_id = models.PositiveBigIntegerField(unique=True)
+    round = models.ForeignKey(
+        LotteryRound,
+        on_delete=models.CASCADE,
+        related_name="archived_entries",
+    )
+    pet = models.ForeignKey(
+        Pet,
+        on_delete=models.SET_NULL,
+        related_name="archived_entries",
+        null=True,
+        blank=True,
+    )
+    pet_name = models.CharField(max_length=50)
+    status = models.CharField(max_length=20, choices=Entry.Status.choices)
+    comment_count = models.PositiveIntegerField(default=0)
+    submitted_at = models.DateTimeField()
+    photo = models.CharField(max_length=255, blank=True)
+
+    def __str__(self):
+        return f"{self.pet_name} - {self.round} (archived)"
+
+
+class IssuedUpload(models.Model):
+    """
+    An object key handed out for a direct upload. Once its token has
+    expired, the ``uploads`` retention policy deletes the photo stored
+    under it, unless an entry uses the photo, and forgets the key.
+    """
+    key = models.CharField(max_length=255, unique=True)
+    issued_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.key
+
+
+class Standing(models.Model):
+    """
+    Leaderboard counters, updated once per draw by
+    ``lottery.leaderboards.record_draw``. ``points`` scores podium places
+    3/2/1; ``current_streak`` counts consecutive draws with a podium place.
+    """
+    entries = models.PositiveIntegerField(default=0)
+    wins = models.PositiveIntegerField(default=0)
+    first_places = models.PositiveIntegerField(default=0)
+    second_places = models.PositiveIntegerField(default=0)
+    third_places = models.PositiveIntegerField(default=0)
+    points = models.PositiveIntegerField(default=0)
+    current_streak = models.PositiveIntegerField(default=0)
+    best_streak = models.PositiveIntegerField(default=0)
+    last_drawn_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+
+
+class PetStanding(Standing):
+    pet = models.OneToOneField(
+        Pet,
+        on_delete=models.CASCADE,
+        related_name="standing",
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["-points", "-wins", "-id"],
+                name="pet_standing_rank_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.pet.name}: {self.points} points"
+
+
+class OwnerStanding(Standing):
+    owner = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="standing",
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["-points", "-wins", "-id"],
+                name="owner_standing_rank_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.owner}: {self.points} points"
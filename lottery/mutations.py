@@ -0,0 +1,96 @@
+"""
+Authorised writes issued as a single conditional UPDATE or DELETE.
+
+The WHERE clause carries the authorisation (owner or expected status), so
+there is no window between checking and writing. The row is only looked up
+again when nothing matched, to tell "does not exist" (404) from "not
+allowed" (403).
+"""
+import enum
+
+from django.db import transaction
+from django.http import Http404, HttpResponseForbidden
+from django.utils import timezone
+
+from core import page_cache
+
+from . import counters
+from .models import Comment, Entry, Notification
+
+
+class Outcome(enum.Enum):
+    APPLIED = "applied"
+    FORBIDDEN = "forbidden"
+    NOT_FOUND = "not_found"
+
+
+def _outcome(rows, queryset, pk):
+    if rows:
+        return Outcome.APPLIED
+    if queryset.filter(pk=pk).exists():
+        return Outcome.FORBIDDEN
+    return Outcome.NOT_FOUND
+
+
+def guarded_update(queryset, pk, guard, **values):
+    """UPDATE the row ``pk`` only if it also matches ``guard``."""
+    rows = queryset.filter(pk=pk, **guard).update(**values)
+    return _outcome(rows, queryset, pk)
+
+
+def error_response(outcome, forbidden_message):
+    """Turn a failed outcome into a 404 or a 403 response."""
+    if outcome is Outcome.NOT_FOUND:
+        raise Http404("No such object.")
+    return HttpResponseForbidden(forbidden_message)
+
+
+def edit_comment(comment_id, user, text):
+    outcome = guarded_update(
+        Comment.objects.all(), comment_id, {"author": user}, text=text
+    )
+    if outcome is Outcome.APPLIED:
+        # A queryset UPDATE sends no signals; see lottery.signals.
+        page_cache.purge(f"comment:{comment_id}")
+    return outcome
+
+
+def delete_comment(comment_id, user):
+    """
+    Delete a comment owned by ``user`` and update its entry's counters.
+
+    The counter UPDATE joins on the comment and its author, so it doubles
+    as the permission check; the DELETE only runs when it matched.
+    """
+    with transaction.atomic():
+        rows = counters.comment_removed(
+            Entry.objects.filter(
+                comments__id=comment_id, comments__author=user
+            ),
+            comment_id,
+        )
+        if rows:
+            Comment.objects.filter(pk=comment_id).delete()
+    return _outcome(rows, Comment.objects.all(), comment_id)
+
+
+def moderate_entry(entry_id, status):
+    """Approve or reject an entry that is still awaiting moderation."""
+    return guarded_update(
+        Entry.objects.all(),
+        entry_id,
+        {"status": Entry.Status.PENDING},
+        status=status,
+        updated_at=timezone.now(),
+    )
+
+
+def dismiss_notification(notification_id, user):
+    # Scoped to the user's own notifications, so someone else's is
+    # NOT_FOUND rather than FORBIDDEN and its existence is not revealed.
+    return guarded_update(
+        Notification.objects.filter(user=user),
+        notification_id,
+        {},
+        dismissed=True,
+    )
@@ -0,0 +1,54 @@
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class KnownCountPaginator(Paginator):
+    """
+    Paginator for a list whose length is already known, e.g. from a
+    denormalised counter, so no COUNT query is issued.
+    """
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.known_count = count
+
+    @cached_property
+    def count(self):
+        return self.known_count
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that trusts the query planner's row estimate once it is
+    large, instead of running COUNT(*) over millions of rows. Small results
+    and non-PostgreSQL databases still get an exact count.
+    """
+
+    exact_count_below = 10000
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate < self.exact_count_below:
+            return super().count
+        return estimate
+
+
+def estimate_count(queryset):
+    """The planner's row estimate for ``queryset``, or None if unknown."""
+    query = getattr(queryset, "query", None)
+    if query is None:
+        return None
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    sql, params = query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -0,0 +1,195 @@
+"""
+Optional PostgreSQL list partitioning of ``Entry`` and ``Notification`` by
+round, managed with ``manage.py partition_tables``.
+
+Both tables grow with every round and almost every query filters them by
+round, so with one partition per round the planner prunes to a single small
+table and its indexes. Nothing here runs on other databases, and on
+PostgreSQL nothing runs until ``partition_tables --convert`` has been
+applied; until then ``ensure_partitions`` is a cheap catalog lookup.
+
+Converting has consequences the ORM cannot express:
+
+- the primary key becomes ``(id, round_id)``; ``id`` stays unique in
+  practice because it is still drawn from a single sequence;
+- PostgreSQL cannot reference a partitioned table by ``id`` alone, so the
+  database-level foreign key from ``Comment.entry`` is dropped. Django still
+  cascades comment deletes itself, but raw SQL deletes do not, so
+  ``detach_sql`` removes the comments of the entries it detaches;
+- ``Notification.round_id`` becomes NOT NULL;
+- later Django migrations touching these tables need reviewing by hand.
+"""
+from django.db import connection
+
+from .models import Comment, Entry, LotteryRound, Notification
+from .retention import months_ago
+
+
+PARTITIONED_MODELS = (Entry, Notification)
+PARTITION_KEY = "round_id"
+
+
+def is_supported(using=connection):
+    return using.vendor == "postgresql"
+
+
+def partition_name(model, round_id):
+    return f"{model._meta.db_table}_r{int(round_id)}"
+
+
+def is_partitioned(model, using=connection):
+    if not is_supported(using):
+        return False
+    with using.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [model._meta.db_table],
+        )
+        return cursor.fetchone() is not None
+
+
+def create_partition_sql(model, round_id, parent=None):
+    parent = parent or model._meta.db_table
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(model, round_id)} "
+        f"PARTITION OF {parent} FOR VALUES IN ({int(round_id)})"
+    )
+
+
+def ensure_partitions(round_id, using=connection):
+    """
+    Create the partitions for a new round. Returns the models that were
+    partitioned, which is empty unless the tables have been converted.
+    """
+    created = []
+    for model in PARTITIONED_MODELS:
+        if is_partitioned(model, using):
+            with using.cursor() as cursor:
+                cursor.execute(create_partition_sql(model, round_id))
+            created.append(model)
+    return created
+
+
+def detachable_rounds(months):
+    """
+    Ids of rounds drawn more than ``months`` ago whose non-winning entries
+    retention has already archived, so detaching loses nothing live.
+    """
+    return list(
+        LotteryRound.objects.filter(
+            drawn_at__lt=months_ago(months), archive__isnull=False
+        )
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+
+
+def detach_sql(model, round_id):
+    """
+    Detaching is a catalog change: the round's rows stay in a standalone
+    table that can be dumped or dropped later, without a bulk DELETE.
+
+    Winning entries are still shown with their results and comments, so
+    they are copied back into the parent table, where they land in the
+    default partition. Comments on any other entry are deleted first.
+    """
+    table = model._meta.db_table
+    partition = partition_name(model, round_id)
+    statements = []
+    if model is Entry:
+        winner = Entry._meta.get_field("is_winner").column
+        statements.append(
+            f"DELETE FROM {Comment._meta.db_table} WHERE "
+            f"{Comment._meta.get_field('entry').column} IN "
+            f"(SELECT id FROM {partition} WHERE NOT {winner})"
+        )
+    statements.append(f"ALTER TABLE {table} DETACH PARTITION {partition}")
+    if model is Entry:
+        statements.append(
+            f"INSERT INTO {table} SELECT * FROM {partition} WHERE {winner}"
+        )
+    return statements
+
+
+def conversion_sql(model, round_ids):
+    """
+    Statements that rebuild ``model``'s table as a list-partitioned table
+    with one partition per round plus a default partition. Meant to run in
+    a single transaction during a maintenance window.
+    """
+    table = model._meta.db_table
+    staging = f"{table}_partitioned"
+    sequence = f"{table}_id_seq"
+    columns = {field.name: field.column for field in model._meta.fields}
+
+    statements = [
+        f"CREATE TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) "
+        f"PARTITION BY LIST ({PARTITION_KEY})",
+    ]
+    statements += [
+        create_partition_sql(model, round_id, parent=staging)
+        for round_id in round_ids
+    ]
+    statements += [
+        f"CREATE TABLE IF NOT EXISTS {table}_default "
+        f"PARTITION OF {staging} DEFAULT",
+        f"INSERT INTO {staging} SELECT * FROM {table}",
+        # CASCADE also drops foreign keys that point at the old table.
+        f"DROP TABLE {table} CASCADE",
+        f"ALTER TABLE {staging} RENAME TO {table}",
+        f"CREATE SEQUENCE IF NOT EXISTS {sequence} OWNED BY {table}.id",
+        f"SELECT setval('{sequence}', "
+        f"COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)",
+        f"ALTER TABLE {table} ALTER COLUMN id "
+        f"SET DEFAULT nextval('{sequence}')",
+        f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey "
+        f"PRIMARY KEY (id, {PARTITION_KEY})",
+    ]
+    for constraint in model._meta.constraints:
+        fields = [columns[name] for name in constraint.fields]
+        statements.append(
+            f"ALTER TABLE {table} ADD CONSTRAINT {constraint.name} "
+            f"UNIQUE ({', '.join(fields)})"
+        )
+    for field in model._meta.fields:
+        if field.db_index and not field.is_relation:
+            statements.append(
+                f"CREATE INDEX {table}_{field.column}_idx "
+                f"ON {table} ({field.column})"
+            )
+        if not field.is_relation:
+            continue
+        target = field.related_model._meta
+        statements += [
+            f"ALTER TABLE {table} ADD CONSTRAINT {table}_{field.column}_fk "
+            f"FOREIGN KEY ({field.column}) "
+            f"REFERENCES {target.db_table} ({target.pk.column}) "
+            "DEFERRABLE INITIALLY DEFERRED",
+            f"CREATE INDEX {table}_{field.column}_idx "
+            f"ON {table} ({field.column})",
+        ]
+    return statements
+
+
+def conversion_problems(model):
+    """Reasons ``model`` cannot be converted yet, as strings."""
+    problems = []
+    for constraint in model._meta.constraints:
+        if "round" not in constraint.fields:
+            problems.append(
+                f"{constraint.name} does not include the partition key."
+            )
+    orphans = model.objects.filter(round__isnull=True).count()
+    if orphans:
+        problems.append(
+            f"{orphans} {model._meta.verbose_name_plural} have no round."
+        )
+    return problems
+
+
+def round_ids():
+    return list(
+        LotteryRound.objects.order_by("id").values_list("id", flat=True)
+    )
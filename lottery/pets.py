@@ -0,0 +1,110 @@
+"""
+Entering a pet into a round, and the per-user list of saved pets offered
+on the entry form.
+
+``submit_entry`` is one transaction: the pet is upserted on
+``uniq_pet_per_owner_name`` and the entry inserted, and
+``unique_pet_per_round`` decides whether the pet was already entered
+instead of a separate existence check. The upsert always runs, so the id
+comes from the database even when the saved-pet list offered on the form
+is out of date.
+
+The saved-pet list is only cached with ``SHARED_CACHE``; a per-process
+cache could not be invalidated in the other workers.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from core import page_cache
+
+from .models import Entry, Pet
+
+
+SAVED_PETS_TIMEOUT = 60 * 60
+
+
+def saved_pets_key(owner_id):
+    return f"lottery:saved-pets:{owner_id}"
+
+
+def saved_pets(owner_id):
+    """``[{"id", "name", "breed", "age"}, ...]`` for one owner."""
+    if not settings.SHARED_CACHE:
+        return _load_saved_pets(owner_id)
+    key = saved_pets_key(owner_id)
+    pets = cache.get(key)
+    if pets is None:
+        pets = _load_saved_pets(owner_id)
+        cache.set(key, pets, SAVED_PETS_TIMEOUT)
+    return pets
+
+
+def _load_saved_pets(owner_id):
+    return list(
+        Pet.objects.filter(owner_id=owner_id)
+        .order_by("name")
+        .values("id", "name", "breed", "age")
+    )
+
+
+def invalidate_saved_pets(owner_ids):
+    cache.delete_many([saved_pets_key(owner_id) for owner_id in owner_ids])
+
+
+def purge_pet_pages(pet_ids):
+    """Drop cached pages showing entries of the pets ``pet_ids``."""
+    entry_ids = Entry.objects.filter(pet_id__in=pet_ids).values_list(
+        "id", flat=True
+    )
+    keys = [f"entry:{entry_id}" for entry_id in entry_ids]
+    if keys:
+        page_cache.purge(*keys)
+
+
+def upsert_pet(owner_id, name, breed, age):
+    """
+    Return the id of the owner's pet called ``name``, creating it or
+    updating its breed and age as needed.
+    """
+    Pet.objects.bulk_create(
+        [Pet(owner_id=owner_id, name=name, breed=breed, age=age)],
+        update_conflicts=True,
+        unique_fields=["owner", "name"],
+        update_fields=["breed", "age", "updated_at"],
+    )
+    # bulk_create sends no signals.
+    transaction.on_commit(lambda: invalidate_saved_pets([owner_id]))
+    pet_id = Pet.objects.values_list("id", flat=True).get(
+        owner_id=owner_id, name=name
+    )
+    purge_pet_pages([pet_id])
+    return pet_id
+
+
+def submit_entry(owner_id, round_obj, name, breed, age, photo,
+                 placeholder=""):
+    """
+    Enter the owner's pet into ``round_obj``. Returns the new entry, or
+    None when the pet is already entered in that round.
+    """
+    with transaction.atomic():
+        pet_id = upsert_pet(owner_id, name, breed, age)
+        entry = Entry(
+            round=round_obj,
+            pet_id=pet_id,
+            photo=photo,
+            placeholder=placeholder,
+        )
+        try:
+            with transaction.atomic():
+                entry.save()
+        except IntegrityError:
+            if not Entry.objects.filter(
+                round=round_obj, pet_id=pet_id
+            ).exists():
+                raise
+            # The photo was stored before the INSERT failed.
+            entry.photo.delete(save=False)
+            return None
+    return entry
@@ -0,0 +1,57 @@
+"""
+Filling in ``Entry.placeholder`` where the upload did not.
+
+Photos posted through Django get their placeholder while they are verified
+(see ``forms.verify_image``), and photos uploaded straight to storage get
+one from ``uploads.placeholder``. Whatever those miss (a busy image pool,
+an unreachable storage service, entries stored before placeholders
+existed) is left to ``manage.py backfill_placeholders``, which works in
+id-ordered batches so an interrupted run picks up where it stopped.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from . import imaging
+from .models import Entry
+
+
+FETCH_WORKERS = 4
+
+
+def pending():
+    return Entry.objects.filter(placeholder="").exclude(photo="")
+
+
+def _placeholder_for(entry):
+    try:
+        with entry.photo.open("rb") as photo:
+            data = photo.read()
+        return imaging.run(imaging.placeholder, data, block=True)
+    except (OSError, ValueError):
+        # Missing or unreadable photo: leave it for a later run.
+        return ""
+
+
+def backfill_batch(after_id, batch_size, workers=FETCH_WORKERS):
+    """
+    Fill the placeholders of up to ``batch_size`` entries with an id above
+    ``after_id``. Returns ``(last id, filled, failed)``, with a last id of
+    None once nothing is left.
+    """
+    entries = list(
+        pending()
+        .filter(id__gt=after_id)
+        .order_by("id")
+        .only("id", "photo")[:batch_size]
+    )
+    if not entries:
+        return None, 0, 0
+    # Threads overlap the storage downloads; decoding happens in the pool.
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        values = list(pool.map(_placeholder_for, entries))
+    filled = []
+    for entry, value in zip(entries, values):
+        if value:
+            entry.placeholder = value
+            filled.append(entry)
+    Entry.objects.bulk_update(filled, ["placeholder"])
+    return entries[-1].id, len(filled), len(entries) - len(filled)
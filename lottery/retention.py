@@ -0,0 +1,195 @@
+"""
+Retention policies, applied by ``manage.py apply_retention``.
+
+Every policy works in bounded batches, each in its own transaction, and
+keeps its progress in the data itself, so an interrupted run simply picks
+up where it stopped:
+
+- dismissed notifications older than the configured age are deleted;
+- the non-winning entries of rounds drawn more than N months ago are moved
+  to ``ArchivedEntry`` (winners stay live for results, badges and
+  comments), and the round is marked with an ``ArchivedRound`` row;
+- photos of archived entries are deleted from storage and their names
+  cleared;
+- direct upload keys whose token has expired are forgotten, deleting any
+  photo uploaded under them that no entry uses.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import uploads
+from .models import (
+    ArchivedEntry,
+    ArchivedRound,
+    Entry,
+    IssuedUpload,
+    LotteryRound,
+    Notification,
+)
+
+
+def months_ago(months, now=None):
+    return (now or timezone.now()) - timedelta(days=30 * months)
+
+
+def run_batches(step, batch_size, sleep, max_batches=None):
+    """
+    Call ``step(batch_size)`` until it reports no work, pausing ``sleep``
+    seconds between batches. Returns the total processed.
+    """
+    total = batches = 0
+    while max_batches is None or batches < max_batches:
+        done = step(batch_size)
+        if not done:
+            break
+        total += done
+        batches += 1
+        if sleep:
+            time.sleep(sleep)
+    return total
+
+
+# -------------------------
+# Notifications
+# -------------------------
+def expired_notifications(now=None):
+    cutoff = (now or timezone.now()) - timedelta(
+        days=settings.RETENTION_DISMISSED_NOTIFICATION_DAYS
+    )
+    return Notification.objects.filter(dismissed=True, created_at__lt=cutoff)
+
+
+def delete_notifications_batch(batch_size):
+    ids = list(
+        expired_notifications()
+        .order_by("id")
+        .values_list("id", flat=True)[:batch_size]
+    )
+    if ids:
+        Notification.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+# -------------------------
+# Rounds
+# -------------------------
+def rounds_to_archive(now=None):
+    cutoff = months_ago(
+        settings.RETENTION_ARCHIVE_ROUNDS_AFTER_MONTHS, now
+    )
+    return LotteryRound.objects.filter(
+        status=LotteryRound.Status.COMPLETED,
+        drawn_at__lt=cutoff,
+        archive__isnull=True,
+    )
+
+
+def archive_entries_batch(round_obj, batch_size):
+    """Move up to ``batch_size`` non-winning entries of one round."""
+    with transaction.atomic():
+        entries = list(
+            Entry.objects.filter(round=round_obj, is_winner=False)
+            .select_related("pet")
+            .order_by("id")[:batch_size]
+        )
+        if not entries:
+            return 0
+        ArchivedEntry.objects.bulk_create(
+            [
+                ArchivedEntry(
+                    original_id=entry.id,
+                    round_id=entry.round_id,
+                    pet_id=entry.pet_id,
+                    pet_name=entry.pet.name,
+                    status=entry.status,
+                    comment_count=entry.comment_count,
+                    submitted_at=entry.submitted_at,
+                    photo=entry.photo.name,
+                )
+                for entry in entries
+            ],
+            ignore_conflicts=True,
+        )
+        Entry.objects.filter(id__in=[entry.id for entry in entries]).delete()
+    return len(entries)
+
+
+def archive_round(round_obj, batch_size, sleep):
+    moved = run_batches(
+        lambda size: archive_entries_batch(round_obj, size),
+        batch_size,
+        sleep,
+    )
+    ArchivedRound.objects.get_or_create(
+        round=round_obj,
+        defaults={
+            "entry_count": ArchivedEntry.objects.filter(
+                round=round_obj
+            ).count()
+        },
+    )
+    return moved
+
+
+# -------------------------
+# Photos
+# -------------------------
+def purge_photos_batch(batch_size):
+    """
+    Delete the stored photos of up to ``batch_size`` archived entries.
+    Files are removed before their names are cleared, so a crash leaves
+    at most one batch to retry; storage deletes of missing files are
+    harmless.
+    """
+    rows = list(
+        ArchivedEntry.objects.exclude(photo="")
+        .order_by("id")
+        .values_list("id", "photo")[:batch_size]
+    )
+    if not rows:
+        return 0
+    storage = Entry._meta.get_field("photo").storage
+    for _, name in rows:
+        storage.delete(name)
+    ArchivedEntry.objects.filter(id__in=[pk for pk, _ in rows]).update(
+        photo=""
+    )
+    return len(rows)
+
+
+# -------------------------
+# Direct uploads
+# -------------------------
+def expired_uploads(now=None):
+    # Twice the token lifetime, so a form that attached its photo just
+    # before the token expired has long since saved its entry.
+    cutoff = (now or timezone.now()) - timedelta(
+        seconds=2 * settings.DIRECT_UPLOAD_MAX_AGE
+    )
+    return IssuedUpload.objects.filter(issued_at__lt=cutoff)
+
+
+def sweep_uploads_batch(batch_size):
+    """
+    Forget up to ``batch_size`` expired upload keys, deleting the photos
+    stored under the ones no entry uses. Does nothing while direct uploads
+    are turned off, as there is no backend to ask for the photos.
+    """
+    if uploads.backend() is None:
+        return 0
+    rows = list(
+        expired_uploads()
+        .order_by("id")
+        .values_list("id", "key")[:batch_size]
+    )
+    if not rows:
+        return 0
+    for _, key in rows:
+        if not Entry.objects.filter(photo__startswith=key).exists():
+            uploads.discard(key)
+    IssuedUpload.objects.filter(id__in=[pk for pk, _ in rows]).delete()
+    return len(rows)
@@ -0,0 +1,261 @@
+"""
+Indexed search over pet names, usernames, comments and notifications.
+
+Django's ``search_fields`` compile to ``UPPER(col) LIKE UPPER('%q%')``
+joined across relations and OR-ed together, which no index can serve. Here
+each searched column is matched through an index and the per-column id sets
+are combined with UNION:
+
+- PostgreSQL: ``pg_trgm`` GIN indexes serve ``ILIKE '%q%'`` on short
+  name columns, and ``to_tsvector('simple', ...)`` GIN indexes serve word
+  searches on comment and notification text;
+- SQLite: external-content FTS5 tables (trigram tokenizer for names,
+  word tokenizer for text) kept in sync by triggers.
+
+``install`` creates all of this; it runs in a migration and again from
+``manage.py rebuild_search_index`` (needed on SQLite after a migration
+rebuilds one of the indexed tables, which drops its triggers). Columns
+without an index, queries too short for trigrams and databases where
+installation was not possible fall back to ``icontains``.
+"""
+from functools import lru_cache
+
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connection, connections, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Comment, Notification, Pet
+
+
+TRIGRAM = "trigram"
+FULLTEXT = "fulltext"
+MIN_TRIGRAM_LENGTH = 3
+RESULT_LIMIT = 50
+
+
+def indexed_columns():
+    """``(model, field name, kind)`` for every column with a search index."""
+    return [
+        (Pet, "name", TRIGRAM),
+        (get_user_model(), "username", TRIGRAM),
+        (Comment, "text", FULLTEXT),
+        (Notification, "message", FULLTEXT),
+    ]
+
+
+def index_name(model, column):
+    return f"search_{model._meta.db_table}_{column}"
+
+
+def _column(model, field_name):
+    return model._meta.get_field(field_name).column
+
+
+# -------------------------
+# Installation
+# -------------------------
+def _postgres_sql(model, column, kind):
+    table = model._meta.db_table
+    if kind == TRIGRAM:
+        expression = f"{column} gin_trgm_ops"
+    else:
+        expression = f"to_tsvector('simple', {column})"
+    return [
+        f"CREATE INDEX IF NOT EXISTS {index_name(model, column)} "
+        f"ON {table} USING gin ({expression})"
+    ]
+
+
+def _sqlite_sql(model, column, kind):
+    table = model._meta.db_table
+    pk = model._meta.pk.column
+    fts = index_name(model, column)
+    tokenizer = "trigram" if kind == TRIGRAM else "unicode61"
+    remove = (
+        f"INSERT INTO {fts}({fts}, rowid, {column}) "
+        f"VALUES ('delete', old.{pk}, old.{column});"
+    )
+    add = (
+        f"INSERT INTO {fts}(rowid, {column}) "
+        f"VALUES (new.{pk}, new.{column});"
+    )
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({column}, "
+        f"content='{table}', content_rowid='{pk}', tokenize='{tokenizer}')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} "
+        f"BEGIN {add} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} "
+        f"BEGIN {remove} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column} "
+        f"ON {table} BEGIN {remove} {add} END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def install(using=connection):
+    """Create the search indexes for this database. Safe to re-run."""
+    statements = []
+    if using.vendor == "postgresql":
+        try:
+            with transaction.atomic(using=using.alias):
+                with using.cursor() as cursor:
+                    cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except DatabaseError:
+            # Without the extension only the full-text indexes are built.
+            pass
+        trigrams = _has_trigram_extension(using)
+        for model, field_name, kind in indexed_columns():
+            if kind == TRIGRAM and not trigrams:
+                continue
+            statements += _postgres_sql(
+                model, _column(model, field_name), kind
+            )
+    elif using.vendor == "sqlite":
+        for model, field_name, kind in indexed_columns():
+            statements += _sqlite_sql(model, _column(model, field_name), kind)
+
+    with using.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+    installed_indexes.cache_clear()
+
+
+def uninstall(using=connection):
+    with using.cursor() as cursor:
+        for model, field_name, _ in indexed_columns():
+            name = index_name(model, _column(model, field_name))
+            if using.vendor == "postgresql":
+                cursor.execute(f"DROP INDEX IF EXISTS {name}")
+            elif using.vendor == "sqlite":
+                for suffix in ("_ai", "_ad", "_au"):
+                    cursor.execute(f"DROP TRIGGER IF EXISTS {name}{suffix}")
+                cursor.execute(f"DROP TABLE IF EXISTS {name}")
+    installed_indexes.cache_clear()
+
+
+def _has_trigram_extension(using):
+    with using.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+@lru_cache(maxsize=None)
+def installed_indexes(alias=connection.alias):
+    using = connections[alias]
+    with using.cursor() as cursor:
+        if using.vendor == "postgresql":
+            cursor.execute(
+                "SELECT indexname FROM pg_indexes "
+                "WHERE indexname LIKE 'search%'"
+            )
+        elif using.vendor == "sqlite":
+            cursor.execute(
+                "SELECT name FROM sqlite_master "
+                "WHERE type = 'table' AND name LIKE 'search%'"
+            )
+        else:
+            return frozenset()
+        return frozenset(name for name, in cursor.fetchall())
+
+
+# -------------------------
+# Querying
+# -------------------------
+def _like_pattern(query):
+    for char in ("\\", "%", "_"):
+        query = query.replace(char, "\\" + char)
+    return f"%{query}%"
+
+
+def _fts_phrase(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def indexed_match(model, field_name, query):
+    """
+    A ``Q`` on ``model`` selecting rows whose column matches ``query``
+    through its search index, or None when no index can be used.
+    """
+    column = _column(model, field_name)
+    kinds = {
+        (indexed_model, name): kind
+        for indexed_model, name, kind in indexed_columns()
+    }
+    kind = kinds.get((model, field_name))
+    name = index_name(model, column)
+    if kind is None or name not in installed_indexes():
+        return None
+    if kind == TRIGRAM and len(query) < MIN_TRIGRAM_LENGTH:
+        return None
+
+    table = model._meta.db_table
+    pk = model._meta.pk.column
+    if connection.vendor == "postgresql":
+        if kind == TRIGRAM:
+            sql = f"SELECT {pk} FROM {table} WHERE {column} ILIKE %s"
+            params = [_like_pattern(query)]
+        else:
+            sql = (
+                f"SELECT {pk} FROM {table} WHERE to_tsvector('simple', "
+                f"{column}) @@ plainto_tsquery('simple', %s)"
+            )
+            params = [query]
+    else:
+        if kind == TRIGRAM:
+            match = _fts_phrase(query)
+        else:
+            match = " ".join(_fts_phrase(word) for word in query.split())
+        sql = f"SELECT rowid FROM {name} WHERE {name} MATCH %s"
+        params = [match]
+    return Q(pk__in=RawSQL(sql, params))
+
+
+def field_ids(model, path, query):
+    """
+    Primary keys of ``model`` rows whose ``path`` (a search_fields-style
+    lookup such as ``pet__owner__username``) matches ``query``.
+    """
+    *relations, field_name = path.split("__")
+    target = model
+    for relation in relations:
+        target = target._meta.get_field(relation).related_model
+
+    condition = indexed_match(target, field_name, query)
+    if condition is None:
+        matches = model.objects.filter(**{f"{path}__icontains": query})
+    elif relations:
+        matches = model.objects.filter(
+            **{
+                "__".join(relations) + "__in": target.objects.filter(
+                    condition
+                ).values("pk")
+            }
+        )
+    else:
+        matches = model.objects.filter(condition)
+    return matches.order_by().values("pk")
+
+
+def filter_queryset(queryset, paths, query):
+    """Rows of ``queryset`` where any of ``paths`` matches ``query``."""
+    query = query.strip()
+    if not query or not paths:
+        return queryset
+    model = queryset.model
+    branches = [field_ids(model, path, query) for path in paths]
+    ids = branches[0]
+    if len(branches) > 1:
+        ids = ids.union(*branches[1:])
+    return queryset.filter(pk__in=ids)
+
+
+def search_pets(query, limit=RESULT_LIMIT):
+    return (
+        filter_queryset(
+            Pet.objects.select_related("owner", "standing"),
+            ["name", "owner__username"],
+            query,
+        )
+        .order_by("name", "id")[:limit]
+    )
@@ -0,0 +1,72 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core import page_cache
+
+from . import events, partitioning, pets
+from .models import Comment, Entry, LotteryRound, Notification, Pet
+
+
+@receiver(post_save, sender=Notification)
+def push_new_notification(sender, instance, created, **kwargs):
+    """Stream newly created notifications to their owner."""
+    if not created:
+        return
+    events.publish(
+        events.user_channel(instance.user_id),
+        "notification",
+        {
+            "id": instance.id,
+            "message": instance.message,
+            "pet": instance.pet.name if instance.pet_id else None,
+            "created_at": instance.created_at,
+        },
+    )
+
+
+@receiver(post_save, sender=LotteryRound)
+def create_round_partitions(sender, instance, created, **kwargs):
+    """Give a new round its own partitions once the tables are converted."""
+    if created:
+        partitioning.ensure_partitions(instance.id)
+
+
+@receiver(post_save, sender=Pet)
+@receiver(post_delete, sender=Pet)
+def forget_saved_pets(sender, instance, **kwargs):
+    """Drop the owner's cached pet list when one of their pets changes."""
+    pets.invalidate_saved_pets([instance.owner_id])
+
+
+@receiver(post_save, sender=Pet)
+def purge_pet_pages(sender, instance, created, **kwargs):
+    """Drop cached pages showing the pet's name, breed or age."""
+    if not created:
+        pets.purge_pet_pages([instance.id])
+
+
+@receiver(post_save, sender=LotteryRound)
+@receiver(post_delete, sender=LotteryRound)
+def purge_round_pages(sender, instance, created=False, **kwargs):
+    """Drop cached pages listing or showing a new or changed round."""
+    if created:
+        page_cache.purge("rounds:active")
+        return
+    keys = ["rounds:active", f"round:{instance.id}"]
+    if instance.status == LotteryRound.Status.COMPLETED:
+        keys.append("rounds:completed")
+    page_cache.purge(*keys)
+
+
+@receiver(post_save, sender=Entry)
+@receiver(post_delete, sender=Entry)
+def purge_entry_pages(sender, instance, **kwargs):
+    """Drop cached pages showing the entry or its round's winners."""
+    page_cache.purge(f"entry:{instance.id}", f"round:{instance.round_id}")
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def purge_comment_pages(sender, instance, **kwargs):
+    """Drop cached pages showing the entry's comments or comment count."""
+    page_cache.purge(f"entry:{instance.entry_id}")
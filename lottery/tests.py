@@ -1,18 +1,78 @@
+import asyncio
+import csv
 import io
+import json
+import os
 import shutil
 import tempfile
+import threading
+import zipfile
+from unittest import mock
 from PIL import Image
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
-from .models import LotteryRound, Pet, Entry
+from . import events, imaging, pets, placeholders, uploads
+from .models import (
+    ArchivedEntry,
+    ArchivedRound,
+    Comment,
+    IssuedUpload,
+    LotteryRound,
+    OwnerStanding,
+    Pet,
+    PetStanding,
+    Entry,
+    Notification,
+)
 
 
 User = get_user_model()
 
 
+class TempMediaMixin:
+    """Run the test class against its own MEDIA_ROOT, removed afterwards."""
+
+    @classmethod
+    def setUpClass(cls):
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=media_root))
+        super().setUpClass()
+
+
+class RoundEntryMixin(TempMediaMixin):
+    """An active ``self.round`` and a logged-in ``self.user`` to enter it."""
+
+    is_staff = False
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="entrant", password="pass12345", is_staff=self.is_staff
+        )
+        now = timezone.now()
+        self.round = LotteryRound.objects.create(
+            title="Entry Round",
+            start_date=now - timezone.timedelta(days=1),
+            end_date=now + timezone.timedelta(days=1),
+            status=LotteryRound.Status.ACTIVE,
+        )
+        self.client.login(username="entrant", password="pass12345")
+
+    def _png(self, size=(1, 1), color=0):
+        f = io.BytesIO()
+        Image.new("RGB", size, color).save(f, format="PNG")
+        return f.getvalue()
+
+
 @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class LotteryCoreFeatureTests(TestCase):
     @classmethod
@@ -292,3 +352,1345 @@ class LotteryCoreFeatureTests(TestCase):
             ("already been drawn" in resp.content.decode().lower())
 
         )
+
+
+class LiveEventsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="live1", password="pass12345"
+        )
+
+    async def test_in_process_broker_delivers_to_subscribers(self):
+        broker = events.InProcessBroker()
+        stream = broker.subscribe(["user:1"], timeout=1)
+        # Start the generator so the subscription is registered
+        first = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+        broker.publish("user:1", "notification", {"id": 7})
+        broker.publish("user:2", "notification", {"id": 8})
+        self.assertEqual(await first, ("notification", {"id": 7}))
+        self.assertIsNone(await stream.__anext__())
+        await stream.aclose()
+
+    def test_new_notification_is_published_to_its_owner(self):
+        broker = mock.Mock()
+        with mock.patch.object(events, "get_broker", return_value=broker):
+            with self.captureOnCommitCallbacks(execute=True):
+                notification = Notification.objects.create(
+                    user=self.user, message="Hello"
+                )
+        broker.publish.assert_called_once()
+        channel, event, data = broker.publish.call_args.args
+        self.assertEqual(channel, events.user_channel(self.user.id))
+        self.assertEqual(event, "notification")
+        self.assertEqual(data["id"], notification.id)
+
+    def test_event_stream_is_disabled_under_wsgi(self):
+        resp = self.client.get(reverse("live_events"))
+        self.assertEqual(resp.status_code, 204)
+
+
+class CommentCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="commenter", password="pass12345"
+        )
+        now = timezone.now()
+        round_obj = LotteryRound.objects.create(
+            title="Finished Round",
+            start_date=now - timezone.timedelta(days=7),
+            end_date=now - timezone.timedelta(days=1),
+            status=LotteryRound.Status.COMPLETED,
+            drawn_at=now,
+        )
+        pet = Pet.objects.create(owner=self.user, name="Rex", age="1 year(s)")
+        self.entry = Entry.objects.create(
+            pet=pet,
+            round=round_obj,
+            photo="pet_entries/rex.png",
+            status=Entry.Status.APPROVED,
+            is_winner=True,
+            winner_rank=1,
+        )
+        self.client.login(username="commenter", password="pass12345")
+
+    def _post_comment(self, text):
+        prefix = f"entry_{self.entry.id}"
+        return self.client.post(
+            reverse("comment_create", args=[self.entry.id]),
+            {f"{prefix}-text": text},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+
+    def test_counters_follow_comment_create_and_delete(self):
+        first = self._post_comment("Lovely!").json()["comment"]
+        self._post_comment("So cute")
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.comment_count, 2)
+        latest = Comment.objects.latest("created_at")
+        self.assertEqual(self.entry.last_commented_at, latest.created_at)
+
+        self.client.post(
+            reverse("comment_delete", args=[latest.id]),
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.comment_count, 1)
+        self.assertEqual(
+            self.entry.last_commented_at,
+            Comment.objects.get(id=first["id"]).created_at,
+        )
+
+    def test_repair_command_recomputes_counters(self):
+        Comment.objects.create(entry=self.entry, author=self.user, text="a")
+        Comment.objects.create(entry=self.entry, author=self.user, text="b")
+        Entry.objects.update(comment_count=99, last_commented_at=None)
+
+        call_command(
+            "repair_comment_counters", chunk_size=1, stdout=io.StringIO()
+        )
+
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.comment_count, 2)
+        self.assertIsNotNone(self.entry.last_commented_at)
+
+
+class GuardedMutationTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username="author", password="pass12345"
+        )
+        self.other = User.objects.create_user(
+            username="other", password="pass12345"
+        )
+        self.staff = User.objects.create_user(
+            username="moderator", password="pass12345", is_staff=True
+        )
+        now = timezone.now()
+        round_obj = LotteryRound.objects.create(
+            title="Round",
+            start_date=now - timezone.timedelta(days=1),
+            end_date=now + timezone.timedelta(days=1),
+        )
+        pet = Pet.objects.create(owner=self.author, name="Rex", age="2")
+        self.entry = Entry.objects.create(
+            pet=pet, round=round_obj, photo="pet_entries/rex.png"
+        )
+        self.comment = Comment.objects.create(
+            entry=self.entry, author=self.author, text="Original"
+        )
+        Entry.objects.update(comment_count=1)
+
+    @override_settings(
+        SHARED_CACHE=True,
+        SESSION_ENGINE="django.contrib.sessions.backends.cached_db",
+        MIDDLEWARE=[
+            "core.middleware.CachedAuthenticationMiddleware"
+            if m == "django.contrib.auth.middleware.AuthenticationMiddleware"
+            else m
+            for m in settings.MIDDLEWARE
+        ],
+    )
+    def test_only_the_author_can_edit_a_comment(self):
+        self.client.login(username="other", password="pass12345")
+        url = reverse("comment_edit", args=[self.comment.id])
+        resp = self.client.post(url, {"text": "Hijacked"})
+        self.assertEqual(resp.status_code, 403)
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.text, "Original")
+
+        self.client.login(username="author", password="pass12345")
+        self.client.get(url)  # warm the cached user
+        with self.assertNumQueries(1):
+            resp = self.client.post(
+                url, {"text": "Edited"}, HTTP_X_REQUESTED_WITH="XMLHttpRequest"
+            )
+        self.assertEqual(resp.json()["comment"]["text"], "Edited")
+
+    def test_missing_comment_is_404_and_foreign_comment_is_403(self):
+        self.client.login(username="other", password="pass12345")
+        missing = self.client.post(reverse("comment_delete", args=[999]))
+        self.assertEqual(missing.status_code, 404)
+        foreign = self.client.post(
+            reverse("comment_delete", args=[self.comment.id])
+        )
+        self.assertEqual(foreign.status_code, 403)
+        self.assertTrue(Comment.objects.filter(id=self.comment.id).exists())
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.comment_count, 1)
+
+    def test_entries_are_only_moderated_once(self):
+        self.client.login(username="moderator", password="pass12345")
+        self.client.post(reverse("approve_entry", args=[self.entry.id]))
+        resp = self.client.post(
+            reverse("reject_entry", args=[self.entry.id]), follow=True
+        )
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.status, Entry.Status.APPROVED)
+        self.assertContains(resp, "already been moderated")
+
+    def test_cannot_dismiss_someone_elses_notification(self):
+        notification = Notification.objects.create(
+            user=self.author, message="Hi"
+        )
+        self.client.login(username="other", password="pass12345")
+        resp = self.client.post(
+            reverse("dismiss_notification"), {"id": notification.id}
+        )
+        self.assertEqual(resp.status_code, 404)
+        notification.refresh_from_db()
+        self.assertFalse(notification.dismissed)
+
+
+class ReadOnlyApiTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="apiuser", password="pass12345"
+        )
+        now = timezone.now()
+        self.rounds = [
+            LotteryRound.objects.create(
+                title=f"Round {i}",
+                start_date=now - timezone.timedelta(days=1),
+                end_date=now + timezone.timedelta(days=1),
+            )
+            for i in range(3)
+        ]
+
+    def test_active_rounds_support_sparse_fields_and_cursor(self):
+        url = reverse("api:active_rounds")
+        first = self.client.get(url, {"limit": 2, "fields": "id"}).json()
+        self.assertEqual(first["data"], [
+            {"id": self.rounds[2].id}, {"id": self.rounds[1].id},
+        ])
+        second = self.client.get(
+            url, {"limit": 2, "fields": "id", "cursor": first["next"]}
+        ).json()
+        self.assertEqual(second["data"], [{"id": self.rounds[0].id}])
+        self.assertIsNone(second["next"])
+
+    def test_invalid_cursor_is_rejected(self):
+        resp = self.client.get(
+            reverse("api:active_rounds"), {"cursor": "not-a-cursor"}
+        )
+        self.assertEqual(resp.status_code, 400)
+
+    def test_unchanged_resource_answers_304(self):
+        url = reverse("api:active_rounds")
+        etag = self.client.get(url)["ETag"]
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+
+        self.rounds[0].title = "Renamed"
+        self.rounds[0].save()
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+
+    def test_etag_depends_on_the_query_string(self):
+        url = reverse("api:active_rounds")
+        etag = self.client.get(url, {"limit": 1})["ETag"]
+        resp = self.client.get(
+            url, {"limit": 1, "fields": "id"}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp["ETag"], etag)
+
+    def test_pet_changes_change_entry_etags(self):
+        pet = Pet.objects.create(owner=self.user, name="Rex", age="2")
+        entry = Entry.objects.create(
+            pet=pet, round=self.rounds[0], photo="pet_entries/rex.png",
+            status=Entry.Status.APPROVED,
+        )
+        url = reverse("api:entry_detail", args=[entry.id])
+        etag = self.client.get(url)["ETag"]
+        pets.upsert_pet(self.user.id, "Rex", "Beagle", "3")
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["data"]["pet"]["breed"], "Beagle")
+
+    def test_pending_entry_is_private_to_its_owner(self):
+        pet = Pet.objects.create(owner=self.user, name="Rex", age="2")
+        entry = Entry.objects.create(
+            pet=pet, round=self.rounds[0], photo="pet_entries/rex.png"
+        )
+        url = reverse("api:entry_detail", args=[entry.id])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        self.client.login(username="apiuser", password="pass12345")
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn("private", resp["Cache-Control"])
+        self.assertIn("Cookie", resp["Vary"])
+
+        entry.status = Entry.Status.APPROVED
+        entry.save()
+        resp = self.client.get(url)
+        self.assertIn("public", resp["Cache-Control"])
+
+    def test_completed_rounds_list_winners(self):
+        round_obj = self.rounds[0]
+        pet = Pet.objects.create(owner=self.user, name="Rex", age="2")
+        Entry.objects.create(
+            pet=pet, round=round_obj, photo="pet_entries/rex.png",
+            status=Entry.Status.APPROVED, is_winner=True, winner_rank=1,
+        )
+        round_obj.status = LotteryRound.Status.COMPLETED
+        round_obj.drawn_at = timezone.now()
+        round_obj.save()
+
+        data = self.client.get(reverse("api:completed_rounds")).json()
+        self.assertEqual(len(data["data"]), 1)
+        self.assertEqual(data["data"][0]["winners"][0]["pet"]["name"], "Rex")
+
+    def test_user_endpoints_require_authentication(self):
+        resp = self.client.get(reverse("api:my_notifications"))
+        self.assertEqual(resp.status_code, 401)
+
+        Notification.objects.create(user=self.user, message="Hello")
+        self.client.login(username="apiuser", password="pass12345")
+        resp = self.client.get(reverse("api:my_notifications"))
+        self.assertEqual(resp.json()["data"][0]["message"], "Hello")
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            username="exporter", password="pass12345", is_staff=True
+        )
+        now = timezone.now()
+        self.round = LotteryRound.objects.create(
+            title="Export Round",
+            start_date=now - timezone.timedelta(days=1),
+            end_date=now + timezone.timedelta(days=1),
+        )
+        for name in ("Rex", "Fido"):
+            pet = Pet.objects.create(owner=self.staff, name=name, age="2")
+            Entry.objects.create(
+                pet=pet, round=self.round, photo=f"pet_entries/{name}.png"
+            )
+
+    def test_staff_can_stream_round_entries_as_csv(self):
+        self.client.login(username="exporter", password="pass12345")
+        resp = self.client.get(reverse("export_round", args=[self.round.id]))
+        self.assertTrue(resp.streaming)
+        lines = b"".join(resp.streaming_content).decode().splitlines()
+        self.assertTrue(lines[0].startswith("entry_id,round_id,round_title"))
+        self.assertEqual(len(lines), 3)
+        self.assertIn("exporter", lines[1])
+
+    def test_csv_export_defuses_formulas(self):
+        Pet.objects.filter(name="Rex").update(
+            name="=HYPERLINK(\"http://x\")", breed="-2+3"
+        )
+        out = io.StringIO()
+        call_command("export_entries", round=self.round.id, stdout=out)
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        self.assertEqual(rows[0]["pet_name"], "'=HYPERLINK(\"http://x\")")
+        self.assertEqual(rows[0]["pet_breed"], "'-2+3")
+        self.assertEqual(rows[1]["pet_name"], "Fido")
+
+    def test_ndjson_export_and_staff_only(self):
+        url = reverse("export_round", args=[self.round.id])
+        self.assertNotEqual(self.client.get(url).status_code, 200)
+
+        self.client.login(username="exporter", password="pass12345")
+        resp = self.client.get(url, {"format": "ndjson"})
+        rows = [
+            json.loads(line)
+            for line in b"".join(resp.streaming_content).splitlines()
+        ]
+        self.assertEqual([r["pet_name"] for r in rows], ["Rex", "Fido"])
+
+    def test_export_command_writes_csv(self):
+        out = io.StringIO()
+        call_command("export_entries", round=self.round.id, stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+
+
+class ImportTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            username="shelter", password="pass12345", is_staff=True
+        )
+        now = timezone.now()
+        self.round = LotteryRound.objects.create(
+            title="Import Round",
+            start_date=now - timezone.timedelta(days=1),
+            end_date=now + timezone.timedelta(days=1),
+        )
+        Pet.objects.create(owner=self.staff, name="Rex", age="1")
+
+    def _archive(self, *names):
+        png = io.BytesIO()
+        Image.new("RGB", (1, 1)).save(png, format="PNG")
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as bundle:
+            for name in names:
+                bundle.writestr(name, png.getvalue())
+            bundle.writestr("broken.png", b"not an image")
+        archive.seek(0)
+        return archive
+
+    def _csv(self, *rows):
+        lines = ["round_id,owner,pet_name,pet_breed,pet_age,photo"]
+        lines += [",".join(row) for row in rows]
+        return io.BytesIO("\n".join(lines).encode())
+
+    def test_valid_rows_import_and_bad_rows_are_reported(self):
+        from .importers import import_entries
+
+        rid = str(self.round.id)
+        result = import_entries(
+            self._csv(
+                (rid, "shelter", "Rex", "Lab", "3", "rex.png"),
+                (rid, "shelter", "Bella", "", "2", "bella.png"),
+                (rid, "nobody", "Ghost", "", "2", "rex.png"),
+                (rid, "shelter", "Broken", "", "2", "broken.png"),
+                (rid, "shelter", "Missing", "", "2", "missing.png"),
+                ("999", "shelter", "Lost", "", "2", "rex.png"),
+            ),
+            self._archive("rex.png", "bella.png"),
+        )
+
+        self.assertEqual(result.created, 2)
+        self.assertEqual([line for line, _ in result.errors], [4, 5, 6, 7])
+        rex = Pet.objects.get(owner=self.staff, name="Rex")
+        self.assertEqual((rex.breed, rex.age), ("Lab", "3"))
+        self.assertEqual(self.round.entries.count(), 2)
+
+    def test_reimport_skips_existing_entries(self):
+        from .importers import import_entries
+
+        row = (str(self.round.id), "shelter", "Rex", "", "1", "rex.png")
+        import_entries(self._csv(row), self._archive("rex.png"))
+        result = import_entries(self._csv(row), self._archive("rex.png"))
+        self.assertEqual((result.created, result.skipped), (0, 1))
+        self.assertEqual(Entry.objects.count(), 1)
+
+    def test_oversized_photo_is_rejected_before_it_is_unpacked(self):
+        from .importers import import_entries
+
+        archive = self._archive("rex.png")
+        with zipfile.ZipFile(archive, "a", zipfile.ZIP_DEFLATED) as bundle:
+            bundle.writestr("huge.png", bytes(6 * 1024 * 1024))
+        archive.seek(0)
+        rid = str(self.round.id)
+        with mock.patch.object(zipfile.ZipFile, "read") as read:
+            result = import_entries(
+                self._csv((rid, "shelter", "Huge", "", "1", "huge.png")),
+                archive,
+            )
+        read.assert_not_called()
+        self.assertEqual(
+            result.errors, [(2, "Image file too large (max 5 MB).")]
+        )
+
+    def test_failed_photo_upload_only_fails_its_row(self):
+        from .importers import import_entries
+
+        storage = Entry._meta.get_field("photo").storage
+        save = storage.save
+
+        def flaky_save(name, content, **kwargs):
+            if "bella" in name:
+                raise OSError("storage unavailable")
+            return save(name, content, **kwargs)
+
+        rid = str(self.round.id)
+        with mock.patch.object(storage, "save", side_effect=flaky_save):
+            with self.assertLogs("lottery.importers", "ERROR"):
+                result = import_entries(
+                    self._csv(
+                        (rid, "shelter", "Rex", "", "1", "rex.png"),
+                        (rid, "shelter", "Bella", "", "2", "bella.png"),
+                    ),
+                    self._archive("rex.png", "bella.png"),
+                )
+        self.assertEqual(result.created, 1)
+        self.assertEqual(
+            result.errors, [(3, "The photo could not be stored; try again.")]
+        )
+        self.assertEqual(self.round.entries.get().pet.name, "Rex")
+
+    def test_stored_photos_are_deleted_when_the_insert_fails(self):
+        from .importers import import_entries
+
+        storage = Entry._meta.get_field("photo").storage
+        rid = str(self.round.id)
+        with mock.patch.object(
+            Entry.objects, "bulk_create", side_effect=RuntimeError
+        ), mock.patch.object(
+            storage, "delete", wraps=storage.delete
+        ) as delete:
+            with self.assertRaises(RuntimeError):
+                import_entries(
+                    self._csv((rid, "shelter", "Rex", "", "1", "rex.png")),
+                    self._archive("rex.png"),
+                )
+        self.assertEqual(delete.call_count, 1)
+        self.assertFalse(storage.exists(delete.call_args.args[0]))
+
+    def test_staff_upload_page(self):
+        url = reverse("import_entries")
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.login(username="shelter", password="pass12345")
+        row = (str(self.round.id), "shelter", "Rex", "", "1", "rex.png")
+        resp = self.client.post(
+            url,
+            {
+                "entries_csv": SimpleUploadedFile(
+                    "entries.csv", self._csv(row).read()
+                ),
+                "photos": SimpleUploadedFile(
+                    "photos.zip", self._archive("rex.png").read()
+                ),
+            },
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context["result"].created, 1)
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="keeper", password="pass12345"
+        )
+        long_ago = timezone.now() - timezone.timedelta(days=800)
+        self.old_round = LotteryRound.objects.create(
+            title="Old Round",
+            start_date=long_ago,
+            end_date=long_ago,
+            status=LotteryRound.Status.COMPLETED,
+            drawn_at=long_ago,
+        )
+        self.entries = []
+        for rank, name in enumerate(("Rex", "Fido", "Bella")):
+            pet = Pet.objects.create(owner=self.user, name=name, age="2")
+            self.entries.append(
+                Entry.objects.create(
+                    pet=pet,
+                    round=self.old_round,
+                    photo=f"pet_entries/{name}.png",
+                    is_winner=rank == 0,
+                    winner_rank=1 if rank == 0 else None,
+                )
+            )
+        Comment.objects.create(
+            entry=self.entries[1], author=self.user, text="Nice"
+        )
+        old = Notification.objects.create(
+            user=self.user, message="Old", dismissed=True
+        )
+        Notification.objects.filter(id=old.id).update(created_at=long_ago)
+        Notification.objects.create(
+            user=self.user, message="Fresh", dismissed=True
+        )
+
+    def test_command_archives_losers_and_purges_in_batches(self):
+        deleted = []
+        storage = Entry._meta.get_field("photo").storage
+        with mock.patch.object(
+            storage, "delete", side_effect=deleted.append
+        ):
+            call_command(
+                "apply_retention", batch_size=1, sleep=0, stdout=io.StringIO()
+            )
+
+        self.assertEqual(
+            list(Notification.objects.values_list("message", flat=True)),
+            ["Fresh"],
+        )
+        self.assertEqual(
+            list(Entry.objects.values_list("id", flat=True)),
+            [self.entries[0].id],
+        )
+        self.assertEqual(Comment.objects.count(), 0)
+        self.assertTrue(hasattr(self.old_round, "archive"))
+        self.assertEqual(self.old_round.archive.entry_count, 2)
+        self.assertEqual(
+            sorted(deleted), ["pet_entries/Bella.png", "pet_entries/Fido.png"]
+        )
+        self.assertFalse(ArchivedEntry.objects.exclude(photo="").exists())
+
+    def test_interrupted_run_resumes(self):
+        from . import retention
+
+        retention.archive_entries_batch(self.old_round, 1)
+        self.assertEqual(ArchivedEntry.objects.count(), 1)
+        self.assertTrue(retention.rounds_to_archive().exists())
+
+        storage = Entry._meta.get_field("photo").storage
+        with mock.patch.object(storage, "delete"):
+            call_command(
+                "apply_retention", only=["rounds"], sleep=0,
+                stdout=io.StringIO(),
+            )
+        self.assertEqual(ArchivedEntry.objects.count(), 2)
+        self.assertFalse(retention.rounds_to_archive().exists())
+
+
+class PartitioningTests(TestCase):
+    def test_conversion_sql_keys_partitions_and_constraints_on_round(self):
+        from . import partitioning
+
+        sql = partitioning.conversion_sql(Entry, [4, 7])
+        self.assertIn(
+            "CREATE TABLE lottery_entry_partitioned (LIKE lottery_entry "
+            "INCLUDING DEFAULTS) PARTITION BY LIST (round_id)",
+            sql,
+        )
+        self.assertIn(
+            "CREATE TABLE IF NOT EXISTS lottery_entry_r7 PARTITION OF "
+            "lottery_entry_partitioned FOR VALUES IN (7)",
+            sql,
+        )
+        self.assertIn(
+            "ALTER TABLE lottery_entry ADD CONSTRAINT lottery_entry_pkey "
+            "PRIMARY KEY (id, round_id)",
+            sql,
+        )
+        self.assertIn(
+            "ALTER TABLE lottery_entry ADD CONSTRAINT unique_pet_per_round "
+            "UNIQUE (pet_id, round_id)",
+            sql,
+        )
+        self.assertEqual(partitioning.conversion_problems(Notification), [])
+
+    def test_detach_keeps_winners_and_drops_other_comments(self):
+        from . import partitioning
+
+        sql = partitioning.detach_sql(Entry, 7)
+        self.assertEqual(
+            sql,
+            [
+                "DELETE FROM lottery_comment WHERE entry_id IN "
+                "(SELECT id FROM lottery_entry_r7 WHERE NOT is_winner)",
+                "ALTER TABLE lottery_entry DETACH PARTITION lottery_entry_r7",
+                "INSERT INTO lottery_entry SELECT * FROM lottery_entry_r7 "
+                "WHERE is_winner",
+            ],
+        )
+        self.assertEqual(
+            partitioning.detach_sql(Notification, 7),
+            [
+                "ALTER TABLE lottery_notification "
+                "DETACH PARTITION lottery_notification_r7"
+            ],
+        )
+
+    def test_only_archived_rounds_are_detached(self):
+        from . import partitioning
+
+        drawn = timezone.now() - timezone.timedelta(days=400)
+        archived, unarchived = (
+            LotteryRound.objects.create(
+                title=title,
+                start_date=drawn,
+                end_date=drawn,
+                drawn_at=drawn,
+                status=LotteryRound.Status.COMPLETED,
+            )
+            for title in ("Archived", "Unarchived")
+        )
+        ArchivedRound.objects.create(round=archived)
+        self.assertEqual(partitioning.detachable_rounds(12), [archived.id])
+        self.assertEqual(partitioning.detachable_rounds(24), [])
+
+    def test_noop_outside_postgres(self):
+        from . import partitioning
+
+        now = timezone.now()
+        round_obj = LotteryRound.objects.create(
+            title="Any", start_date=now, end_date=now
+        )
+        self.assertEqual(partitioning.ensure_partitions(round_obj.id), [])
+        with self.assertRaises(CommandError):
+            call_command("partition_tables", dry_run=True)
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            username="drawer", password="pass12345", is_staff=True
+        )
+        self.alice = User.objects.create_user(username="alice")
+        self.bob = User.objects.create_user(username="bob")
+        self.pets = [
+            Pet.objects.create(owner=owner, name=name, age="2")
+            for owner, name in (
+                (self.alice, "Rex"),
+                (self.alice, "Fido"),
+                (self.bob, "Bella"),
+                (self.bob, "Milo"),
+            )
+        ]
+        self.client.login(username="drawer", password="pass12345")
+
+    def draw(self, order):
+        """Draw a new round; ``order`` lists pet indexes in rank order."""
+        now = timezone.now()
+        round_obj = LotteryRound.objects.create(
+            title=f"Round {LotteryRound.objects.count() + 1}",
+            start_date=now - timezone.timedelta(days=1),
+            end_date=now + timezone.timedelta(days=1),
+        )
+        entries = {
+            pet.id: Entry.objects.create(
+                pet=pet,
+                round=round_obj,
+                photo="pet_entries/x.png",
+                status=Entry.Status.APPROVED,
+            )
+            for pet in self.pets
+        }
+        winners = [entries[self.pets[index].id] for index in order]
+        with mock.patch(
+            "lottery.views.random.sample", return_value=winners
+        ):
+            self.client.post(reverse("run_draw", args=[round_obj.id]))
+
+    def snapshot(self):
+        return (
+            list(PetStanding.objects.order_by("pet_id").values()),
+            list(OwnerStanding.objects.order_by("owner_id").values()),
+        )
+
+    def test_draws_update_standings_incrementally(self):
+        self.draw([0, 2, 1])
+        self.draw([2, 3, 1])
+
+        rex = PetStanding.objects.get(pet=self.pets[0])
+        self.assertEqual((rex.entries, rex.points, rex.wins), (2, 3, 1))
+        self.assertEqual((rex.current_streak, rex.best_streak), (0, 1))
+        fido = PetStanding.objects.get(pet=self.pets[1])
+        self.assertEqual((fido.third_places, fido.current_streak), (2, 2))
+
+        bob = OwnerStanding.objects.get(owner=self.bob)
+        self.assertEqual(
+            (bob.entries, bob.points, bob.first_places, bob.second_places),
+            (4, 7, 1, 2),
+        )
+
+        before = self.snapshot()
+        call_command("rebuild_leaderboards", stdout=io.StringIO())
+        after = self.snapshot()
+        for rows in before + after:
+            for row in rows:
+                row.pop("id")
+        self.assertEqual(before, after)
+
+    def test_pages_are_ranked_and_cursor_paginated(self):
+        from . import leaderboards
+
+        self.draw([0, 2, 1])
+        rows, cursor = leaderboards.ranked_page(
+            leaderboards.pet_standings(), limit=2
+        )
+        self.assertEqual([row.pet.name for row in rows], ["Rex", "Bella"])
+        rows, cursor = leaderboards.ranked_page(
+            leaderboards.pet_standings(), cursor, limit=2
+        )
+        self.assertEqual([row.position for row in rows], [3, 4])
+        self.assertIsNone(cursor)
+
+        resp = self.client.get(reverse("owner_leaderboard"))
+        self.assertContains(resp, "alice")
+        data = self.client.get(
+            reverse("api:pet_leaderboard"), {"limit": 1}
+        ).json()
+        self.assertEqual(data["data"][0]["pet"]["name"], "Rex")
+        self.assertIsNotNone(data["next"])
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username="michelle")
+        self.other = User.objects.create_user(username="tom")
+        self.bella = Pet.objects.create(
+            owner=self.other, name="Bella", age="1"
+        )
+        self.rex = Pet.objects.create(owner=self.owner, name="Rex", age="2")
+        Pet.objects.create(owner=self.other, name="Milo", age="3")
+
+    def names(self, query):
+        from . import search
+
+        return [pet.name for pet in search.search_pets(query)]
+
+    def test_pets_match_by_name_or_owner_through_the_index(self):
+        from . import search
+
+        self.assertIn(
+            search.index_name(Pet, "name"), search.installed_indexes()
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.names("ELL"), ["Bella", "Rex"])
+        self.assertIn("MATCH", queries.captured_queries[-1]["sql"])
+        # Too short for trigrams: falls back to a LIKE scan.
+        self.assertEqual(self.names("lo"), ["Milo"])
+
+    def test_index_follows_inserts_updates_and_deletes(self):
+        self.rex.name = "Rexford"
+        self.rex.save()
+        self.bella.delete()
+        Pet.objects.create(owner=self.other, name="Fordo", age="1")
+        self.assertEqual(self.names("ford"), ["Fordo", "Rexford"])
+
+    def test_admin_and_public_search(self):
+        from .admin import CommentAdmin
+
+        now = timezone.now()
+        round_obj = LotteryRound.objects.create(
+            title="Search Round", start_date=now, end_date=now
+        )
+        entry = Entry.objects.create(
+            pet=self.rex, round=round_obj, photo="pet_entries/rex.png"
+        )
+        wanted = Comment.objects.create(
+            entry=entry, author=self.owner, text="What a gorgeous coat"
+        )
+        Comment.objects.create(entry=entry, author=self.owner, text="Cute")
+
+        admin = CommentAdmin(Comment, None)
+        results, duplicates = admin.get_search_results(
+            None, Comment.objects.all(), "gorgeous"
+        )
+        self.assertEqual(list(results), [wanted])
+        self.assertFalse(duplicates)
+
+        resp = self.client.get(reverse("pet_search"), {"q": "bel"})
+        self.assertContains(resp, "Bella")
+        self.assertNotContains(resp, "Milo")
+
+
+class AdminScaleTests(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            username="root", password="pass12345", email="root@example.com"
+        )
+        self.client.login(username="root", password="pass12345")
+        now = timezone.now()
+        self.rounds = [
+            LotteryRound.objects.create(
+                title=f"Round {index}", start_date=now, end_date=now
+            )
+            for index in range(25)
+        ]
+
+    def add_entries(self, count):
+        start = Pet.objects.count()
+        for index in range(start, start + count):
+            pet = Pet.objects.create(
+                owner=self.admin_user, name=f"Pet {index}", age="1"
+            )
+            entry = Entry.objects.create(
+                pet=pet, round=self.rounds[-1], photo="pet_entries/x.png"
+            )
+            Comment.objects.create(
+                entry=entry, author=self.admin_user, text="Hi"
+            )
+            Notification.objects.create(
+                user=self.admin_user, pet=pet, round=self.rounds[-1],
+                message="Hello",
+            )
+
+    def changelist_queries(self, name):
+        url = reverse(f"admin:lottery_{name}_changelist")
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        models = ("entry", "comment", "notification", "badgeaward", "pet")
+        self.client.get(reverse("admin:index"))
+        self.add_entries(2)
+        before = {name: self.changelist_queries(name) for name in models}
+        self.add_entries(8)
+        after = {name: self.changelist_queries(name) for name in models}
+        self.assertEqual(before, after)
+
+    def test_round_filter_lists_only_recent_rounds(self):
+        url = reverse("admin:lottery_entry_changelist")
+        resp = self.client.get(url)
+        spec = next(
+            spec for spec in resp.context["cl"].filter_specs
+            if getattr(spec, "parameter_name", "") == "round__id__exact"
+        )
+        self.assertEqual(len(spec.lookup_choices), 20)
+
+        oldest = self.rounds[0]
+        resp = self.client.get(url, {"round__id__exact": oldest.id})
+        spec = next(
+            spec for spec in resp.context["cl"].filter_specs
+            if getattr(spec, "parameter_name", "") == "round__id__exact"
+        )
+        self.assertIn((str(oldest.id), oldest.title), spec.lookup_choices)
+
+    def test_estimated_paginator_counts_exactly_outside_postgres(self):
+        from .paginators import EstimatedCountPaginator
+
+        self.add_entries(3)
+        paginator = EstimatedCountPaginator(Entry.objects.all(), 2)
+        self.assertEqual((paginator.count, paginator.num_pages), (3, 2))
+
+
+class SavedPetEntryTests(RoundEntryMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.pet = Pet.objects.create(
+            owner=self.user, name="Bella", breed="Collie", age="2 year(s)"
+        )
+        self.url = reverse("enter_round", args=[self.round.id])
+
+    def _photo(self):
+        return SimpleUploadedFile("pet.png", self._png(), "image/png")
+
+    def _post(self, **data):
+        data = {
+            "saved_pet": "",
+            "pet_name": "",
+            "pet_breed": "",
+            "pet_age_number": "2",
+            "pet_age_unit": "year(s)",
+            "photo": self._photo(),
+            **data,
+        }
+        return self.client.post(self.url, data, follow=True)
+
+    def test_form_offers_saved_pets(self):
+        resp = self.client.get(self.url)
+        self.assertContains(resp, 'id="saved-pets"')
+        self.assertEqual(
+            resp.context["form"].fields["saved_pet"].choices[1],
+            (self.pet.id, "Bella"),
+        )
+
+    def test_picking_saved_pet_enters_that_pet(self):
+        self._post(saved_pet=str(self.pet.id))
+        self.assertEqual(Entry.objects.get().pet, self.pet)
+
+    @override_settings(SHARED_CACHE=True)
+    def test_stale_cached_pet_id_is_not_trusted(self):
+        # Another worker recreated the pet; this cache still has the old id.
+        stale = dict(pets.saved_pets(self.user.id)[0], id=self.pet.id + 100)
+        cache.set(pets.saved_pets_key(self.user.id), [stale])
+        self._post(saved_pet=str(stale["id"]))
+        self.assertEqual(Entry.objects.get().pet, self.pet)
+
+    def test_saved_pets_are_not_cached_per_process(self):
+        pets.saved_pets(self.user.id)
+        self.assertIsNone(cache.get(pets.saved_pets_key(self.user.id)))
+
+    def test_new_details_update_the_saved_pet(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._post(pet_name="Bella", pet_breed="Border Collie")
+        self.pet.refresh_from_db()
+        self.assertEqual(self.pet.breed, "Border Collie")
+        self.assertEqual(Entry.objects.get().pet, self.pet)
+        self.assertEqual(
+            self.client.get(self.url).context["saved_pets"][0]["breed"],
+            "Border Collie",
+        )
+
+    def test_name_is_required_without_saved_pet(self):
+        resp = self._post(pet_breed="Collie")
+        self.assertFalse(Entry.objects.exists())
+        self.assertIn("pet_name", resp.context["form"].errors)
+
+    def test_duplicate_entry_reports_already_entered(self):
+        self._post(saved_pet=str(self.pet.id))
+        storage = Entry._meta.get_field("photo").storage
+        with mock.patch.object(storage, "delete") as delete:
+            resp = self._post(saved_pet=str(self.pet.id))
+        self.assertContains(resp, "already been entered")
+        self.assertEqual(Entry.objects.count(), 1)
+        delete.assert_called_once()
+
+    @override_settings(SHARED_CACHE=True)
+    def test_pet_changes_invalidate_saved_pets(self):
+        self.assertEqual(len(pets.saved_pets(self.user.id)), 1)
+        Pet.objects.create(owner=self.user, name="Max", age="1 year(s)")
+        self.assertEqual(len(pets.saved_pets(self.user.id)), 2)
+        self.pet.delete()
+        self.assertEqual(
+            [pet["name"] for pet in pets.saved_pets(self.user.id)], ["Max"]
+        )
+
+
+@override_settings(DIRECT_UPLOAD_BACKEND="lottery.uploads.LocalUploads")
+class DirectUploadTests(RoundEntryMixin, TestCase):
+    def _photo(self, content=None):
+        if content is None:
+            content = self._png()
+        return SimpleUploadedFile("pet.png", content, "image/png")
+
+    def _upload(self):
+        target = self.client.post(reverse("upload_target")).json()
+        stored = self.client.post(
+            target["url"], {**target["fields"], "file": self._photo()}
+        )
+        self.assertEqual(stored.status_code, 200)
+        return target["token"], stored.json()["key"]
+
+    def _enter(self, token, key):
+        return self.client.post(
+            reverse("enter_round", args=[self.round.id]),
+            {
+                "pet_name": "Bella",
+                "pet_breed": "Collie",
+                "pet_age_number": "2",
+                "pet_age_unit": "year(s)",
+                "upload_token": token,
+                "photo_key": key,
+            },
+            follow=True,
+        )
+
+    def test_entry_attaches_directly_uploaded_photo(self):
+        token, key = self._upload()
+        self.assertTrue(key.startswith("pet_entries/"))
+        self._enter(token, key)
+        self.assertEqual(Entry.objects.get().photo.name, key)
+
+    @override_settings(IMAGE_POOL_WORKERS=0)
+    def test_direct_upload_keeps_placeholder_from_upload(self):
+        token, key = self._upload()
+        # The photo is not read back to make the placeholder.
+        with mock.patch(
+            "django.core.files.storage.Storage.open",
+            side_effect=AssertionError,
+        ):
+            self._enter(token, key)
+        self.assertTrue(
+            Entry.objects.get().placeholder.startswith("data:image/webp")
+        )
+
+        new_token, new_key = self._upload()
+        entry = Entry.objects.get()
+        self.client.post(
+            reverse("edit_entry", args=[entry.id]),
+            {
+                "pet_name": "Bella",
+                "pet_breed": "Collie",
+                "pet_age_number": "2",
+                "pet_age_unit": "year(s)",
+                "upload_token": new_token,
+                "photo_key": new_key,
+            },
+        )
+        entry.refresh_from_db()
+        self.assertEqual(entry.photo.name, new_key)
+        self.assertTrue(entry.placeholder.startswith("data:image/webp"))
+
+    def test_missing_placeholder_is_left_to_backfill(self):
+        token, key = self._upload()
+        cache.clear()
+        resp = self._enter(token, key)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(Entry.objects.get().placeholder, "")
+        self.assertTrue(placeholders.pending().exists())
+
+    def test_token_cannot_store_a_second_photo(self):
+        target = self.client.post(reverse("upload_target")).json()
+        first = self.client.post(target["url"], {"file": self._photo()})
+        self.assertEqual(first.status_code, 200)
+        again = self.client.post(target["url"], {"file": self._photo()})
+        self.assertEqual(again.status_code, 400)
+        self.assertEqual(
+            uploads.backend().stored(target["key"]), [first.json()["key"]]
+        )
+
+    def test_expired_unattached_uploads_are_swept(self):
+        attached_token, attached = self._upload()
+        self._enter(attached_token, attached)
+        _, abandoned = self._upload()
+        fresh_target = self.client.post(reverse("upload_target")).json()
+        self.assertEqual(IssuedUpload.objects.count(), 3)
+        IssuedUpload.objects.exclude(key=fresh_target["key"]).update(
+            issued_at=timezone.now() - timezone.timedelta(hours=1)
+        )
+
+        out = io.StringIO()
+        call_command(
+            "apply_retention", only=["uploads"], sleep=0, stdout=out
+        )
+        self.assertIn("Swept 2 expired upload keys.", out.getvalue())
+        storage = Entry._meta.get_field("photo").storage
+        self.assertTrue(storage.exists(attached))
+        self.assertFalse(storage.exists(abandoned))
+        self.assertEqual(
+            list(IssuedUpload.objects.values_list("key", flat=True)),
+            [fresh_target["key"]],
+        )
+
+    def test_key_must_match_token(self):
+        token, key = self._upload()
+        _, other_key = self._upload()
+        resp = self._enter(token, other_key)
+        self.assertFalse(Entry.objects.exists())
+        self.assertIn("photo", resp.context["form"].errors)
+
+    def test_token_is_bound_to_user(self):
+        token, key = self._upload()
+        User.objects.create_user(username="other", password="pass12345")
+        self.client.login(username="other", password="pass12345")
+        self._enter(token, key)
+        self.assertFalse(Entry.objects.exists())
+
+    def test_expired_token_is_rejected(self):
+        token, key = self._upload()
+        with override_settings(DIRECT_UPLOAD_MAX_AGE=-1):
+            resp = self._enter(token, key)
+        self.assertFalse(Entry.objects.exists())
+        self.assertContains(resp, "expired")
+
+    def test_token_attaches_one_entry_only(self):
+        token, key = self._upload()
+        self._enter(token, key)
+        other = LotteryRound.objects.create(
+            title="Second Round",
+            start_date=self.round.start_date,
+            end_date=self.round.end_date,
+            status=LotteryRound.Status.ACTIVE,
+        )
+        self.round = other
+        resp = self._enter(token, key)
+        self.assertEqual(Entry.objects.count(), 1)
+        self.assertIn("already been used", str(resp.context["form"].errors))
+
+    def test_invalid_form_does_not_use_up_the_token(self):
+        token, key = self._upload()
+        self.client.post(
+            reverse("enter_round", args=[self.round.id]),
+            {
+                "pet_age_number": "2",
+                "pet_age_unit": "year(s)",
+                "upload_token": token,
+                "photo_key": key,
+            },
+        )
+        self._enter(token, key)
+        self.assertEqual(Entry.objects.get().photo.name, key)
+
+    def test_oversized_upload_is_rejected_and_deleted(self):
+        token, key = self._upload()
+        with mock.patch("lottery.forms.MAX_UPLOAD_SIZE", 10):
+            resp = self._enter(token, key)
+        self.assertFalse(Entry.objects.exists())
+        self.assertIn("at most 5 MB", str(resp.context["form"].errors))
+        self.assertFalse(
+            Entry._meta.get_field("photo").storage.exists(key)
+        )
+
+    def test_disallowed_format_is_rejected(self):
+        target = self.client.post(reverse("upload_target")).json()
+        storage = Entry._meta.get_field("photo").storage
+        key = storage.save(f"{target['key']}.gif", io.BytesIO(b"GIF89a"))
+        self._enter(target["token"], key)
+        self.assertFalse(Entry.objects.exists())
+        self.assertFalse(storage.exists(key))
+
+    @override_settings(
+        DIRECT_UPLOAD_BACKEND="lottery.uploads.CloudinaryUploads"
+    )
+    def test_cloudinary_metadata_is_checked(self):
+        with mock.patch(
+            "cloudinary.api.resource",
+            return_value={"bytes": 2048, "format": "JPEG"},
+        ) as resource:
+            details = uploads.backend().describe("pet_entries/abc")
+        resource.assert_called_once_with("pet_entries/abc")
+        self.assertEqual(details, (2048, "jpg"))
+
+    @override_settings(
+        DIRECT_UPLOAD_BACKEND="lottery.uploads.CloudinaryUploads"
+    )
+    def test_cloudinary_placeholder_fetches_scaled_image(self):
+        response = mock.MagicMock()
+        response.__enter__.return_value.read.return_value = self._png(
+            size=(16, 16)
+        )
+        with mock.patch(
+            "urllib.request.urlopen", return_value=response
+        ) as urlopen:
+            value = uploads.placeholder("pet_entries/abc")
+        self.assertIn("w_16", urlopen.call_args.args[0])
+        self.assertTrue(value.startswith("data:image/webp"))
+
+        with mock.patch(
+            "urllib.request.urlopen", side_effect=OSError
+        ), self.assertLogs("lottery.uploads", "WARNING"):
+            self.assertEqual(uploads.placeholder("pet_entries/abc"), "")
+
+    def test_local_service_rejects_non_images(self):
+        target = self.client.post(reverse("upload_target")).json()
+        resp = self.client.post(
+            target["url"], {"file": self._photo(b"not an image")}
+        )
+        self.assertEqual(resp.status_code, 400)
+
+    def test_upload_target_requires_login(self):
+        self.client.logout()
+        resp = self.client.post(reverse("upload_target"))
+        self.assertEqual(resp.status_code, 302)
+
+    @override_settings(DIRECT_UPLOAD_BACKEND="")
+    def test_disabled_without_backend(self):
+        resp = self.client.post(reverse("upload_target"))
+        self.assertEqual(resp.status_code, 404)
+
+    @override_settings(
+        DIRECT_UPLOAD_BACKEND="lottery.uploads.CloudinaryUploads"
+    )
+    def test_cloudinary_target_is_signed(self):
+        import cloudinary
+        import cloudinary.utils
+
+        target = self.client.post(reverse("upload_target")).json()
+        fields = dict(target["fields"])
+        signature = fields.pop("signature")
+        fields.pop("api_key")
+        self.assertEqual(fields["public_id"], target["key"])
+        self.assertEqual(
+            signature,
+            cloudinary.utils.api_sign_request(
+                fields, cloudinary.config().api_secret
+            ),
+        )
+
+
+@override_settings(
+    IMAGE_POOL_WORKERS=0,
+    IMAGE_POOL_QUEUE=0,
+    IMAGE_POOL_WAIT=0,
+)
+class ImagePoolTests(RoundEntryMixin, TestCase):
+    is_staff = True
+
+    def setUp(self):
+        imaging.get_pool().shutdown()
+        imaging._pool = None  # fresh metrics
+        super().setUp()
+
+    def _enter(self):
+        return self.client.post(
+            reverse("enter_round", args=[self.round.id]),
+            {
+                "pet_name": "Bella",
+                "pet_breed": "Collie",
+                "pet_age_number": "2",
+                "pet_age_unit": "year(s)",
+                "photo": SimpleUploadedFile(
+                    "pet.png", self._png((4, 2))
+                ),
+            },
+        )
+
+    def test_inspect_reports_format_and_errors(self):
+        info = imaging.run(imaging.inspect, self._png((4, 2)))
+        self.assertEqual(
+            (info["format"], info["width"], info["height"]), ("PNG", 4, 2)
+        )
+        self.assertIn("error", imaging.run(imaging.inspect, b"junk"))
+
+    def test_saturated_pool_answers_503(self):
+        release = threading.Event()
+        started = threading.Event()
+
+        def hold():
+            started.set()
+            release.wait(5)
+
+        worker = threading.Thread(target=imaging.run, args=(hold,))
+        worker.start()
+        started.wait(5)
+        try:
+            resp = self._enter()
+        finally:
+            release.set()
+            worker.join()
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp["Retry-After"], "5")
+        self.assertFalse(Entry.objects.exists())
+
+        metrics = self.client.get(reverse("image_pool_metrics")).json()
+        self.assertEqual(metrics["rejected"], 1)
+        self.assertEqual(metrics["in_flight"], 0)
+
+        self.assertEqual(self._enter().status_code, 302)
+        self.assertEqual(Entry.objects.count(), 1)
+
+    @override_settings(IMAGE_POOL_WORKERS=1)
+    def test_process_pool_runs_tasks(self):
+        uri = imaging.run(imaging.placeholder, self._png((4, 2)), block=True)
+        self.assertTrue(uri.startswith("data:image/webp;base64,"))
+        self.assertEqual(imaging.metrics()["completed"], 1)
+
+    @override_settings(IMAGE_POOL_WORKERS=1)
+    def test_broken_pool_is_shut_down_and_replaced(self):
+        from concurrent.futures.process import BrokenProcessPool
+
+        pool = imaging.get_pool()
+        broken = pool._get_executor()
+        with mock.patch.object(
+            broken, "shutdown", wraps=broken.shutdown
+        ) as shutdown:
+            with self.assertRaises(BrokenProcessPool):
+                imaging.run(os._exit, 1, block=True)
+        shutdown.assert_called_once_with(wait=False, cancel_futures=True)
+        uri = imaging.run(imaging.placeholder, self._png(), block=True)
+        self.assertTrue(uri.startswith("data:image/webp"))
+        self.assertIsNot(pool._executor, broken)
+        self.assertEqual(imaging.metrics()["failed"], 1)
+
+
+@override_settings(IMAGE_POOL_WORKERS=0)
+class PlaceholderTests(RoundEntryMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.pet = Pet.objects.create(owner=self.user, name="Tiger", age="3")
+
+    def _photo_bytes(self):
+        return self._png((400, 300), (200, 120, 40))
+
+    def test_upload_stores_placeholder_and_pages_inline_it(self):
+        self.client.post(
+            reverse("enter_round", args=[self.round.id]),
+            {
+                "pet_name": "Tiger",
+                "pet_breed": "Tabby",
+                "pet_age_number": "3",
+                "pet_age_unit": "year(s)",
+                "photo": SimpleUploadedFile("tiger.png", self._photo_bytes()),
+            },
+        )
+        entry = Entry.objects.get()
+        self.assertTrue(
+            entry.placeholder.startswith("data:image/webp;base64,")
+        )
+        self.assertLess(len(entry.placeholder), 400)
+        self.assertContains(
+            self.client.get(reverse("profile")), entry.placeholder
+        )
+
+    def test_backfill_fills_missing_placeholders(self):
+        storage = Entry._meta.get_field("photo").storage
+        stored = storage.save(
+            "pet_entries/old.png", io.BytesIO(self._photo_bytes())
+        )
+        other = Pet.objects.create(owner=self.user, name="Gone", age="1")
+        entry = Entry.objects.create(
+            pet=self.pet, round=self.round, photo=stored
+        )
+        missing = Entry.objects.create(
+            pet=other, round=self.round, photo="pet_entries/missing.png"
+        )
+
+        out = io.StringIO()
+        call_command("backfill_placeholders", sleep=0, stdout=out)
+        entry.refresh_from_db()
+        missing.refresh_from_db()
+        self.assertTrue(entry.placeholder.startswith("data:image/webp"))
+        self.assertEqual(missing.placeholder, "")
+        self.assertIn("Filled 1 placeholders; 1 photos", out.getvalue())
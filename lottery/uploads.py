@@ -0,0 +1,260 @@
+"""
+Signed direct uploads of entry photos.
+
+The entry form asks ``upload_target`` for a short-lived signed target, the
+browser sends the photo straight to it, and only the stored object's key
+comes back with the form. ``attach`` checks that key against the signed
+token and the stored object's size and format as reported by the backend,
+so web workers never handle the bytes. A token attaches one photo once:
+the photo must not belong to an entry yet, and the token is marked used in
+the cache. Every issued key is recorded as an ``IssuedUpload`` so
+``manage.py apply_retention`` can delete photos that never reached an
+entry. The entry's placeholder comes from ``placeholder``, which never
+downloads the full photo either.
+
+The backend is picked by ``DIRECT_UPLOAD_BACKEND``:
+
+- ``CloudinaryUploads`` signs Cloudinary upload parameters; Cloudinary
+  itself enforces the allowed formats;
+- ``LocalUploads`` is a stand-in service for tests and self-hosted
+  deployments on file storage: the ``direct_upload`` view checks the image
+  and writes it to the photo storage, keeping the placeholder it made
+  while checking.
+
+When the setting is empty the form posts the file through Django as before,
+which is also the fallback for browsers without JavaScript.
+"""
+import logging
+import secrets
+import time
+import urllib.request
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from . import imaging
+from .models import Entry, IssuedUpload
+
+
+SALT = "lottery.uploads"
+ALLOWED_FORMATS = ("jpg", "png", "webp")
+FORMAT_ALIASES = {"jpeg": "jpg"}
+PLACEHOLDER_FETCH_TIMEOUT = 2
+
+logger = logging.getLogger(__name__)
+
+
+def photo_storage():
+    return Entry._meta.get_field("photo").storage
+
+
+def new_key(prefix=""):
+    """A fresh, unguessable object key under the entry photo folder."""
+    upload_to = Entry._meta.get_field("photo").upload_to
+    return f"{prefix}{upload_to}{secrets.token_urlsafe(16)}"
+
+
+def sign(user_id, key):
+    return signing.dumps({"user": user_id, "key": key}, salt=SALT)
+
+
+def unsign(token):
+    """Return ``(user_id, key)``; raises ValidationError when invalid."""
+    try:
+        data = signing.loads(
+            token, salt=SALT, max_age=settings.DIRECT_UPLOAD_MAX_AGE
+        )
+    except signing.BadSignature as exc:
+        raise ValidationError(
+            "The photo upload has expired. Please choose the photo again."
+        ) from exc
+    return data["user"], data["key"]
+
+
+class LocalUploads:
+    def new_key(self):
+        return new_key()
+
+    def target(self, key, token):
+        return {"url": reverse("direct_upload", args=[token]), "fields": {}}
+
+    def store(self, key, content, extension, placeholder=""):
+        name = photo_storage().save(f"{key}{extension}", content)
+        cache.set(
+            f"uploads:placeholder:{name}",
+            placeholder,
+            settings.DIRECT_UPLOAD_MAX_AGE,
+        )
+        return name
+
+    def placeholder(self, name):
+        return cache.get(f"uploads:placeholder:{name}", "")
+
+    def stored(self, key):
+        """Storage names of the photos uploaded under ``key``."""
+        folder, _, prefix = key.rpartition("/")
+        try:
+            _, files = photo_storage().listdir(folder)
+        except FileNotFoundError:
+            return []
+        return [
+            f"{folder}/{name}" for name in files if name.startswith(prefix)
+        ]
+
+    def describe(self, name):
+        """``(size in bytes, format)`` of a stored photo, or None."""
+        storage = photo_storage()
+        if not storage.exists(name):
+            return None
+        extension = PurePosixPath(name).suffix.lstrip(".").lower()
+        return storage.size(name), FORMAT_ALIASES.get(extension, extension)
+
+
+class CloudinaryUploads:
+    def new_key(self):
+        # Stored names are public ids, which carry the storage prefix.
+        from cloudinary_storage import app_settings
+
+        prefix = app_settings.PREFIX.strip("/")
+        return new_key(f"{prefix}/" if prefix else "")
+
+    def target(self, key, token):
+        import cloudinary
+        import cloudinary.utils
+        from cloudinary_storage import app_settings
+
+        config = cloudinary.config()
+        params = {
+            "public_id": key,
+            "timestamp": int(time.time()),
+            "tags": app_settings.MEDIA_TAG,
+            "allowed_formats": ",".join(ALLOWED_FORMATS),
+        }
+        params["signature"] = cloudinary.utils.api_sign_request(
+            params, config.api_secret
+        )
+        params["api_key"] = config.api_key
+        return {
+            "url": cloudinary.utils.cloudinary_api_url(
+                "upload", resource_type="image"
+            ),
+            "fields": params,
+        }
+
+    def describe(self, name):
+        import cloudinary.api
+        import cloudinary.exceptions
+
+        try:
+            resource = cloudinary.api.resource(name)
+        except cloudinary.exceptions.NotFound:
+            return None
+        file_format = resource["format"].lower()
+        return resource["bytes"], FORMAT_ALIASES.get(file_format, file_format)
+
+    def stored(self, key):
+        # The key is the public id, so there is at most one photo.
+        return [key] if self.describe(key) else []
+
+    def placeholder(self, name):
+        # Cloudinary scales the photo down before sending it, so only a
+        # few hundred bytes cross the network.
+        import cloudinary.utils
+
+        url, _ = cloudinary.utils.cloudinary_url(
+            name,
+            width=imaging.PLACEHOLDER_SIZE,
+            crop="scale",
+            format="png",
+            secure=True,
+        )
+        with urllib.request.urlopen(
+            url, timeout=PLACEHOLDER_FETCH_TIMEOUT
+        ) as response:
+            data = response.read()
+        # Decoding a 16 pixel image is too quick to be worth the pool.
+        return imaging.placeholder(data)
+
+
+def backend():
+    """The configured upload backend, or None when direct uploads are off."""
+    path = settings.DIRECT_UPLOAD_BACKEND
+    return import_string(path)() if path else None
+
+
+def upload_target(user_id):
+    """
+    ``{"url", "fields", "key", "token"}``: where to POST the photo (as the
+    ``file`` field, alongside ``fields``) and the token to send back.
+    """
+    uploads = backend()
+    key = uploads.new_key()
+    IssuedUpload.objects.create(key=key)
+    token = sign(user_id, key)
+    return {"key": key, "token": token, **uploads.target(key, token)}
+
+
+def placeholder(name):
+    """
+    The placeholder for a directly uploaded photo, or "" to leave it to
+    ``manage.py backfill_placeholders``.
+    """
+    try:
+        return backend().placeholder(name)
+    except Exception:
+        logger.warning(
+            "No placeholder for %s; the backfill will retry.",
+            name,
+            exc_info=True,
+        )
+        return ""
+
+
+def discard(key):
+    """Delete whatever was uploaded under ``key`` from storage."""
+    storage = photo_storage()
+    for name in backend().stored(key):
+        storage.delete(name)
+
+
+def attach(token, name, user_id):
+    """
+    Return the storage name of a photo uploaded with ``token`` by
+    ``user_id``, ready to assign to ``Entry.photo``. A photo that is too
+    large or not an allowed format is deleted.
+    """
+    from .forms import MAX_UPLOAD_SIZE
+
+    owner_id, key = unsign(token)
+    name = name or ""
+    # The local service adds the file extension to the key.
+    if (
+        owner_id != user_id
+        or not name.startswith(key)
+        or "/" in name[len(key):]
+    ):
+        raise ValidationError("The uploaded photo does not match this form.")
+    details = backend().describe(name)
+    if details is None:
+        raise ValidationError("The uploaded photo could not be found.")
+    size, file_format = details
+    if size > MAX_UPLOAD_SIZE or file_format not in ALLOWED_FORMATS:
+        photo_storage().delete(name)
+        raise ValidationError(
+            "Please upload a JPG, PNG or WEBP image of at most 5 MB."
+        )
+    # The entry check is authoritative once the first form has saved; the
+    # cache flag stops two forms racing with the same token before that.
+    if Entry.objects.filter(photo=name).exists() or not cache.add(
+        f"uploads:used:{key}", 1, settings.DIRECT_UPLOAD_MAX_AGE
+    ):
+        raise ValidationError(
+            "This photo upload has already been used. Please choose the "
+            "photo again."
+        )
+    return name
@@ -28,6 +28,37 @@ urlpatterns = [
     ),
     path("rounds/<int:round_id>/draw/", views.run_draw, name="run_draw"),
     path("results/", views.results, name="results_list"),
+    path("leaderboard/", views.leaderboard, name="leaderboard"),
+    path("search/", views.pet_search, name="pet_search"),
+    path(
+        "leaderboard/owners/",
+        views.leaderboard,
+        {"kind": "owners"},
+        name="owner_leaderboard",
+    ),
+    path(
+        "results/export/",
+        views.export_results,
+        name="export_results",
+    ),
+    path(
+        "rounds/<int:round_id>/export/",
+        views.export_round,
+        name="export_round",
+    ),
+    path("import/", views.import_entries, name="import_entries"),
+    path(
+        "ops/image-pool/",
+        views.image_pool_metrics,
+        name="image_pool_metrics",
+    ),
+    path("uploads/target/", views.upload_target, name="upload_target"),
+    path(
+        "uploads/local/<str:token>/",
+        views.direct_upload,
+        name="direct_upload",
+    ),
+    path("events/", views.live_events, name="live_events"),
     path(
         "entries/<int:entry_id>/comments/",
         views.comment_create,
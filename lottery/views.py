@@ -1,25 +1,61 @@
+import asyncio
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.shortcuts import get_object_or_404, redirect, render
-from django.db.models import Prefetch
+from django.db import transaction
+from django.db.models import Min, Prefetch, Q
 from django.contrib.auth.decorators import login_required
 from django.urls import reverse
 from .models import (
     LotteryRound,
-    Pet,
     Entry,
     Badge,
     BadgeAward,
     Notification,
     Comment,
 )
-from .forms import EntryCreateForm, CommentForm, LotteryRoundForm
+from .forms import (
+    CommentForm,
+    EntryCreateForm,
+    EntryImportForm,
+    LotteryRoundForm,
+    verify_image,
+)
 from django.contrib.admin.views.decorators import staff_member_required
 import random
 from django.utils import timezone
 from django.contrib import messages
-from django.http import HttpResponseForbidden, JsonResponse
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseForbidden,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from core import page_cache
+from core.routers import use_replica
+from . import (
+    counters,
+    events,
+    exports,
+    imaging,
+    importers,
+    leaderboards,
+    mutations,
+    pets,
+    search,
+    uploads,
+)
 
 
+@page_cache.cache_anonymous
+@use_replica
 def round_list(request):
     """
     Display list of active lottery rounds and optionally create new round.
@@ -52,6 +88,19 @@ def round_list(request):
         end_date__gte=now
         ).order_by("-start_date")
 
+    if page_cache.storing(request):
+        page_cache.tag(request, "rounds:active")
+        # The list also changes when a round starts or ends.
+        bounds = LotteryRound.objects.filter(
+            status=LotteryRound.Status.ACTIVE
+        ).aggregate(
+            next_start=Min("start_date", filter=Q(start_date__gt=now)),
+            next_end=Min("end_date", filter=Q(end_date__gte=now)),
+        )
+        for when in bounds.values():
+            if when:
+                page_cache.expire_at(request, when)
+
     return render(request, "lottery/round_list.html", {
         "rounds": rounds,
         "form": form,
@@ -63,8 +112,9 @@ def enter_round(request, round_id):
     """
     Submit a pet entry to an active lottery round.
 
-    Users can only submit one entry per round. Creates or updates Pet record
-    and creates Entry with photo. Form collects pet name, breed, age.
+    Each pet can be entered once per round. The pet is created or updated
+    and the entry saved in one transaction (see ``lottery.pets``); the
+    form offers the user's saved pets so repeat entrants can pick one.
 
     Args:
     round_id: Primary key of the LotteryRound to enter
@@ -72,31 +122,29 @@ def enter_round(request, round_id):
     Context:
         form: EntryCreateForm for pet submission
         round: LotteryRound object
+        saved_pets: the user's pets, for filling in the form
     """
     round_obj = get_object_or_404(
         LotteryRound,
         id=round_id,
         status=LotteryRound.Status.ACTIVE
     )
+    saved = pets.saved_pets(request.user.id)
     if request.method == "POST":
-        form = EntryCreateForm(request.POST, request.FILES)
+        form = EntryCreateForm(
+            request.POST, request.FILES, saved_pets=saved, user=request.user
+        )
         if form.is_valid():
-            pet, created = Pet.objects.get_or_create(
-                owner=request.user,
+            entry = pets.submit_entry(
+                request.user.id,
+                round_obj,
                 name=form.cleaned_data["pet_name"],
-                defaults={
-                    "breed": form.cleaned_data["pet_breed"],
-                    "age": form.cleaned_data["pet_age"],
-                }
+                breed=form.cleaned_data["pet_breed"],
+                age=form.cleaned_data["pet_age"],
+                photo=form.cleaned_data["photo"],
+                placeholder=form.cleaned_data.get("placeholder", ""),
             )
-
-            # Update breed and age if pet already exists
-            if not created:
-                pet.breed = form.cleaned_data["pet_breed"]
-                pet.age = form.cleaned_data["pet_age"]
-                pet.save(update_fields=["breed", "age"])
-            # Check pet + round entry uniqueness
-            if Entry.objects.filter(pet=pet, round=round_obj).exists():
+            if entry is None:
                 messages.error(
                     request,
                     "This pet has already been entered in this round. "
@@ -105,24 +153,63 @@ def enter_round(request, round_id):
                 )
                 return redirect("round_list")
 
-            Entry.objects.create(
-                round=round_obj,
-                pet=pet,
-                photo=form.cleaned_data["photo"],
-            )
             messages.success(request, "Entry submitted successfully!")
             return redirect("profile")
 
     else:
-        form = EntryCreateForm()
+        form = EntryCreateForm(saved_pets=saved, user=request.user)
 
     return render(
         request,
         "lottery/enter_round.html",
-        {"form": form, "round": round_obj}
+        {
+            "form": form,
+            "round": round_obj,
+            "saved_pets": saved,
+            "direct_uploads": uploads.backend() is not None,
+        }
     )
 
 
+@login_required
+@require_POST
+def upload_target(request):
+    """
+    Issue a signed, short-lived target for uploading an entry photo
+    straight to storage. The response is described in
+    ``lottery.uploads.upload_target``.
+    """
+    if uploads.backend() is None:
+        raise Http404("Direct uploads are disabled.")
+    return JsonResponse(uploads.upload_target(request.user.id))
+
+
+@csrf_exempt
+@require_POST
+def direct_upload(request, token):
+    """
+    Local stand-in for the storage service's upload endpoint. The signed
+    token in the URL authorises the upload, as it would for the real
+    service, so no session or CSRF token is needed.
+    """
+    backend = uploads.backend()
+    if not isinstance(backend, uploads.LocalUploads):
+        raise Http404("Local uploads are disabled.")
+    photo = request.FILES.get("file")
+    try:
+        _, key = uploads.unsign(token)
+        if photo is None:
+            raise ValidationError("No file was uploaded.")
+        if backend.stored(key):
+            raise ValidationError("This upload has already been used.")
+        info = verify_image(photo)
+    except ValidationError as exc:
+        return JsonResponse({"error": exc.messages[0]}, status=400)
+    extension = Path(photo.name).suffix.lower()
+    name = backend.store(key, photo, extension, info["placeholder"])
+    return JsonResponse({"key": name})
+
+
 @login_required
 def profile(request):
     """
@@ -210,15 +297,17 @@ def approve_entry(request, entry_id):
     """
     Approve a pending entry for inclusion in the lottery draw.
 
-    Staff-only. Changes entry status from PENDING to APPROVED.
-    Redirects back to moderation queue after approval.
+    Staff-only. Changes entry status from PENDING to APPROVED in a single
+    conditional UPDATE. Redirects back to moderation queue after approval.
 
     Args:
         entry_id: Primary key of the Entry to approve
     """
-    entry = get_object_or_404(Entry, id=entry_id)
-    entry.status = Entry.Status.APPROVED
-    entry.save()
+    outcome = mutations.moderate_entry(entry_id, Entry.Status.APPROVED)
+    if outcome is mutations.Outcome.NOT_FOUND:
+        raise Http404("No such entry.")
+    if outcome is mutations.Outcome.FORBIDDEN:
+        messages.warning(request, "This entry has already been moderated.")
     return redirect("moderation_queue")
 
 
@@ -227,31 +316,37 @@ def reject_entry(request, entry_id):
     """
     Reject a pending entry, excluding it from the lottery draw.
 
-    Staff-only. Changes entry status from PENDING to REJECTED.
-    Redirects back to moderation queue after rejection.
+    Staff-only. Changes entry status from PENDING to REJECTED in a single
+    conditional UPDATE. Redirects back to moderation queue after rejection.
 
     Args:
         entry_id: Primary key of the Entry to reject
     """
-    entry = get_object_or_404(Entry, id=entry_id)
-    entry.status = Entry.Status.REJECTED
-    entry.save()
+    outcome = mutations.moderate_entry(entry_id, Entry.Status.REJECTED)
+    if outcome is mutations.Outcome.NOT_FOUND:
+        raise Http404("No such entry.")
+    if outcome is mutations.Outcome.FORBIDDEN:
+        messages.warning(request, "This entry has already been moderated.")
     return redirect("moderation_queue")
 
 
 @staff_member_required
+@transaction.atomic
 def run_draw(request, round_id):
     """
     Execute the lottery draw for a completed round.
 
     Selects up to 3 random winners from approved entries, creates notifications
     for winners and other participants, awards "Winner" badges, marks round
-    as completed. Only runs once per round.
+    as completed and adds the results to the leaderboards. Runs in one
+    transaction with the round row locked, so it only runs once per round.
 
     Args:
         round_id: Primary key of the LotteryRound to draw
     """
-    round_obj = get_object_or_404(LotteryRound, id=round_id)
+    round_obj = get_object_or_404(
+        LotteryRound.objects.select_for_update(), id=round_id
+    )
 
     # Lock: cannot draw twice
     if round_obj.drawn_at is not None:
@@ -284,7 +379,7 @@ def run_draw(request, round_id):
     for index, entry in enumerate(winners, start=1):
         entry.is_winner = True
         entry.winner_rank = index
-        entry.save(update_fields=["is_winner", "winner_rank"])
+        entry.save(update_fields=["is_winner", "winner_rank", "updated_at"])
 
         BadgeAward.objects.get_or_create(
             user=entry.pet.owner,
@@ -329,6 +424,18 @@ def run_draw(request, round_id):
     round_obj.drawn_at = timezone.now()
     round_obj.status = LotteryRound.Status.COMPLETED
     round_obj.save()
+    leaderboards.record_draw(round_obj)
+
+    events.publish(
+        events.ROUNDS_CHANNEL,
+        "round_drawn",
+        {
+            "id": round_obj.id,
+            "title": round_obj.title,
+            "drawn_at": round_obj.drawn_at,
+            "results_url": reverse("results_list"),
+        },
+    )
 
     messages.success(
         request, f"Draw complete! Selected {winner_count} winner(s)."
@@ -336,6 +443,143 @@ def run_draw(request, round_id):
     return redirect("round_list")
 
 
+def _export_response(request, queryset, filename):
+    export_format = request.GET.get("format", "csv")
+    if export_format not in exports.FORMATS:
+        return HttpResponse("Unknown export format.", status=400)
+    response = StreamingHttpResponse(
+        exports.render(exports.export_rows(queryset), export_format),
+        content_type=exports.FORMATS[export_format],
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="{filename}.{export_format}"'
+    )
+    return response
+
+
+@staff_member_required
+def export_round(request, round_id):
+    """
+    Stream every entry of a round, with pet and owner columns, as CSV
+    (default) or NDJSON (?format=ndjson). Staff only.
+
+    Args:
+        round_id: Primary key of the LotteryRound to export
+    """
+    round_obj = get_object_or_404(LotteryRound, id=round_id)
+    return _export_response(
+        request,
+        exports.round_entries(round_obj.id),
+        f"round-{round_obj.id}-entries",
+    )
+
+
+@staff_member_required
+def export_results(request):
+    """
+    Stream the winners of every completed round as CSV or NDJSON.
+    Staff only.
+    """
+    return _export_response(request, exports.all_results(), "results")
+
+
+@staff_member_required
+def import_entries(request):
+    """
+    Bulk-create pets and entries from an uploaded CSV and photo archive.
+
+    Staff only. Valid rows are imported even when others fail; every
+    rejected row is listed with its CSV line number.
+
+    Context:
+        form: EntryImportForm
+        result: ImportResult of the last upload (None on GET)
+    """
+    result = None
+    if request.method == "POST":
+        form = EntryImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            result = importers.import_entries(
+                form.cleaned_data["entries_csv"],
+                form.cleaned_data["photos"],
+            )
+            messages.success(
+                request,
+                f"Imported {result.created} entr"
+                f"{'y' if result.created == 1 else 'ies'}.",
+            )
+    else:
+        form = EntryImportForm()
+    return render(
+        request,
+        "lottery/import_entries.html",
+        {"form": form, "result": result},
+    )
+
+
+@staff_member_required
+def image_pool_metrics(request):
+    """
+    Queue depth and task timings of this worker process's image pool, as
+    JSON. Staff only.
+    """
+    return JsonResponse(imaging.metrics())
+
+
+@use_replica
+def leaderboard(request, kind="pets"):
+    """
+    Display the pet or owner leaderboard, one page at a time.
+
+    Rows come pre-aggregated from PetStanding/OwnerStanding; ?after= is the
+    cursor of the previous page's last row.
+
+    Context:
+        kind: "pets" or "owners"
+        standings: Standing rows for this page, each with a position
+        next_cursor: Cursor for the next page, or None
+    """
+    if kind == "owners":
+        queryset = leaderboards.owner_standings()
+    else:
+        queryset = leaderboards.pet_standings()
+    try:
+        standings, next_cursor = leaderboards.ranked_page(
+            queryset, request.GET.get("after")
+        )
+    except ValueError:
+        return redirect(request.path)
+    return render(
+        request,
+        "lottery/leaderboard.html",
+        {
+            "kind": kind,
+            "standings": standings,
+            "next_cursor": next_cursor,
+        },
+    )
+
+
+@use_replica
+def pet_search(request):
+    """
+    Search pets by name or owner username.
+
+    Context:
+        query: The search text (?q=)
+        pets: Up to search.RESULT_LIMIT matching pets, empty without a query
+    """
+    query = request.GET.get("q", "").strip()[:100]
+    pets = search.search_pets(query) if query else []
+    return render(
+        request,
+        "lottery/pet_search.html",
+        {"query": query, "pets": pets},
+    )
+
+
+@page_cache.cache_anonymous
+@use_replica
 def results(request):
     """
     Display completed lottery rounds with winner rankings.
@@ -358,6 +602,15 @@ def results(request):
                 .order_by("winner_rank", "id"),
         )
     ).order_by("-drawn_at")
+    if page_cache.storing(request):
+        rounds = list(rounds)
+        page_cache.tag(request, "rounds:completed")
+        for round_obj in rounds:
+            page_cache.tag(
+                request,
+                f"round:{round_obj.id}",
+                *(f"entry:{entry.id}" for entry in round_obj.entries.all()),
+            )
     return render(
         request,
         "lottery/results_list.html",
@@ -402,11 +655,13 @@ def comment_create(request, entry_id):
     is_ajax = request.headers.get("X-Requested-With") == "XMLHttpRequest"
 
     if form.is_valid():
-        comment = Comment.objects.create(
-            entry=entry,
-            author=request.user,
-            text=form.cleaned_data["text"],
-        )
+        with transaction.atomic():
+            comment = Comment.objects.create(
+                entry=entry,
+                author=request.user,
+                text=form.cleaned_data["text"],
+            )
+            counters.comment_added(comment)
 
         if is_ajax:
             created_at_str = comment.created_at.strftime(
@@ -439,7 +694,8 @@ def comment_edit(request, comment_id):
     """
     Update a comment's text (supports AJAX and traditional POST).
 
-    Author-only access. POST request saves updated comment text.
+    Author-only access, enforced by the UPDATE itself. POST request saves
+    updated comment text.
 
     Returns (AJAX):
         - success: bool
@@ -449,31 +705,26 @@ def comment_edit(request, comment_id):
     Args:
         comment_id: Primary key of the Comment to edit
     """
-    comment = get_object_or_404(
-        Comment.objects.select_related("entry"),
-        id=comment_id,
-    )
-
-    if comment.author != request.user:
-        return HttpResponseForbidden(
-            "You do not have permission to edit this comment."
-        )
-
     is_ajax = request.headers.get("X-Requested-With") == "XMLHttpRequest"
 
     if request.method != "POST":
         return redirect("results_list")
 
-    form = CommentForm(request.POST, instance=comment)
+    form = CommentForm(request.POST)
     if form.is_valid():
-        updated_comment = form.save()
+        text = form.cleaned_data["text"]
+        outcome = mutations.edit_comment(comment_id, request.user, text)
+        if outcome is not mutations.Outcome.APPLIED:
+            return mutations.error_response(
+                outcome, "You do not have permission to edit this comment."
+            )
 
         if is_ajax:
             return JsonResponse({
                 "success": True,
                 "comment": {
-                    "id": updated_comment.id,
-                    "text": updated_comment.text,
+                    "id": comment_id,
+                    "text": text,
                 }
             })
 
@@ -492,7 +743,8 @@ def comment_delete(request, comment_id):
     """
     Delete a comment (supports AJAX and traditional POST).
 
-    Author-only access. POST request deletes the comment.
+    Author-only access, enforced by the DELETE itself. POST request deletes
+    the comment.
 
     Returns (AJAX):
         - success: bool
@@ -501,17 +753,14 @@ def comment_delete(request, comment_id):
     Args:
         comment_id: Primary key of the Comment to delete
     """
-    comment = get_object_or_404(Comment, id=comment_id)
-
-    if comment.author != request.user:
-        return HttpResponseForbidden(
-            "You do not have permission to delete this comment."
-        )
-
     is_ajax = request.headers.get("X-Requested-With") == "XMLHttpRequest"
 
     if request.method == "POST":
-        comment.delete()
+        outcome = mutations.delete_comment(comment_id, request.user)
+        if outcome is not mutations.Outcome.APPLIED:
+            return mutations.error_response(
+                outcome, "You do not have permission to delete this comment."
+            )
 
         if is_ajax:
             return JsonResponse({
@@ -532,9 +781,11 @@ def comment_delete(request, comment_id):
 @require_POST
 def dismiss_notification(request):
     notif_id = request.POST.get("id")
-    notif = get_object_or_404(Notification, id=notif_id, user=request.user)
-    notif.dismissed = True
-    notif.save(update_fields=["dismissed"])
+    outcome = mutations.dismiss_notification(notif_id, request.user)
+    if outcome is not mutations.Outcome.APPLIED:
+        return mutations.error_response(
+            outcome, "You cannot dismiss this notification."
+        )
     return JsonResponse({"success": True})
 
 
@@ -565,7 +816,9 @@ def edit_entry(request, entry_id):
         return redirect("profile")
 
     if request.method == "POST":
-        form = EntryCreateForm(request.POST, request.FILES, instance=entry)
+        form = EntryCreateForm(
+            request.POST, request.FILES, instance=entry, user=request.user
+        )
         if form.is_valid():
             updated_entry = form.save(commit=False)
             # Update related pet fields
@@ -574,12 +827,16 @@ def edit_entry(request, entry_id):
             pet.breed = form.cleaned_data.get("pet_breed", pet.breed)
             pet.age = form.cleaned_data.get("pet_age", pet.age)
             pet.save()
+            if "photo" in request.FILES or form.cleaned_data.get(
+                "upload_token"
+            ):
+                updated_entry.placeholder = form.cleaned_data["placeholder"]
             updated_entry.status = Entry.Status.PENDING
             updated_entry.save()
             messages.success(request, "Entry updated and sent for moderation.")
             return redirect("profile")
     else:
-        form = EntryCreateForm(instance=entry)
+        form = EntryCreateForm(instance=entry, user=request.user)
 
     return render(
         request,
@@ -588,5 +845,48 @@ def edit_entry(request, entry_id):
             "form": form,
             "round": entry.round,
             "entry": entry,
+            "direct_uploads": uploads.backend() is not None,
         }
     )
+
+
+async def live_events(request):
+    """
+    Server-sent events stream of live updates.
+
+    Everyone receives "round_drawn" events; signed-in users also receive
+    their own new notifications. Each stream is closed after
+    LIVE_EVENTS_MAX_AGE seconds and the browser reconnects on its own.
+    Only served under ASGI: WSGI workers answer 204, which tells
+    EventSource to stop retrying instead of tying up a worker.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    user_id = await sync_to_async(
+        lambda: request.user.pk if request.user.is_authenticated else None
+    )()
+    channels = [events.ROUNDS_CHANNEL]
+    if user_id is not None:
+        channels.append(events.user_channel(user_id))
+
+    async def stream():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.LIVE_EVENTS_MAX_AGE
+        yield "retry: 5000\n\n"
+        async for message in events.get_broker().subscribe(
+            channels, timeout=settings.LIVE_EVENTS_HEARTBEAT
+        ):
+            if message is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield events.format_event(*message)
+            if loop.time() >= deadline:
+                break
+
+    response = StreamingHttpResponse(
+        stream(), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
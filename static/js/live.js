@@ -0,0 +1,76 @@
+/* jshint esversion: 6 */
+
+// Live updates over server-sent events, on pages that opt in with
+// <div id="live-events" data-url="..."></div>
+const liveEvents = document.getElementById('live-events');
+if (liveEvents && window.EventSource) {
+    const source = new EventSource(liveEvents.dataset.url);
+
+    // New notification: prepend it to the profile notification list
+    source.addEventListener('notification', function (e) {
+        const data = JSON.parse(e.data);
+        let list = document.querySelector('.profile-notifications');
+        if (!list) {
+            const emptyMessage = document.getElementById('no-notifications');
+            if (!emptyMessage) {
+                return;
+            }
+            list = document.createElement('ul');
+            list.className = 'list-group mb-4 profile-notifications';
+            emptyMessage.replaceWith(list);
+        }
+
+        const item = document.createElement('li');
+        item.className = 'list-group-item profile-notification-item';
+        item.setAttribute('data-notification-id', data.id);
+        item.innerHTML = `
+            <div style="position: relative;">
+                <div class="d-flex justify-content-end">
+                    <button type="button" class="btn-close close-notification-btn" aria-label="Close"></button>
+                </div>
+                <div class="notification-message"></div>
+                <div class="small text-muted profile-notification-date"></div>
+            </div>
+        `;
+        const message = item.querySelector('.notification-message');
+        if (data.pet) {
+            const petName = document.createElement('strong');
+            petName.textContent = data.pet + ':';
+            message.appendChild(petName);
+            message.appendChild(document.createTextNode(' '));
+        }
+        message.appendChild(document.createTextNode(data.message));
+        item.querySelector('.profile-notification-date').textContent =
+            new Date(data.created_at).toLocaleString();
+        list.prepend(item);
+    });
+
+    // A round was drawn: offer a link instead of making users reload
+    source.addEventListener('round_drawn', function (e) {
+        if (!liveEvents.hasAttribute('data-show-draws')) {
+            return;
+        }
+        const data = JSON.parse(e.data);
+        const notification = document.createElement('div');
+        notification.className = 'alert alert-info alert-dismissible fade show notification-item';
+        notification.setAttribute('role', 'alert');
+        notification.style.minWidth = '300px';
+        notification.innerHTML = `
+            <span class="draw-message"></span>
+            <a class="alert-link" href="${data.results_url}">See the winners</a>
+            <button type="button" class="btn-close" data-bs-dismiss="alert" aria-label="Close"></button>
+        `;
+        notification.querySelector('.draw-message').textContent =
+            `'${data.title}' has just been drawn.`;
+
+        let notificationContainer = document.querySelector('.site-notifications');
+        if (!notificationContainer) {
+            notificationContainer = document.createElement('div');
+            notificationContainer.className = 'position-fixed top-0 start-0 p-3 site-notifications';
+            notificationContainer.style.zIndex = '1040';
+            notificationContainer.style.marginTop = '70px';
+            document.body.appendChild(notificationContainer);
+        }
+        notificationContainer.appendChild(notification);
+    });
+}